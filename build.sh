@@ -12,5 +12,11 @@ python manage.py collectstatic --no-input
 # Run migrations
 python manage.py migrate
 
+# Create the shared cache table (database cache backend)
+python manage.py createcachetable
+
+# Build the planner travel matrix
+python manage.py build_travel_matrix
+
 # Create admin user if not exists
 python manage.py ensure_admin
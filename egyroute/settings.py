@@ -161,6 +161,102 @@ WHATSAPP_NUMBER = config('WHATSAPP_NUMBER', default='201234567890')
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
 
+# View counter: 'sync' writes on every view, 'buffered' batches writes
+VIEW_COUNT_MODE = config('VIEW_COUNT_MODE', default='sync')
+# أقصى مدة (بالثواني) تبقى فيها المشاهدات في الذاكرة قبل كتابتها (يفرّغها خيط في الخلفية)
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=30, cast=int)
+# أقصى عدد مشاهدات معلقة في العملية قبل الكتابة الفورية
+VIEW_COUNT_MAX_PENDING = config('VIEW_COUNT_MAX_PENDING', default=1000, cast=int)
+
+# Full-text search: maximum ranked results returned by the index
+SEARCH_MAX_RESULTS = config('SEARCH_MAX_RESULTS', default=200, cast=int)
+
+# Place listings pagination: 'cursor' (keyset, no OFFSET) or 'page' (numbered pages)
+PLACES_PAGINATION_MODE = config('PLACES_PAGINATION_MODE', default='cursor')
+# مدة تخزين عدد النتائج (بالثواني) في وضع المؤشر
+PLACES_COUNT_CACHE_TIMEOUT = config('PLACES_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Catalog caches are invalidated by model signals; this is only an upper bound
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=3600, cast=int)
+GOVERNORATE_PREVIEW_PLACES = 4
+
+# Nearby places search limits
+NEARBY_MAX_RADIUS_KM = 100
+NEARBY_MAX_RESULTS = 50
+
+# Map markers: zoom levels up to MAP_CLUSTER_MAX_ZOOM return grid clusters
+MAP_CLUSTER_MAX_ZOOM = 11
+MAP_MAX_MARKERS = 500
+
+# Typeahead place picker (trip plans)
+PLACE_SUGGESTIONS_MAX_RESULTS = 20
+
+# Trending score (refreshed by the refresh_trending command)
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_INITIAL_DAYS = 14
+TRENDING_WEIGHTS = {'view': 1.0, 'save': 5.0, 'trip': 8.0}
+
+# Related places from saved places and trip plans (rebuilt by build_recommendations)
+RECOMMENDATIONS_TOP_K = 8
+RECOMMENDATIONS_MAX_BASKET = 50
+RELATED_PLACES_COUNT = 4
+# Incremental updates after saves and trip additions run after commit
+# ('thread' pool per process, or 'inline' to run inside the request)
+RECOMMENDATIONS_UPDATE_MODE = config('RECOMMENDATIONS_UPDATE_MODE', default='thread')
+
+# Content similarity over place descriptions (updated by build_similarity)
+SIMILARITY_FEATURES = 4096
+SIMILARITY_TOP_K = 8
+SIMILARITY_MIN_SCORE = 0.05
+
+# Per-user saved place id sets (invalidated on every change)
+SAVED_PLACES_CACHE_TIMEOUT = 86400
+
+# Trip plan batch edits
+TRIP_PLAN_BATCH_MAX_OPERATIONS = 200
+TRIP_PLAN_MAX_DAYS = 30
+
+# Tour planner: visiting hours available per day
+PLANNER_HOURS_PER_DAY = 8
+PLANNER_DAY_START_HOUR = 9
+
+# Uncached trips of at least PLANNER_JOB_MIN_DAYS run as background jobs
+# ('thread' pool per process, or 'inline' to run inside the request)
+PLANNER_JOB_MODE = config('PLANNER_JOB_MODE', default='thread')
+PLANNER_JOB_MIN_DAYS = config('PLANNER_JOB_MIN_DAYS', default=7, cast=int)
+PLANNER_JOB_WORKERS = config('PLANNER_JOB_WORKERS', default=2, cast=int)
+PLANNER_JOB_TIMEOUT = 300
+
+# Place image renditions (card, gallery, hero, thumb) generated after upload
+# ('thread' pool per process, or 'inline' to run inside the request)
+IMAGE_RENDITION_MODE = config('IMAGE_RENDITION_MODE', default='thread')
+IMAGE_RENDITION_WORKERS = config('IMAGE_RENDITION_WORKERS', default=2, cast=int)
+
+# Precomputed travel matrix used by the planner (built by build_travel_matrix)
+TRAVEL_MATRIX_DIR = config('TRAVEL_MATRIX_DIR', default=str(BASE_DIR / 'travel_matrix'))
+TRAVEL_ROAD_FACTOR = 1.3
+TRAVEL_AVERAGE_SPEED_KMH = 60
+
+# Cache shared by all worker processes, so catalog invalidations, saved place
+# sets and cached sessions are seen by every worker. Production defaults to the
+# database backend (run "python manage.py createcachetable" after migrate); set
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://host:6379/0 to use Redis. Local memory is only safe
+# with a single process and is the default in development.
+CACHE_BACKEND = config(
+    'CACHE_BACKEND',
+    default='django.core.cache.backends.locmem.LocMemCache' if DEBUG else 'django.core.cache.backends.db.DatabaseCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='egyroute_cache'),
+    }
+}
+
+# Sessions are read from the cache so cached pages need no database query
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Authentication Settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
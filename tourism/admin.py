@@ -4,7 +4,7 @@ from django.utils.translation import gettext_lazy as _
 from .models import (
     Category, Governorate, TouristPlace, 
     PlaceImage, TourProgram, TourProgramDay, ContactMessage,
-    UserProfile, SavedPlace, UserTripPlan, TripPlanDay
+    UserProfile, SavedPlace, UserTripPlan, TripPlanDay, PlannerJob
 )
 
 
@@ -139,13 +139,18 @@ class TouristPlaceAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'category', 'governorate'
+        ).prefetch_related('images')
+
     def image_preview(self, obj):
         """معاينة الصورة الرئيسية"""
         main_image = obj.get_main_image()
         if main_image and main_image.image:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                main_image.image.url
+                main_image.get_rendition('thumb')['url']
             )
         return '—'
     image_preview.short_description = 'الصورة'
@@ -332,10 +337,10 @@ class TripPlanDayInline(admin.TabularInline):
 @admin.register(UserTripPlan)
 class UserTripPlanAdmin(admin.ModelAdmin):
     """لوحة تحكم خطط الرحلات"""
-    list_display = ['title', 'user', 'status', 'start_date', 'end_date', 'get_duration', 'budget', 'created_at']
+    list_display = ['title', 'user', 'status', 'start_date', 'end_date', 'get_duration', 'place_count', 'budget', 'created_at']
     list_filter = ['status', 'created_at', 'start_date']
     search_fields = ['title', 'user__username', 'description']
-    readonly_fields = ['created_at', 'updated_at', 'get_duration']
+    readonly_fields = ['created_at', 'updated_at', 'get_duration', 'place_count', 'day_count', 'total_hours']
     date_hierarchy = 'created_at'
     inlines = [TripPlanDayInline]
     
@@ -346,6 +351,9 @@ class UserTripPlanAdmin(admin.ModelAdmin):
         ('التواريخ والمدة', {
             'fields': ('start_date', 'end_date', 'get_duration')
         }),
+        ('ملخص الخطة', {
+            'fields': ('place_count', 'day_count', 'total_hours')
+        }),
         ('الميزانية', {
             'fields': ('budget',)
         }),
@@ -381,3 +389,13 @@ class TripPlanDayAdmin(admin.ModelAdmin):
             'fields': ('visit_time', 'notes', 'is_completed')
         }),
     )
+
+
+@admin.register(PlannerJob)
+class PlannerJobAdmin(admin.ModelAdmin):
+    """لوحة تحكم طلبات البرامج السياحية"""
+    list_display = ['id', 'user', 'days', 'language', 'status', 'created_at', 'finished_at']
+    list_filter = ['status', 'language', 'created_at']
+    search_fields = ['user__username']
+    readonly_fields = ['id', 'created_at', 'finished_at', 'result', 'error']
+    raw_id_fields = ['user', 'trip_plan']
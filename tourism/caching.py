@@ -0,0 +1,34 @@
+"""
+Cache helpers for catalog data
+All catalog caches are keyed on a version stamp that model signals bump,
+so any content change invalidates them without tracking individual keys.
+"""
+
+import time
+
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'tourism:catalog-version'
+
+
+def catalog_version():
+    """رقم إصدار بيانات الكتالوج الحالي"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # قيمة ابتدائية مبنية على الوقت حتى لا تتطابق مع مفاتيح قديمة بعد إفراغ الذاكرة
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """إبطال جميع بيانات الكتالوج المخزنة"""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        catalog_version()
+
+
+def catalog_key(*parts):
+    """مفتاح تخزين مرتبط بإصدار الكتالوج الحالي"""
+    return ':'.join(['tourism', f'v{catalog_version()}', *map(str, parts)])
@@ -1,5 +1,7 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .content import CONTENT
+from .saved_places import saved_place_ids
 
 
 def site_context(request):
@@ -29,4 +31,6 @@ def site_context(request):
         'content': CONTENT.get(current_lang, CONTENT['ar']),
         'is_english': current_lang == 'en',  # Helper for templates
         'is_arabic': current_lang == 'ar',   # Helper for templates
+        # تُحمَّل مرة واحدة لكل طلب (من الذاكرة المؤقتة) عند أول استخدام فقط
+        'saved_place_ids': SimpleLazyObject(lambda: saved_place_ids(request.user)),
     }
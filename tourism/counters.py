@@ -0,0 +1,117 @@
+"""
+View-count buffering for tourist places
+Collects place views in memory and applies them in one UPDATE per interval.
+A daemon thread flushes every VIEW_COUNT_FLUSH_INTERVAL seconds even when the
+worker is idle, and the buffer is flushed early once VIEW_COUNT_MAX_PENDING
+views are waiting, so at most that many views (or one interval) can be lost.
+"""
+
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+
+class ViewCountBuffer:
+    """مخزن مؤقت لعدادات المشاهدات داخل العملية"""
+
+    def __init__(self):
+        self._pending = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+
+    def record(self, place_id):
+        """تسجيل مشاهدة وتفريغ المخزن إذا انتهت المهلة أو امتلأ"""
+        self.start_flusher()
+        with self._lock:
+            self._pending[place_id] += 1
+            self._total += 1
+            due = (
+                time.monotonic() - self._last_flush >= self.flush_interval
+                or self._total >= self.max_pending
+            )
+        if due:
+            self.flush()
+
+    def start_flusher(self):
+        """تشغيل خيط خلفي يفرّغ المخزن كل flush_interval ثانية (مرة واحدة لكل عملية)"""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_periodically, name='view-count-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(max(1, self.flush_interval - (time.monotonic() - self._last_flush)))
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # تبقى المشاهدات في المخزن وتُعاد المحاولة في الدورة التالية
+                pass
+            finally:
+                close_old_connections()
+
+    def pending(self, place_id=None):
+        """عدد المشاهدات التي لم تُكتب بعد"""
+        with self._lock:
+            if place_id is None:
+                return sum(self._pending.values())
+            return self._pending.get(place_id, 0)
+
+    def flush(self):
+        """كتابة المشاهدات المعلقة في استعلام UPDATE واحد"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._total = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        from .models import TouristPlace
+
+        increment = Case(
+            *[When(pk=place_id, then=Value(count)) for place_id, count in pending.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        try:
+            TouristPlace.objects.filter(pk__in=pending.keys()).update(
+                view_count=F('view_count') + increment
+            )
+        except Exception:
+            # إعادة المشاهدات إلى المخزن حتى لا تضيع عند فشل الكتابة
+            with self._lock:
+                self._pending.update(pending)
+                self._total += sum(pending.values())
+            raise
+        return sum(pending.values())
+
+
+view_counter = ViewCountBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        pass
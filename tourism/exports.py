@@ -0,0 +1,121 @@
+"""
+Calendar (ICS) and printable exports of user trip plans
+Both formats are generators over a single streamed query, so memory use
+does not grow with the length of the plan.
+"""
+
+import datetime
+
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .trip_plans import ordered_entries
+
+ICS_LINE_LIMIT = 75
+EXPORT_CHUNK_SIZE = 200
+
+
+def plan_entries(trip_plan):
+    """عناصر الخطة مع المكان والمحافظة في استعلام واحد يُقرأ على دفعات"""
+    return ordered_entries().filter(trip_plan=trip_plan).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def plan_start_date(trip_plan):
+    """تاريخ اليوم الأول (تاريخ الإنشاء إذا لم يُحدد تاريخ البداية)"""
+    return trip_plan.start_date or timezone.localtime(trip_plan.created_at).date()
+
+
+def ics_escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def ics_fold(line):
+    """تقسيم السطر إلى أجزاء لا تتجاوز 75 بايت (RFC 5545)"""
+    parts, current, size = [], '', 0
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > ICS_LINE_LIMIT:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += length
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def ics_stream(trip_plan, lang='ar', domain='egyroute'):
+    """ملف تقويم: حدث لكل مكان، بوقت الزيارة إن وُجد وإلا حدث ليوم كامل"""
+    start_date = plan_start_date(trip_plan)
+    stamp = trip_plan.updated_at.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    yield ics_fold('BEGIN:VCALENDAR')
+    yield ics_fold('VERSION:2.0')
+    yield ics_fold(f'PRODID:-//{domain}//Trip Plans//{lang.upper()}')
+    yield ics_fold('CALSCALE:GREGORIAN')
+    yield ics_fold(f'X-WR-CALNAME:{ics_escape(trip_plan.title)}')
+    yield ics_fold(f'X-WR-TIMEZONE:{timezone.get_current_timezone_name()}')
+
+    for entry in plan_entries(trip_plan):
+        place = entry.place
+        day = start_date + datetime.timedelta(days=entry.day_number - 1)
+        yield ics_fold('BEGIN:VEVENT')
+        yield ics_fold(f'UID:trip-{trip_plan.pk}-{entry.pk}@{domain}')
+        yield ics_fold(f'DTSTAMP:{stamp}')
+        if entry.visit_time:
+            # أوقات UTC (لاحقة Z) حتى لا يحتاج التقويم تعريف VTIMEZONE للتوقيت المحلي وقواعد التوقيت الصيفي
+            start = timezone.make_aware(datetime.datetime.combine(day, entry.visit_time))
+            end = start + datetime.timedelta(hours=place.suggested_duration)
+            yield ics_fold(f'DTSTART:{start.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}')
+            yield ics_fold(f'DTEND:{end.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}')
+        else:
+            yield ics_fold(f'DTSTART;VALUE=DATE:{day:%Y%m%d}')
+            yield ics_fold(f'DTEND;VALUE=DATE:{day + datetime.timedelta(days=1):%Y%m%d}')
+        yield ics_fold(f'SUMMARY:{ics_escape(place.get_name(lang))}')
+        yield ics_fold(f'LOCATION:{ics_escape(place.governorate.get_name(lang))}')
+        if place.latitude is not None and place.longitude is not None:
+            yield ics_fold(f'GEO:{place.latitude};{place.longitude}')
+        if entry.notes:
+            yield ics_fold(f'DESCRIPTION:{ics_escape(entry.notes)}')
+        yield ics_fold('END:VEVENT')
+
+    yield ics_fold('END:VCALENDAR')
+
+
+def html_stream(trip_plan, lang='ar'):
+    """صفحة قابلة للطباعة (أو الحفظ كـ PDF من المتصفح) تُرسل يوماً بيوم"""
+    start_date = trip_plan.start_date
+    direction = 'rtl' if lang == 'ar' else 'ltr'
+    day_label = 'اليوم' if lang == 'ar' else 'Day'
+
+    yield format_html(
+        '<!DOCTYPE html><html lang="{}" dir="{}"><head><meta charset="utf-8"><title>{}</title>'
+        '<style>body{{font-family:sans-serif;margin:2em}}table{{width:100%;border-collapse:collapse;margin-bottom:1.5em}}'
+        'th,td{{border:1px solid #ccc;padding:.4em;text-align:start}}h2{{page-break-after:avoid}}</style></head>'
+        '<body onload="window.print()"><h1>{}</h1><p>{}</p>',
+        lang, direction, trip_plan.title, trip_plan.title, trip_plan.description,
+    )
+
+    current_day = None
+    for entry in plan_entries(trip_plan):
+        if entry.day_number != current_day:
+            if current_day is not None:
+                yield '</tbody></table>'
+            current_day = entry.day_number
+            date = ''
+            if start_date:
+                date = (start_date + datetime.timedelta(days=current_day - 1)).strftime(' - %Y/%m/%d')
+            yield format_html('<h2>{} {}{}</h2><table><tbody>', day_label, current_day, date)
+        place = entry.place
+        yield format_html(
+            '<tr><td>{}</td><td><strong>{}</strong><br><small>{}</small></td><td>{}</td></tr>',
+            entry.visit_time.strftime('%H:%M') if entry.visit_time else '',
+            place.get_name(lang),
+            place.governorate.get_name(lang),
+            entry.notes,
+        )
+    if current_day is not None:
+        yield '</tbody></table>'
+    yield '</body></html>'
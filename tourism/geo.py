@@ -0,0 +1,166 @@
+"""
+Spatial helpers for tourist places
+Places are bucketed into a fixed lat/lng grid (TouristPlace.geo_cell) so
+radius and nearest-neighbour queries read a few indexed cell ranges
+instead of computing distances over the whole table.
+"""
+
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+
+# حجم خلية الشبكة بالدرجات (0.1° ≈ 11 كم)
+CELL_SIZE = 0.1
+GRID_COLUMNS = int(round(360 / CELL_SIZE))
+GRID_ROWS = int(round(180 / CELL_SIZE))
+
+# أقصى نصف قطر يبحث فيه nearest قبل التوقف
+MAX_NEAREST_RADIUS_KM = 500
+
+# أقصى عدد نطاقات خلايا في استعلام واحد (فوقه يُستخدم نطاق واحد متصل)
+MAX_CELL_RANGES = 32
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """المسافة بالكيلومترات بين نقطتين"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cell_row(lat):
+    return min(GRID_ROWS - 1, max(0, int(math.floor((float(lat) + 90) / CELL_SIZE))))
+
+
+def cell_column(lng):
+    return min(GRID_COLUMNS - 1, max(0, int(math.floor((float(lng) + 180) / CELL_SIZE))))
+
+
+def cell_for(lat, lng):
+    """رقم خلية الشبكة لنقطة، أو None إذا لم تُحدد الإحداثيات"""
+    if lat is None or lng is None:
+        return None
+    return cell_row(lat) * GRID_COLUMNS + cell_column(lng)
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) حول نقطة"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (
+        max(-90.0, lat - dlat), max(-180.0, lng - dlng),
+        min(90.0, lat + dlat), min(180.0, lng + dlng),
+    )
+
+
+def cell_ranges(min_lat, min_lng, max_lat, max_lng):
+    """نطاقات أرقام الخلايا (صف واحد لكل نطاق) التي تغطي مستطيلاً"""
+    first_column, last_column = cell_column(min_lng), cell_column(max_lng)
+    return [
+        (row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column)
+        for row in range(cell_row(min_lat), cell_row(max_lat) + 1)
+    ]
+
+
+def filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """تقييد الاستعلام بمستطيل باستخدام فهرس geo_cell"""
+    ranges = cell_ranges(min_lat, min_lng, max_lat, max_lng)
+    if len(ranges) > MAX_CELL_RANGES:
+        # مستطيل طويل جداً: نطاق واحد من أول خلية إلى آخر خلية بدلاً من شرط لكل صف
+        cells = Q(geo_cell__range=(ranges[0][0], ranges[-1][1]))
+    else:
+        cells = Q()
+        for start, end in ranges:
+            cells |= Q(geo_cell__range=(start, end))
+    return queryset.filter(
+        cells,
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def _active_places():
+    from .models import TouristPlace
+    return TouristPlace.objects.filter(is_active=True, geo_cell__isnull=False)
+
+
+def within_radius(lat, lng, radius_km, queryset=None, exclude=None):
+    """المواقع داخل نصف قطر معين، مرتبة حسب المسافة: [(place, distance_km)]"""
+    lat, lng = float(lat), float(lng)
+    queryset = _active_places() if queryset is None else queryset
+    if exclude is not None:
+        queryset = queryset.exclude(pk=exclude)
+    results = []
+    for place in filter_bbox(queryset, *bounding_box(lat, lng, radius_km)):
+        distance = haversine_km(lat, lng, float(place.latitude), float(place.longitude))
+        if distance <= radius_km:
+            results.append((place, distance))
+    results.sort(key=lambda item: item[1])
+    return results
+
+
+def nearest(lat, lng, k, queryset=None, exclude=None, max_radius_km=MAX_NEAREST_RADIUS_KM):
+    """أقرب k مواقع، بتوسيع نصف القطر تدريجياً: [(place, distance_km)]"""
+    radius = 10.0
+    while True:
+        results = within_radius(lat, lng, radius, queryset, exclude)
+        if len(results) >= k or radius >= max_radius_km:
+            return results[:k]
+        radius = min(radius * 3, max_radius_km)
+
+
+def cluster_factor(zoom, pixels=64):
+    """
+    عدد خلايا الشبكة في ضلع خلية التجميع عند مستوى تكبير معين
+    (قوة للعدد 2 حتى تتداخل المستويات بشكل منتظم)
+    """
+    degrees = 360 / (2 ** zoom) * pixels / 256
+    return 2 ** max(0, math.ceil(math.log2(degrees / CELL_SIZE)))
+
+
+def snap_bbox(min_lat, min_lng, max_lat, max_lng, factor):
+    """توسيع المستطيل إلى حدود خلايا التجميع حتى تتشارك الطلبات المتقاربة نفس النتيجة"""
+    size = CELL_SIZE * factor
+    return (
+        max(-90.0, math.floor((min_lat + 90) / size) * size - 90),
+        max(-180.0, math.floor((min_lng + 180) / size) * size - 180),
+        min(90.0, math.ceil((max_lat + 90) / size) * size - 90),
+        min(180.0, math.ceil((max_lng + 180) / size) * size - 180),
+    )
+
+
+def cell_counts(queryset):
+    """عدد المواقع ومتوسط إحداثياتها لكل خلية: {cell: (count, lat, lng)}"""
+    from django.db.models import Avg, Count
+    rows = queryset.filter(geo_cell__isnull=False).values('geo_cell').annotate(
+        count=Count('id'), lat=Avg('latitude'), lng=Avg('longitude')
+    ).order_by()
+    return {
+        row['geo_cell']: (row['count'], float(row['lat']), float(row['lng']))
+        for row in rows
+    }
+
+
+def clusters(counts, min_lat, min_lng, max_lat, max_lng, factor):
+    """
+    تجميع خلايا الشبكة داخل المستطيل في خلايا أكبر (factor × factor)
+    يعيد [(count, lat, lng)] حيث الإحداثيات متوسط مواقع المجموعة
+    """
+    first_row, last_row = cell_row(min_lat), cell_row(max_lat)
+    first_column, last_column = cell_column(min_lng), cell_column(max_lng)
+    groups = {}
+    for cell, (count, lat, lng) in counts.items():
+        row, column = divmod(cell, GRID_COLUMNS)
+        if not (first_row <= row <= last_row and first_column <= column <= last_column):
+            continue
+        group = groups.setdefault((row // factor, column // factor), [0, 0.0, 0.0])
+        group[0] += count
+        group[1] += lat * count
+        group[2] += lng * count
+    return [(count, lat / count, lng / count) for count, lat, lng in groups.values()]
@@ -0,0 +1,205 @@
+"""
+Bulk import of place images from a directory or a manifest
+Files are hashed in parallel to skip duplicates, then saved and rendered in
+a thread pool; the PlaceImage rows are inserted with a single bulk_create.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from . import images
+from .caching import bump_catalog_version
+from .models import PlaceImage, TouristPlace
+
+# أخطاء Pillow عند فتح ملف تالف: verify() يرفع SyntaxError لملفات PNG المقطوعة
+IMAGE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'نعم'}
+
+
+class ImportSourceError(ValueError):
+    """مصدر استيراد غير صالح"""
+
+
+@dataclass
+class ImportEntry:
+    """ملف واحد في عملية الاستيراد"""
+    path: Path
+    place: str
+    caption: str = ''
+    caption_en: str = ''
+    is_main: bool = False
+    order: int = 0
+
+
+def _is_true(value):
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def directory_entries(directory):
+    """مجلد فيه مجلد فرعي لكل موقع باسم الرابط (slug): places/<slug>/*.jpg"""
+    entries = []
+    for place_dir in sorted(p for p in Path(directory).iterdir() if p.is_dir()):
+        files = sorted(p for p in place_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        entries += [ImportEntry(path=path, place=place_dir.name, order=i) for i, path in enumerate(files)]
+    return entries
+
+
+def manifest_entries(manifest):
+    """
+    ملف CSV أو JSON بالأعمدة: file, place, caption, caption_en, is_main, order
+    مسارات الملفات نسبية إلى مجلد الملف
+    """
+    manifest = Path(manifest)
+    with open(manifest, encoding='utf-8-sig', newline='') as f:
+        if manifest.suffix.lower() == '.json':
+            rows = json.load(f)
+        elif manifest.suffix.lower() == '.csv':
+            rows = list(csv.DictReader(f))
+        else:
+            raise ImportSourceError('صيغة الملف غير مدعومة (CSV أو JSON فقط)')
+    if not isinstance(rows, list):
+        raise ImportSourceError('يجب أن يحتوي الملف على قائمة')
+
+    entries = []
+    for index, row in enumerate(rows):
+        try:
+            entries.append(ImportEntry(
+                path=manifest.parent / row['file'],
+                place=str(row['place']).strip(),
+                caption=row.get('caption') or '',
+                caption_en=row.get('caption_en') or '',
+                is_main=_is_true(row.get('is_main', '')),
+                order=int(row.get('order') or index),
+            ))
+        except (KeyError, TypeError, ValueError):
+            raise ImportSourceError(f'السطر {index + 1}: الحقلان file و place مطلوبان') from None
+    return entries
+
+
+def load_entries(source):
+    source = Path(source)
+    if source.is_dir():
+        return directory_entries(source)
+    if source.is_file():
+        return manifest_entries(source)
+    raise ImportSourceError(f'المصدر غير موجود: {source}')
+
+
+def _hash(entry):
+    """بصمة الملف وحجمه بقراءته على أجزاء (يُنفَّذ في الخلفية)"""
+    digest = hashlib.sha256()
+    try:
+        with open(entry.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+            size = f.tell()
+    except OSError as exc:
+        return entry, None, 0, str(exc)
+    return entry, digest.hexdigest(), size, None
+
+
+def _process(entry, place_id):
+    """حفظ الأصل وتوليد الأحجام، ويعيد PlaceImage غير محفوظ (يُنفَّذ في الخلفية)"""
+    field = PlaceImage._meta.get_field('image')
+    try:
+        data = entry.path.read_bytes()
+        with Image.open(io.BytesIO(data)) as probe:
+            probe.verify()
+        name = field.storage.save(field.generate_filename(None, entry.path.name), ContentFile(data))
+    except IMAGE_ERRORS as exc:
+        return None, f'{entry.path}: {exc}'
+    try:
+        renditions, (width, height), lqip = images.render(io.BytesIO(data), name, field.storage)
+    except IMAGE_ERRORS as exc:
+        field.storage.delete(name)
+        return None, f'{entry.path}: {exc}'
+    return PlaceImage(
+        place_id=place_id, image=name, caption=entry.caption[:200], caption_en=entry.caption_en[:200],
+        is_main=entry.is_main, order=entry.order, renditions=renditions,
+        width=width, height=height, placeholder=lqip, checksum=images.checksum(data),
+    ), None
+
+
+def _delete_files(place_images):
+    for place_image in place_images:
+        storage = place_image.image.storage
+        images.delete_renditions(place_image.renditions, storage)
+        storage.delete(place_image.image.name)
+
+
+def import_images(entries, workers=4):
+    """
+    استيراد الملفات وإرجاع ملخص:
+    {'created', 'duplicates', 'errors': [...], 'bytes'}
+    """
+    errors = []
+    places = dict(TouristPlace.objects.filter(slug__in={e.place for e in entries}).values_list('slug', 'pk'))
+    for entry in entries:
+        if entry.place not in places:
+            errors.append(f'{entry.path}: الموقع غير موجود ({entry.place})')
+    entries = [entry for entry in entries if entry.place in places]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-import') as executor:
+        # البصمات أولاً لاستبعاد المكرر (في الملفات أو في قاعدة البيانات) قبل أي معالجة
+        hashed = list(executor.map(_hash, entries))
+        errors += [f'{entry.path}: {error}' for entry, _, _, error in hashed if error]
+        hashed = [item for item in hashed if not item[3]]
+        known = set(PlaceImage.objects.filter(
+            checksum__in={digest for _, digest, _, _ in hashed}
+        ).values_list('checksum', flat=True))
+        unique, duplicates, total_bytes = [], 0, 0
+        for entry, digest, size, _ in hashed:
+            if digest in known:
+                duplicates += 1
+                continue
+            known.add(digest)
+            unique.append(entry)
+            total_bytes += size
+
+        results = list(executor.map(lambda entry: _process(entry, places[entry.place]), unique))
+
+    new_images = [place_image for place_image, _ in results if place_image]
+    errors += [error for _, error in results if error]
+
+    # صورة رئيسية واحدة لكل موقع (آخر صورة في الملف)
+    main_places = {}
+    for place_image in new_images:
+        if place_image.is_main:
+            if place_image.place_id in main_places:
+                main_places[place_image.place_id].is_main = False
+            main_places[place_image.place_id] = place_image
+
+    try:
+        with transaction.atomic():
+            if main_places:
+                PlaceImage.objects.filter(place_id__in=main_places, is_main=True).update(is_main=False)
+            PlaceImage.objects.bulk_create(new_images, batch_size=500)
+    except Exception:
+        # لا نترك ملفات محفوظة بلا سجلات في قاعدة البيانات
+        _delete_files(new_images)
+        raise
+    if new_images:
+        bump_catalog_version()
+
+    return {
+        'created': len(new_images),
+        'duplicates': duplicates,
+        'errors': errors,
+        'bytes': total_bytes,
+    }
+
+
+def default_workers():
+    return min(8, (os.cpu_count() or 1) + 1)
@@ -0,0 +1,228 @@
+"""
+Fixed-size renditions of place images
+Every uploaded PlaceImage gets card, gallery, hero and admin thumbnail
+renditions in WebP and JPEG, plus a few extra widths of each for srcset,
+generated with Pillow in a local thread pool after the upload is committed.
+Paths and dimensions are stored in PlaceImage.renditions so templates never
+send the original photo; the original's dimensions and a tiny blurred
+placeholder are stored on the image itself so pages lay out before loading.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# الاسم: (العرض، الارتفاع، قص لملء الأبعاد أو احتواء داخلها)
+RENDITIONS = {
+    'hero': (1600, 900, False),
+    'gallery': (1200, 900, False),
+    'card': (480, 300, True),
+    'thumb': (120, 120, True),
+}
+# عروض إضافية بنفس نسبة الأبعاد لـ srcset (لا تُولَّد إذا كانت الصورة الأصلية أصغر)
+SRCSET_WIDTHS = {
+    'hero': (800, 1200),
+    'gallery': (600,),
+    'card': (320, 720),
+    'thumb': (),
+}
+
+# قيمة sizes الافتراضية لكل حجم (تتوافق مع أعمدة القوالب)
+DEFAULT_SIZES = {
+    'hero': '(min-width: 992px) 66vw, 100vw',
+    'gallery': '(min-width: 992px) 66vw, 100vw',
+    'card': '(min-width: 768px) 33vw, 100vw',
+    'thumb': '120px',
+}
+
+PLACEHOLDER_SIZE = 16
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+RENDITIONS_DIR = 'renditions'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_mode():
+    """'thread' للتوليد في الخلفية أو 'inline' للتوليد داخل الطلب (الاختبارات)"""
+    return getattr(settings, 'IMAGE_RENDITION_MODE', 'thread')
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+                thread_name_prefix='image-renditions',
+            )
+    return _executor
+
+
+def rendition_path(source_name, name, extension):
+    """renditions/places/2026/10/photo-card.webp (أو photo-card-320.webp للعروض الإضافية)"""
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(RENDITIONS_DIR, directory, f'{stem}-{name}.{extension}')
+
+
+def checksum(data):
+    """بصمة محتوى الملف (لتجنب استيراد الصورة نفسها مرتين)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def placeholder(image):
+    """صورة صغيرة جداً ومموّهة (data URI) تُعرض خلف الصورة حتى تكتمل"""
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, 'JPEG', quality=50)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def _resize(image, width, height, crop):
+    """تصغير الصورة (بدون تكبير): قص لملء الأبعاد أو احتواء داخلها"""
+    if crop:
+        scale = min(1.0, max(width / image.width, height / image.height))
+        size = (min(width, round(image.width * scale)), min(height, round(image.height * scale)))
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    result = image.copy()
+    result.thumbnail((width, height), Image.LANCZOS, reducing_gap=3.0)
+    return result
+
+
+def _open(file):
+    """فتح الصورة بالاتجاه الصحيح وبألوان RGB، مع أبعاد الأصل (بعد التدوير)"""
+    image = Image.open(file)
+    size = image.size
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+        size = size[::-1]
+    largest = max(w for w, _, _ in RENDITIONS.values()), max(h for _, h, _ in RENDITIONS.values())
+    # فك ترميز JPEG بدقة مخفّضة مباشرة إذا كانت الصورة أكبر بكثير من المطلوب
+    image.draft('RGB', largest)
+    return _to_rgb(ImageOps.exif_transpose(image)), size
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save_formats(image, source_name, name, storage):
+    data = {'width': image.width, 'height': image.height}
+    for extension, (image_format, options) in FORMATS.items():
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, **options)
+        path = rendition_path(source_name, name, extension)
+        if storage.exists(path):
+            storage.delete(path)
+        data[extension] = storage.save(path, ContentFile(buffer.getvalue()))
+    return data
+
+
+def render(file, source_name, storage=None):
+    """
+    توليد كل الأحجام والصيغ لصورة وحفظها
+    يعيد (الأحجام، أبعاد الأصل، الصورة المموّهة) حيث الأحجام:
+    {الاسم: {width, height, webp, jpeg, srcset: [{width, height, webp, jpeg}, ...]}}
+    """
+    storage = storage or default_storage
+    renditions = {'source': source_name}
+    image, size = _open(file)
+    with image:
+        for name, (width, height, crop) in RENDITIONS.items():
+            resized = _resize(image, width, height, crop)
+            data = _save_formats(resized, source_name, name, storage)
+            data['srcset'] = []
+            for variant_width in SRCSET_WIDTHS[name]:
+                variant_height = round(variant_width * resized.height / resized.width)
+                variant = _resize(image, variant_width, variant_height, crop)
+                if variant.width != variant_width or variant_width == resized.width:
+                    continue
+                data['srcset'].append(_save_formats(variant, source_name, f'{name}-{variant_width}', storage))
+            renditions[name] = data
+        lqip = placeholder(image)
+    return renditions, size, lqip
+
+
+def rendition_files(renditions):
+    files = []
+    for name, data in renditions.items():
+        if name not in RENDITIONS:
+            continue
+        for variant in [data, *data.get('srcset', [])]:
+            files += [variant[extension] for extension in FORMATS if extension in variant]
+    return files
+
+
+def delete_renditions(renditions, storage=None):
+    storage = storage or default_storage
+    for path in rendition_files(renditions or {}):
+        storage.delete(path)
+
+
+def generate(image_id):
+    """توليد أحجام صورة واحدة وتخزين مساراتها وأبعادها"""
+    from .caching import bump_catalog_version
+    from .models import PlaceImage
+
+    place_image = PlaceImage.objects.filter(pk=image_id).only('image', 'renditions').first()
+    if place_image is None or not place_image.image:
+        return None
+    source_name = place_image.image.name
+    try:
+        with place_image.image.open('rb') as file:
+            data = file.read()
+        renditions, (width, height), lqip = render(io.BytesIO(data), source_name, place_image.image.storage)
+    except (OSError, Image.DecompressionBombError):
+        logger.exception('Could not generate renditions for image %s', image_id)
+        return None
+
+    # الصورة قد تكون استُبدلت أثناء التوليد
+    updated = PlaceImage.objects.filter(pk=image_id, image=source_name).update(
+        renditions=renditions, width=width, height=height, placeholder=lqip, checksum=checksum(data)
+    )
+    if not updated:
+        delete_renditions(renditions, place_image.image.storage)
+        return None
+    if place_image.renditions.get('source') not in (None, source_name):
+        delete_renditions(place_image.renditions, place_image.image.storage)
+    bump_catalog_version()
+    return renditions
+
+
+def _generate_in_thread(image_id):
+    close_old_connections()
+    try:
+        generate(image_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(image_id):
+    """جدولة توليد الأحجام بعد حفظ الصورة في قاعدة البيانات"""
+    if rendition_mode() == 'inline':
+        generate(image_id)
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_generate_in_thread, image_id))
@@ -0,0 +1,88 @@
+"""
+Background execution of tour planner jobs
+Long itineraries are computed in a local thread pool so the request that
+submits them returns immediately; the result is stored on the PlannerJob.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_mode():
+    """'thread' للتنفيذ في الخلفية أو 'inline' للتنفيذ داخل الطلب (الاختبارات)"""
+    return getattr(settings, 'PLANNER_JOB_MODE', 'thread')
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PLANNER_JOB_WORKERS', 2),
+                thread_name_prefix='planner-job',
+            )
+    return _executor
+
+
+def submit(job):
+    """جدولة تنفيذ الطلب بعد حفظه في قاعدة البيانات"""
+    if job_mode() == 'inline':
+        run_job(job.pk)
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_job(job_id):
+    """تنفيذ طلب واحد وتخزين النتيجة (معرّفات المواقع فقط)"""
+    from .models import Category, PlannerJob
+    from .planner import get_tour_program, serialize_program
+
+    updated = PlannerJob.objects.filter(pk=job_id, status='pending').update(status='running')
+    if not updated:
+        return
+    try:
+        job = PlannerJob.objects.get(pk=job_id)
+        categories = Category.objects.filter(pk__in=job.category_ids)
+        program = get_tour_program(job.days, categories, job.language)
+        # الطلب قد يكون اعتُبر منتهي المهلة أثناء التنفيذ
+        PlannerJob.objects.filter(pk=job_id, status='running').update(
+            status='done', result=serialize_program(program), finished_at=timezone.now()
+        )
+    except Exception as e:
+        logger.exception('Planner job %s failed', job_id)
+        PlannerJob.objects.filter(pk=job_id, status='running').update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+
+
+def expire_stale(job):
+    """اعتبار الطلب فاشلاً إذا تجاوز المهلة (مثلاً بعد إعادة تشغيل الخادم)"""
+    from .models import PlannerJob
+
+    timeout = getattr(settings, 'PLANNER_JOB_TIMEOUT', 300)
+    if not job.is_finished and job.created_at < timezone.now() - timedelta(seconds=timeout):
+        # تحديث مشروط حتى لا يُستبدل طلب انتهى للتو
+        PlannerJob.objects.filter(pk=job.pk, status__in=['pending', 'running']).update(
+            status='failed', error='timeout', finished_at=timezone.now()
+        )
+        job.refresh_from_db(fields=['status', 'error', 'finished_at'])
+    return job
@@ -0,0 +1,18 @@
+"""
+Management command to rebuild the related places recommendations
+Additions are applied incrementally; run this periodically (e.g. nightly
+from cron) to account for removals and refresh the category fallback:
+    python manage.py build_recommendations
+"""
+
+from django.core.management.base import BaseCommand
+
+from tourism import recommendations
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب المواقع المرتبطة من المحفوظات وخطط الرحلات'
+
+    def handle(self, *args, **options):
+        pairs = recommendations.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✅ تم حساب المواقع المرتبطة ({pairs} زوج)'))
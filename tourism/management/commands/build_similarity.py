@@ -0,0 +1,25 @@
+"""
+Management command to update the content similarity index
+Only places saved since their vector was built are re-tokenized; run it
+periodically from cron, with --full after changing the weighting:
+    python manage.py build_similarity [--full]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tourism import similarity
+
+
+class Command(BaseCommand):
+    help = 'تحديث فهرس تشابه المحتوى بين المواقع السياحية'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='إعادة حساب كل المتجهات والقوائم')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = similarity.update(full=options['full'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ تم تحديث المواقع المشابهة لـ {updated} موقع في {elapsed:.1f} ثانية'))
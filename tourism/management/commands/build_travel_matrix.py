@@ -0,0 +1,23 @@
+"""
+Management command to build the planner travel matrix
+Usage:
+    python manage.py build_travel_matrix
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tourism.travel_matrix import travel_matrix
+
+
+class Command(BaseCommand):
+    help = 'بناء مصفوفة المسافات بين المواقع السياحية النشطة'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = travel_matrix.build()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ تم بناء مصفوفة {total}×{total} في {elapsed:.2f} ثانية ({travel_matrix.directory})'
+        ))
@@ -0,0 +1,45 @@
+"""
+Management command to generate missing place image renditions
+New uploads are handled automatically; use this for existing images
+(including ones still missing a checksum) or after changing the rendition sizes:
+    python manage.py generate_image_renditions [--all] [--workers 4]
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tourism import images
+from tourism.models import PlaceImage
+
+
+def _generate(image_id):
+    close_old_connections()
+    try:
+        return images.generate(image_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'توليد الأحجام المصغرة لصور المواقع السياحية'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='إعادة توليد كل الصور')
+        parser.add_argument('--workers', type=int, default=4, help='عدد العمليات المتوازية')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ids = [
+            pk for pk, name, renditions, placeholder, checksum in PlaceImage.objects.values_list(
+                'pk', 'image', 'renditions', 'placeholder', 'checksum'
+            )
+            if options['all'] or (renditions or {}).get('source') != name or not placeholder or not checksum
+        ]
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(_generate, ids))
+        done = sum(1 for result in results if result)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ تم توليد أحجام {done} من {len(ids)} صورة في {elapsed:.1f} ثانية'))
@@ -0,0 +1,43 @@
+"""
+Management command to import place images in bulk
+The source is either a directory with one sub-directory per place slug
+(places/<slug>/*.jpg) or a CSV/JSON manifest with the columns
+file, place, caption, caption_en, is_main and order:
+    python manage.py import_place_images photos/luxor/ --workers 8
+    python manage.py import_place_images photos/luxor.csv
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tourism import image_import
+
+
+class Command(BaseCommand):
+    help = 'استيراد صور المواقع السياحية دفعة واحدة من مجلد أو ملف CSV/JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='مجلد الصور أو ملف CSV/JSON')
+        parser.add_argument('--workers', type=int, default=image_import.default_workers(), help='عدد العمليات المتوازية')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            entries = image_import.load_entries(options['source'])
+        except (image_import.ImportSourceError, OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        summary = image_import.import_images(entries, workers=max(1, options['workers']))
+        elapsed = max(time.perf_counter() - started, 1e-6)
+
+        for error in summary['errors']:
+            self.stderr.write(self.style.WARNING(f'⚠ {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ تم استيراد {summary["created"]} صورة من {len(entries)} '
+            f'(مكررة: {summary["duplicates"]}، أخطاء: {len(summary["errors"])}) في {elapsed:.1f} ثانية'
+        ))
+        self.stdout.write(
+            f'   {summary["created"] / elapsed:.1f} صورة/ثانية، '
+            f'{summary["bytes"] / elapsed / (1024 * 1024):.1f} ميجابايت/ثانية'
+        )
@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the full-text search index
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tourism import search
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث النصي للمواقع السياحية'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(
+                self.style.WARNING(f'⚠️ قاعدة البيانات ({connection.vendor}) لا تدعم الفهرس النصي')
+            )
+            return
+
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'✅ تمت فهرسة {total} موقع'))
@@ -0,0 +1,17 @@
+"""
+Management command to refresh the trending score of tourist places
+Run it periodically (e.g. every 15 minutes from cron):
+    python manage.py refresh_trending
+"""
+
+from django.core.management.base import BaseCommand
+
+from tourism import trending
+
+
+class Command(BaseCommand):
+    help = 'تحديث مؤشر الرواج للمواقع السياحية'
+
+    def handle(self, *args, **options):
+        updated = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(f'✅ تم تحديث مؤشر الرواج ({updated} موقع بنشاط جديد)'))
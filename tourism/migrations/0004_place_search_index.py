@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from tourism import search
+
+    conn = schema_editor.connection
+    if not search.is_supported(conn):
+        return
+    TouristPlace = apps.get_model('tourism', 'TouristPlace')
+    search.rebuild_index(TouristPlace.objects.filter(is_active=True), conn=conn)
+
+
+def drop_search_index(apps, schema_editor):
+    from tourism import search
+
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0003_category_description_en_placeimage_caption_en_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
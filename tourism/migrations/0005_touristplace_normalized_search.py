@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+def populate_normalized_fields(apps, schema_editor):
+    from tourism import search
+
+    TouristPlace = apps.get_model('tourism', 'TouristPlace')
+    places = list(TouristPlace.objects.all())
+    for place in places:
+        place.name_normalized = search.normalize_text(place.name)[:200]
+        place.city_normalized = search.normalize_text(place.city)[:100]
+        place.description_normalized = search.normalize_text(place.description)
+    TouristPlace.objects.bulk_update(
+        places,
+        ['name_normalized', 'city_normalized', 'description_normalized'],
+        batch_size=500
+    )
+
+    # إعادة بناء الفهرس النصي بالنصوص الموحّدة
+    search.rebuild_index(TouristPlace.objects.filter(is_active=True), conn=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0004_place_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristplace',
+            name='city_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='المدينة (للبحث)'),
+        ),
+        migrations.AddField(
+            model_name='touristplace',
+            name='description_normalized',
+            field=models.TextField(blank=True, editable=False, verbose_name='الوصف (للبحث)'),
+        ),
+        migrations.AddField(
+            model_name='touristplace',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200, verbose_name='الاسم (للبحث)'),
+        ),
+        migrations.RunPython(populate_normalized_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+def populate_geo_cells(apps, schema_editor):
+    from tourism.geo import cell_for
+
+    TouristPlace = apps.get_model('tourism', 'TouristPlace')
+    places = list(TouristPlace.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for place in places:
+        place.geo_cell = cell_for(place.latitude, place.longitude)
+    TouristPlace.objects.bulk_update(places, ['geo_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0005_touristplace_normalized_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristplace',
+            name='geo_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='خلية الشبكة الجغرافية'),
+        ),
+        migrations.RunPython(populate_geo_cells, migrations.RunPython.noop),
+    ]
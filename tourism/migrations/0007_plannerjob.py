@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tourism', '0006_touristplace_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannerJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('days', models.PositiveIntegerField(verbose_name='عدد الأيام')),
+                ('category_ids', models.JSONField(default=list, verbose_name='الأقسام')),
+                ('language', models.CharField(default='ar', max_length=10, verbose_name='اللغة')),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('done', 'مكتمل'), ('failed', 'فشل')], default='pending', max_length=20, verbose_name='الحالة')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='النتيجة')),
+                ('error', models.TextField(blank=True, verbose_name='الخطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الانتهاء')),
+                ('trip_plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='planner_jobs', to='tourism.usertripplan')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='planner_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'طلب برنامج سياحي',
+                'verbose_name_plural': 'طلبات البرامج السياحية',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
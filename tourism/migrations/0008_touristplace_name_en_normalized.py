@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+def populate_name_en_normalized(apps, schema_editor):
+    from tourism import search
+
+    TouristPlace = apps.get_model('tourism', 'TouristPlace')
+    places = list(TouristPlace.objects.only('id', 'name_en'))
+    for place in places:
+        place.name_en_normalized = search.normalize_text(place.name_en)[:200]
+    TouristPlace.objects.bulk_update(places, ['name_en_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0007_plannerjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristplace',
+            name='name_en_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200, verbose_name='الاسم بالإنجليزية (للبحث)'),
+        ),
+        migrations.RunPython(populate_name_en_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:46
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_summaries(apps, schema_editor):
+    UserTripPlan = apps.get_model('tourism', 'UserTripPlan')
+    TripPlanDay = apps.get_model('tourism', 'TripPlanDay')
+    plans = list(UserTripPlan.objects.annotate(
+        entries=Count('days'),
+        days_planned=Count('days__day_number', distinct=True),
+        hours=Sum('days__place__suggested_duration'),
+    ))
+    governorates = {}
+    for plan_id, name, name_en in TripPlanDay.objects.values_list(
+        'trip_plan_id', 'place__governorate__name', 'place__governorate__name_en'
+    ).distinct().order_by('trip_plan_id', 'place__governorate__name'):
+        governorates.setdefault(plan_id, []).append({'name': name, 'name_en': name_en})
+    for plan in plans:
+        plan.place_count = plan.entries
+        plan.day_count = plan.days_planned
+        plan.total_hours = plan.hours or 0
+        plan.governorates_summary = governorates.get(plan.pk, [])
+    UserTripPlan.objects.bulk_update(
+        plans, ['place_count', 'day_count', 'total_hours', 'governorates_summary'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0008_touristplace_name_en_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertripplan',
+            name='day_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الأيام'),
+        ),
+        migrations.AddField(
+            model_name='usertripplan',
+            name='governorates_summary',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='المحافظات'),
+        ),
+        migrations.AddField(
+            model_name='usertripplan',
+            name='place_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الأماكن'),
+        ),
+        migrations.AddField(
+            model_name='usertripplan',
+            name='total_hours',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='إجمالي الساعات المقترحة'),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0009_usertripplan_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField(db_index=True, verbose_name='وقت التحديث')),
+                ('places_updated', models.PositiveIntegerField(default=0, verbose_name='المواقع المحدّثة')),
+            ],
+            options={
+                'verbose_name': 'تحديث مؤشر الرواج',
+                'verbose_name_plural': 'تحديثات مؤشر الرواج',
+                'ordering': ['-refreshed_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='touristplace',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='مؤشر الرواج'),
+        ),
+        migrations.AddField(
+            model_name='touristplace',
+            name='trending_views_seen',
+            field=models.IntegerField(default=0, editable=False, verbose_name='المشاهدات المحتسبة في الرواج'),
+        ),
+        migrations.AddField(
+            model_name='tripplanday',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='تاريخ الإضافة'),
+        ),
+        migrations.AddIndex(
+            model_name='touristplace',
+            index=models.Index(fields=['-trending_score', 'id'], name='place_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristplace',
+            index=models.Index(fields=['category', '-trending_score', 'id'], name='place_cat_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristplace',
+            index=models.Index(fields=['-view_count', 'id'], name='place_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristplace',
+            index=models.Index(fields=['category', '-view_count', 'id'], name='place_cat_popular_idx'),
+        ),
+    ]
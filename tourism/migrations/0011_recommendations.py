@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0010_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristplace',
+            name='related_place_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='المواقع المرتبطة'),
+        ),
+        migrations.CreateModel(
+            name='PlaceCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='العدد')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tourism.touristplace')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tourism.touristplace')),
+            ],
+            options={
+                'verbose_name': 'تزامن موقعين',
+                'verbose_name_plural': 'تزامن المواقع',
+                'unique_together': {('place', 'related')},
+            },
+        ),
+    ]
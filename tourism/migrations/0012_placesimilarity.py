@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0011_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceSimilarity',
+            fields=[
+                ('place', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity', serialize=False, to='tourism.touristplace')),
+                ('features', models.JSONField(default=list, verbose_name='المتجه')),
+                ('digest', models.CharField(max_length=40, verbose_name='بصمة المحتوى')),
+                ('neighbours', models.JSONField(default=list, verbose_name='المواقع المشابهة')),
+                ('indexed_at', models.DateTimeField(verbose_name='وقت الفهرسة')),
+            ],
+            options={
+                'verbose_name': 'تشابه المحتوى',
+                'verbose_name_plural': 'تشابه المحتوى',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0012_placesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='الأحجام المولّدة'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0013_placeimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='الارتفاع'),
+        ),
+        migrations.AddField(
+            model_name='placeimage',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='صورة مموّهة مؤقتة'),
+        ),
+        migrations.AddField(
+            model_name='placeimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='العرض'),
+        ),
+    ]
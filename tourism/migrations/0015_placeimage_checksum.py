@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0014_placeimage_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeimage',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='بصمة الملف'),
+        ),
+    ]
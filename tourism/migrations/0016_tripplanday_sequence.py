@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0015_placeimage_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripplanday',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='الترتيب في اليوم'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:30
+
+import hashlib
+
+from django.db import migrations
+
+
+def populate_checksums(apps, schema_editor):
+    PlaceImage = apps.get_model('tourism', 'PlaceImage')
+    images = []
+    for place_image in PlaceImage.objects.filter(checksum='').exclude(image='').only('id', 'image').iterator():
+        digest = hashlib.sha256()
+        try:
+            with place_image.image.open('rb') as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except OSError:
+            # الملف غير موجود في التخزين: تُملأ البصمة عند إعادة توليد الأحجام
+            continue
+        place_image.checksum = digest.hexdigest()
+        images.append(place_image)
+    PlaceImage.objects.bulk_update(images, ['checksum'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0016_tripplanday_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_checksums, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,14 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from tinymce.models import HTMLField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from .search import normalize_text
+from .geo import cell_for
 
 
 class Category(models.Model):
@@ -135,6 +140,13 @@ class TouristPlace(models.Model):
         blank=True,
         help_text='مثال: 31.233889'
     )
+    geo_cell = models.BigIntegerField(
+        'خلية الشبكة الجغرافية',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
     
     # Visit information
     suggested_duration = models.IntegerField(
@@ -185,6 +197,19 @@ class TouristPlace(models.Model):
     
     view_count = models.IntegerField('عدد المشاهدات', default=0, editable=False)
     
+    # مؤشر الرواج (يتلاشى مع الوقت) يُحدَّث دورياً بأمر refresh_trending
+    trending_score = models.FloatField('مؤشر الرواج', default=0, editable=False)
+    trending_views_seen = models.IntegerField('المشاهدات المحتسبة في الرواج', default=0, editable=False)
+    
+    # المواقع المرتبطة (من المحفوظات وخطط الرحلات) تُحسب بأمر build_recommendations
+    related_place_ids = models.JSONField('المواقع المرتبطة', default=list, blank=True, editable=False)
+    
+    # نصوص موحّدة للبحث (بدون تشكيل أو وسوم HTML) تُحسب عند الحفظ
+    name_normalized = models.CharField('الاسم (للبحث)', max_length=200, blank=True, editable=False, db_index=True)
+    name_en_normalized = models.CharField('الاسم بالإنجليزية (للبحث)', max_length=200, blank=True, editable=False, db_index=True)
+    city_normalized = models.CharField('المدينة (للبحث)', max_length=100, blank=True, editable=False, db_index=True)
+    description_normalized = models.TextField('الوصف (للبحث)', blank=True, editable=False)
+    
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
 
@@ -192,22 +217,68 @@ class TouristPlace(models.Model):
         verbose_name = 'موقع سياحي'
         verbose_name_plural = 'المواقع السياحية'
         ordering = ['priority', '-is_featured', 'name']
+        indexes = [
+            # فهارس الترتيب حسب الرواج والمشاهدات (للقائمة العامة ولكل قسم)
+            models.Index(fields=['-trending_score', 'id'], name='place_trending_idx'),
+            models.Index(fields=['category', '-trending_score', 'id'], name='place_cat_trending_idx'),
+            models.Index(fields=['-view_count', 'id'], name='place_popular_idx'),
+            models.Index(fields=['category', '-view_count', 'id'], name='place_cat_popular_idx'),
+        ]
+
+    # الحقول التي يدخل فيها الموقع في ملخصات خطط الرحلات
+    SUMMARY_FIELDS = ('suggested_duration', 'governorate_id')
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_summary_values = instance._summary_values()
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name_en)
+        self.update_normalized_fields()
+        self.geo_cell = cell_for(self.latitude, self.longitude)
         super().save(*args, **kwargs)
+        self._loaded_summary_values = self._summary_values()
+
+    def _summary_values(self):
+        # الحقول المؤجلة (only/defer) لا تُقرأ حتى لا يُنفذ استعلام إضافي
+        return tuple(self.__dict__.get(field, models.DEFERRED) for field in self.SUMMARY_FIELDS)
+
+    def summary_fields_changed(self):
+        """هل تغيرت المدة المقترحة أو المحافظة منذ التحميل (True إن لم يُحمّل الموقع من القاعدة)"""
+        loaded = getattr(self, '_loaded_summary_values', None)
+        return loaded is None or loaded != self._summary_values()
+
+    def update_normalized_fields(self):
+        """تحديث نصوص البحث الموحّدة"""
+        self.name_normalized = normalize_text(self.name)[:200]
+        self.name_en_normalized = normalize_text(self.name_en)[:200]
+        self.city_normalized = normalize_text(self.city)[:100]
+        self.description_normalized = normalize_text(self.description)
 
     def increment_views(self):
         """زيادة عدد المشاهدات"""
         self.view_count += 1
-        self.save(update_fields=['view_count'])
+        if getattr(settings, 'VIEW_COUNT_MODE', 'sync') == 'buffered':
+            from .counters import view_counter
+            view_counter.record(self.pk)
+        else:
+            self.save(update_fields=['view_count'])
 
     def get_main_image(self):
         """الحصول على الصورة الرئيسية"""
+        # استخدام الصور المحمّلة مسبقاً (prefetch_related) لتجنب استعلام لكل بطاقة
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            images = self.images.all()
+            for image in images:
+                if image.is_main:
+                    return image
+            return images[0] if images else None
         main_image = self.images.filter(is_main=True).first()
         if main_image:
             return main_image
@@ -270,6 +341,13 @@ class PlaceImage(models.Model):
     is_main = models.BooleanField('صورة رئيسية', default=False)
     order = models.IntegerField('الترتيب', default=0)
     uploaded_at = models.DateTimeField('تاريخ الرفع', auto_now_add=True)
+    
+    # الأحجام المولّدة من الصورة (مساراتها وأبعادها) لا تُعدّل يدوياً
+    renditions = models.JSONField('الأحجام المولّدة', default=dict, blank=True, editable=False)
+    width = models.PositiveIntegerField('العرض', null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField('الارتفاع', null=True, blank=True, editable=False)
+    placeholder = models.TextField('صورة مموّهة مؤقتة', blank=True, editable=False)
+    checksum = models.CharField('بصمة الملف', max_length=64, blank=True, editable=False, db_index=True)
 
     class Meta:
         verbose_name = 'صورة'
@@ -285,6 +363,25 @@ class PlaceImage(models.Model):
     def __str__(self):
         return f'{self.place.name} - {self.caption or "صورة"}'
 
+    def get_rendition(self, name):
+        """روابط وأبعاد حجم معين (مع srcset بكل عروضه)، أو الصورة الأصلية إذا لم يُولَّد بعد"""
+        data = self.renditions.get(name)
+        if not data or self.renditions.get('source') != self.image.name:
+            return {
+                'url': self.image.url, 'webp_url': None, 'srcset': '', 'webp_srcset': '',
+                'width': self.width, 'height': self.height,
+            }
+        storage = self.image.storage
+        variants = sorted([data, *data.get('srcset', [])], key=lambda variant: variant['width'])
+        return {
+            'url': storage.url(data['jpeg']),
+            'webp_url': storage.url(data['webp']),
+            'srcset': ', '.join(f"{storage.url(v['jpeg'])} {v['width']}w" for v in variants),
+            'webp_srcset': ', '.join(f"{storage.url(v['webp'])} {v['width']}w" for v in variants),
+            'width': data['width'],
+            'height': data['height'],
+        }
+
     def save(self, *args, **kwargs):
         # إذا كانت صورة رئيسية، قم بإزالة الخاصية من الصور الأخرى
         if self.is_main:
@@ -428,6 +525,13 @@ class UserTripPlan(models.Model):
     budget = models.DecimalField('الميزانية', max_digits=10, decimal_places=2, null=True, blank=True)
     status = models.CharField('الحالة', max_length=20, choices=STATUS_CHOICES, default='draft')
     places = models.ManyToManyField(TouristPlace, through='TripPlanDay', related_name='in_plans')
+    
+    # ملخص الخطة (يُحدَّث عند تغير أماكنها) لعرض القوائم بدون تحميل الأيام
+    place_count = models.PositiveIntegerField('عدد الأماكن', default=0, editable=False)
+    day_count = models.PositiveIntegerField('عدد الأيام', default=0, editable=False)
+    total_hours = models.PositiveIntegerField('إجمالي الساعات المقترحة', default=0, editable=False)
+    governorates_summary = models.JSONField('المحافظات', default=list, blank=True, editable=False)
+    
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
     
@@ -451,8 +555,11 @@ class TripPlanDay(models.Model):
     place = models.ForeignKey(TouristPlace, on_delete=models.CASCADE)
     day_number = models.IntegerField('رقم اليوم')
     visit_time = models.TimeField('وقت الزيارة', null=True, blank=True)
+    # ترتيب الزيارة داخل اليوم من ترتيب الأيام (يفصل بين الأوقات المتساوية)
+    sequence = models.PositiveIntegerField('الترتيب في اليوم', null=True, blank=True, editable=False)
     notes = models.TextField('ملاحظات', blank=True)
     is_completed = models.BooleanField('مكتملة', default=False)
+    created_at = models.DateTimeField('تاريخ الإضافة', auto_now_add=True, null=True)
     
     class Meta:
         verbose_name = 'يوم في خطة الرحلة'
@@ -462,3 +569,84 @@ class TripPlanDay(models.Model):
     
     def __str__(self):
         return f'{self.trip_plan.title} - اليوم {self.day_number} - {self.place.name}'
+
+
+class TrendingRefresh(models.Model):
+    """سجل تحديثات مؤشر الرواج (آخر سجل هو نقطة بداية التحديث التالي)"""
+    refreshed_at = models.DateTimeField('وقت التحديث', db_index=True)
+    places_updated = models.PositiveIntegerField('المواقع المحدّثة', default=0)
+    
+    class Meta:
+        verbose_name = 'تحديث مؤشر الرواج'
+        verbose_name_plural = 'تحديثات مؤشر الرواج'
+        ordering = ['-refreshed_at']
+    
+    def __str__(self):
+        return f'{self.refreshed_at:%Y-%m-%d %H:%M} ({self.places_updated})'
+
+
+class PlaceCooccurrence(models.Model):
+    """عدد السلال (محفوظات مستخدم أو خطة رحلة) التي تجمع موقعين (القطر: عدد سلال الموقع)"""
+    place = models.ForeignKey(TouristPlace, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(TouristPlace, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField('العدد', default=0)
+    
+    class Meta:
+        verbose_name = 'تزامن موقعين'
+        verbose_name_plural = 'تزامن المواقع'
+        unique_together = ['place', 'related']
+    
+    def __str__(self):
+        return f'{self.place_id} - {self.related_id} ({self.count})'
+
+
+class PlaceSimilarity(models.Model):
+    """متجه نص الموقع وأقرب المواقع له في المحتوى (يُحدَّث بأمر build_similarity)"""
+    place = models.OneToOneField(TouristPlace, on_delete=models.CASCADE, primary_key=True, related_name='similarity')
+    features = models.JSONField('المتجه', default=list)
+    digest = models.CharField('بصمة المحتوى', max_length=40)
+    neighbours = models.JSONField('المواقع المشابهة', default=list)
+    indexed_at = models.DateTimeField('وقت الفهرسة')
+    
+    class Meta:
+        verbose_name = 'تشابه المحتوى'
+        verbose_name_plural = 'تشابه المحتوى'
+    
+    def __str__(self):
+        return str(self.place_id)
+
+
+class PlannerJob(models.Model):
+    """طلب توليد برنامج سياحي يُنفَّذ في الخلفية"""
+    STATUS_CHOICES = [
+        ('pending', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('done', 'مكتمل'),
+        ('failed', 'فشل'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='planner_jobs')
+    days = models.PositiveIntegerField('عدد الأيام')
+    category_ids = models.JSONField('الأقسام', default=list)
+    language = models.CharField('اللغة', max_length=10, default='ar')
+    status = models.CharField('الحالة', max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField('النتيجة', null=True, blank=True)
+    error = models.TextField('الخطأ', blank=True)
+    trip_plan = models.ForeignKey(UserTripPlan, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='planner_jobs')
+    created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
+    finished_at = models.DateTimeField('تاريخ الانتهاء', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'طلب برنامج سياحي'
+        verbose_name_plural = 'طلبات البرامج السياحية'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'{self.days} أيام - {self.get_status_display()}'
+    
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination for place listings
+Pages are fetched with a WHERE on the sort key instead of OFFSET, and the
+total count is cached so deep pages cost the same as the first one.
+"""
+
+import hashlib
+from functools import cached_property, reduce
+from operator import attrgetter, or_
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+CURSOR_SALT = 'tourism.pagination'
+
+
+def _split(field):
+    """'-view_count' -> ('view_count', True)"""
+    if field.startswith('-'):
+        return field[1:], True
+    return field, False
+
+
+def _row_value(obj, lookup):
+    return attrgetter(lookup.replace('__', '.'))(obj)
+
+
+def cached_count(queryset):
+    """عدد النتائج مع تخزينه مؤقتاً حسب نص الاستعلام"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+    timeout = getattr(settings, 'PLACES_COUNT_CACHE_TIMEOUT', 300)
+    return cache.get_or_set(f'places-count:{digest}', queryset.count, timeout)
+
+
+class CursorPage:
+    """صفحة نتائج بمؤشرات للصفحة التالية والسابقة"""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    تقسيم النتائج إلى صفحات باستخدام مفتاح الترتيب
+    ordering يجب أن ينتهي بحقل فريد (مثل id) لضمان ترتيب ثابت
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.ordering = [_split(field) for field in ordering]
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return cached_count(self.queryset)
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [_row_value(obj, lookup) for lookup, _ in self.ordering]
+        return signing.dumps(
+            {'k': [lookup for lookup, _ in self.ordering], 'v': values, 'b': backwards},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """فك المؤشر، أو None إذا كان غير صالح أو لترتيب مختلف"""
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if data.get('k') != [lookup for lookup, _ in self.ordering]:
+            return None
+        return data['v'], bool(data.get('b'))
+
+    def _after(self, values, backwards):
+        """شرط المفتاح: الصفوف بعد (أو قبل) القيم المعطاة"""
+        conditions = []
+        for i, (lookup, descending) in enumerate(self.ordering):
+            op = 'lt' if descending != backwards else 'gt'
+            condition = Q(**{f'{lookup}__{op}': values[i]})
+            for j in range(i):
+                condition &= Q(**{self.ordering[j][0]: values[j]})
+            conditions.append(condition)
+        return reduce(or_, conditions)
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.queryset
+        backwards = False
+        if decoded:
+            values, backwards = decoded
+            queryset = queryset.filter(self._after(values, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(rows, self)
+
+        next_cursor = previous_cursor = None
+        if has_more or backwards:
+            next_cursor = self.encode_cursor(rows[-1])
+        if decoded and (has_more or not backwards):
+            previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+def paginate(request, queryset, ordering, per_page=12):
+    """
+    تقسيم قائمة المواقع إلى صفحات حسب PLACES_PAGINATION_MODE
+    عند ordering = None (مثل الترتيب حسب الصلة) يُستخدم Paginator العادي
+    """
+    mode = getattr(settings, 'PLACES_PAGINATION_MODE', 'cursor')
+    if mode == 'cursor' and ordering:
+        return CursorPaginator(queryset, per_page, ordering).get_page(request.GET.get('cursor'))
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
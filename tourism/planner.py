@@ -0,0 +1,300 @@
+"""
+Itinerary engine for the tour planner
+Places are picked by priority up to the trip's hour budget, clustered by
+location into one group per day, and each day is ordered with a
+nearest-neighbour tour improved by 2-opt. Generated programs are cached
+(and stored on planner jobs) as place ids only.
+"""
+
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import catalog_key
+from .geo import haversine_km
+from .models import TouristPlace
+from .travel_matrix import travel_hours, travel_matrix
+
+KMEANS_ITERATIONS = 10
+
+
+def hours_per_day():
+    return getattr(settings, 'PLANNER_HOURS_PER_DAY', 8)
+
+
+def visit_hours(place, budget):
+    """مدة الزيارة، بحد أقصى يوم واحد"""
+    return min(place.suggested_duration, budget)
+
+
+def has_coordinates(place):
+    return place.latitude is not None and place.longitude is not None
+
+
+def haversine_distance(a, b):
+    return haversine_km(float(a.latitude), float(a.longitude), float(b.latitude), float(b.longitude))
+
+
+def _project(places):
+    """إسقاط الإحداثيات إلى مستوى بالكيلومترات (كافٍ لمسافات داخل مصر)"""
+    mean_lat = sum(float(p.latitude) for p in places) / len(places)
+    scale = 111.32 * math.cos(math.radians(mean_lat))
+    return [(float(p.longitude) * scale, float(p.latitude) * 110.57) for p in places]
+
+
+def _squared(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def _initial_centroids(points, k):
+    """اختيار مراكز متباعدة بدءاً من أعلى المواقع أولوية"""
+    centroids = [points[0]]
+    nearest = [_squared(point, points[0]) for point in points]
+    while len(centroids) < k:
+        index = max(range(len(points)), key=nearest.__getitem__)
+        centroids.append(points[index])
+        nearest = [min(d, _squared(point, points[index])) for d, point in zip(nearest, points)]
+    return centroids
+
+
+def cluster(points, weights, k, capacity):
+    """
+    تقسيم النقاط إلى k مجموعات متقاربة لا يتجاوز وزن كل منها capacity
+    النقاط مرتبة حسب الأولوية، فالأعلى أولوية يحصل على مجموعته الأقرب أولاً
+    يعيد (groups, unassigned) كقوائم من فهارس النقاط
+    """
+    k = min(k, len(points))
+    if k == 0:
+        return [], []
+    centroids = _initial_centroids(points, k)
+    groups, unassigned = [], []
+    for _ in range(KMEANS_ITERATIONS):
+        loads = [0] * k
+        new_groups = [[] for _ in range(k)]
+        unassigned = []
+        for i, point in enumerate(points):
+            for c in sorted(range(k), key=lambda c: _squared(point, centroids[c])):
+                if loads[c] + weights[i] <= capacity:
+                    loads[c] += weights[i]
+                    new_groups[c].append(i)
+                    break
+            else:
+                unassigned.append(i)
+        if new_groups == groups:
+            break
+        groups = new_groups
+        centroids = [
+            (
+                sum(points[i][0] for i in group) / len(group),
+                sum(points[i][1] for i in group) / len(group),
+            ) if group else centroids[c]
+            for c, group in enumerate(groups)
+        ]
+    return groups, unassigned
+
+
+def nearest_neighbour_route(items, distance, start=None):
+    """ترتيب مبدئي: كل مرة ننتقل إلى أقرب موقع لم نزره"""
+    remaining = list(items)
+    if not remaining:
+        return []
+    current = start if start is not None else remaining[0]
+    if current in remaining:
+        remaining.remove(current)
+        route = [current]
+    else:
+        route = []
+    while remaining:
+        current = min(remaining, key=lambda item: distance(current, item))
+        remaining.remove(current)
+        route.append(current)
+    return route
+
+
+def two_opt(route, distance):
+    """تحسين مسار مفتوح (بداية ثابتة) بعكس المقاطع التي تقصّر المسافة"""
+    route = list(route)
+    n = len(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            for j in range(i + 2, n):
+                a, b, c = route[i], route[i + 1], route[j]
+                before = distance(a, b)
+                after = distance(a, c)
+                if j + 1 < n:
+                    d = route[j + 1]
+                    before += distance(c, d)
+                    after += distance(b, d)
+                if after < before - 1e-9:
+                    route[i + 1:j + 1] = reversed(route[i + 1:j + 1])
+                    improved = True
+    return route
+
+
+def route_length(route, distance):
+    return sum(distance(a, b) for a, b in zip(route, route[1:]))
+
+
+def build_schedule(places, days, budget=None, distance=None):
+    """
+    توزيع المواقع على الأيام
+    places مرتبة حسب الأولوية. يعيد (day_routes, unscheduled) حيث day_routes
+    قائمة بطول days من قوائم المواقع المرتبة، وunscheduled ما لم يتسع له الوقت
+    """
+    budget = budget or hours_per_day()
+    distance = distance or haversine_distance
+
+    # اختيار المواقع حسب الأولوية حتى امتلاء ساعات الرحلة
+    selected, unscheduled = [], []
+    remaining_hours = days * budget
+    for place in places:
+        hours = visit_hours(place, budget)
+        if hours <= remaining_hours:
+            selected.append(place)
+            remaining_hours -= hours
+        else:
+            unscheduled.append(place)
+
+    located = [p for p in selected if has_coordinates(p)]
+    unlocated = [p for p in selected if not has_coordinates(p)]
+
+    groups, overflow = [], []
+    if located:
+        index_groups, overflow_indexes = cluster(
+            _project(located),
+            [visit_hours(p, budget) for p in located],
+            days,
+            budget,
+        )
+        groups = [[located[i] for i in group] for group in index_groups if group]
+        overflow = [located[i] for i in overflow_indexes]
+
+    # ترتيب الأيام بحيث يبدأ كل يوم قرب نهاية اليوم السابق
+    day_routes = []
+    previous = None
+    while groups:
+        if previous is None:
+            group = groups[0]
+            start = group[0]
+        else:
+            group = min(groups, key=lambda g: min(distance(previous, p) for p in g))
+            start = min(group, key=lambda p: distance(previous, p))
+        groups.remove(group)
+        route = two_opt(nearest_neighbour_route(group, distance, start), distance)
+        day_routes.append(route)
+        previous = route[-1]
+    day_routes += [[] for _ in range(days - len(day_routes))]
+
+    # المواقع بدون إحداثيات (أو التي لم تتسع لها المجموعات) تملأ الوقت المتبقي
+    for place in overflow + unlocated:
+        hours = visit_hours(place, budget)
+        for route in day_routes:
+            if sum(visit_hours(p, budget) for p in route) + hours <= budget:
+                route.append(place)
+                break
+        else:
+            unscheduled.append(place)
+
+    return day_routes, unscheduled
+
+
+def serialize_program(program):
+    """البرنامج بمعرّفات المواقع فقط (للتخزين)"""
+    return {
+        'unscheduled_count': program['unscheduled_count'],
+        'schedule': [
+            {**day, 'places': [place.pk for place in day['places']]}
+            for day in program['schedule']
+        ],
+    }
+
+
+def load_program(days, categories, data):
+    """إعادة بناء برنامج مخزَّن بتحميل مواقعه باستعلام واحد"""
+    place_ids = [place_id for day in data['schedule'] for place_id in day['places']]
+    places = TouristPlace.objects.filter(
+        pk__in=place_ids,
+        is_active=True
+    ).select_related('category', 'governorate').prefetch_related('images').in_bulk()
+    
+    return {
+        'days': days,
+        'categories': categories,
+        'unscheduled_count': data['unscheduled_count'],
+        'schedule': [
+            {**day, 'places': [places[place_id] for place_id in day['places'] if place_id in places]}
+            for day in data['schedule']
+        ],
+    }
+
+
+def _tour_program_key(days, categories, lang):
+    category_ids = sorted({category.pk for category in categories})
+    return catalog_key('tour-program', days, '-'.join(map(str, category_ids)), lang)
+
+
+def cached_tour_program(days, categories, lang='ar'):
+    """البرنامج المخزَّن إن وُجد، وإلا None"""
+    data = cache.get(_tour_program_key(days, categories, lang))
+    if data is None:
+        return None
+    return load_program(days, categories, data)
+
+
+def get_tour_program(days, categories, lang='ar'):
+    """
+    برنامج سياحي مخزَّن حسب (الأيام، الأقسام المرتبة، اللغة)
+    تُخزَّن المعرّفات فقط ويُعاد تحميل المواقع باستعلام واحد
+    """
+    program = cached_tour_program(days, categories, lang)
+    if program is None:
+        program = generate_tour_program(days, categories)
+        cache.set(
+            _tour_program_key(days, categories, lang),
+            serialize_program(program),
+            getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+        )
+    return program
+
+
+def generate_tour_program(days, categories):
+    """توليد برنامج سياحي تلقائي"""
+    program = {
+        'days': days,
+        'categories': categories,
+        'schedule': [],
+        'unscheduled_count': 0,
+    }
+    
+    # الحصول على المواقع حسب الأقسام المختارة
+    places = TouristPlace.objects.filter(
+        category__in=categories,
+        is_active=True
+    ).select_related('category', 'governorate').prefetch_related('images').order_by('priority', '-is_featured', 'id')
+    
+    # المسافات من المصفوفة المحسوبة مسبقاً إن وُجدت
+    places = list(places)
+    distance = travel_matrix.distance_function(places) or haversine_distance
+    
+    # تجميع المواقع المتقاربة في نفس اليوم وترتيب كل يوم حسب المسافة
+    day_routes, unscheduled = build_schedule(places, days, distance=distance)
+    program['unscheduled_count'] = len(unscheduled)
+    
+    for day_num, day_places in enumerate(day_routes, start=1):
+        if day_places:
+            located = [p for p in day_places if has_coordinates(p)]
+            travel_km = route_length(located, distance)
+            day_data = {
+                'day_number': day_num,
+                'title': f'اليوم {day_num}',
+                'places': day_places,
+                'total_duration': sum(p.suggested_duration for p in day_places),
+                'travel_km': round(travel_km, 1),
+                'travel_hours': round(float(travel_hours(travel_km)), 1),
+            }
+            program['schedule'].append(day_data)
+    
+    return program
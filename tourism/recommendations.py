@@ -0,0 +1,216 @@
+"""
+Item-to-item recommendations from saved places and trip plans
+Every user's saved places and every trip plan is a basket; the number of
+baskets containing each pair of places is kept in a sparse co-occurrence
+table (the diagonal holds the basket count of each place). The top related
+places are stored on TouristPlace.related_place_ids and completed with the
+content-based neighbours from similarity, so place_detail only needs a
+primary-key lookup. A periodic rebuild recomputes everything, and additions
+update the affected rows in between, in a background thread after commit.
+"""
+
+import logging
+import math
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, permutations
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+
+from .models import PlaceCooccurrence, SavedPlace, TouristPlace, TripPlanDay
+from .similarity import similar_place_ids
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 8)
+
+
+def max_basket_size():
+    """السلال الأكبر من هذا لا تُحتسب (عدد الأزواج يزيد بمربع الحجم)"""
+    return getattr(settings, 'RECOMMENDATIONS_MAX_BASKET', 50)
+
+
+def related_count():
+    return getattr(settings, 'RELATED_PLACES_COUNT', 4)
+
+
+def update_mode():
+    """'thread' للتحديث في الخلفية أو 'inline' للتحديث داخل الطلب (الاختبارات)"""
+    return getattr(settings, 'RECOMMENDATIONS_UPDATE_MODE', 'thread')
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendations')
+    return _executor
+
+
+def _run_in_thread(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        # التحديث التدريجي اختياري: إعادة البناء الدورية تصحح أي نقص
+        logger.exception('Could not update related places')
+    finally:
+        close_old_connections()
+
+
+def schedule(func, *args):
+    """تنفيذ تحديث تدريجي بعد انتهاء المعاملة، خارج الطلب"""
+    if update_mode() == 'inline':
+        transaction.on_commit(lambda: func(*args))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_thread, func, *args))
+
+
+def rank(place_id, neighbours, totals, limit):
+    """
+    ترتيب المواقع المرتبطة بتشابه جيب التمام: c(i,j) / sqrt(n(i)·n(j))
+    حتى لا تتصدر المواقع الأكثر شعبية كل القوائم
+    """
+    own = max(totals.get(place_id, 0), 1)
+    scored = sorted(
+        neighbours.items(),
+        key=lambda item: (-item[1] / math.sqrt(own * max(totals.get(item[0], 0), 1)), -item[1], item[0]),
+    )
+    return [related_id for related_id, _ in scored[:limit]]
+
+
+def _baskets():
+    """مجموعات الأماكن: محفوظات كل مستخدم وأماكن كل خطة رحلة"""
+    sources = (
+        SavedPlace.objects.order_by('user_id').values_list('user_id', 'place_id'),
+        TripPlanDay.objects.order_by('trip_plan_id').values_list('trip_plan_id', 'place_id'),
+    )
+    for rows in sources:
+        for _, group in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+            basket = {place_id for _, place_id in group}
+            if len(basket) <= max_basket_size():
+                yield basket
+
+
+def _pad(place_id, ranked, candidates, limit):
+    result = list(ranked)
+    for candidate in candidates:
+        if len(result) >= limit:
+            break
+        if candidate != place_id and candidate not in result:
+            result.append(candidate)
+    return result
+
+
+def rebuild():
+    """إعادة حساب جدول التزامن وقوائم المواقع المرتبطة بالكامل"""
+    counts = Counter()
+    for basket in _baskets():
+        for place_id in basket:
+            counts[place_id, place_id] += 1
+        counts.update(permutations(basket, 2))
+
+    totals = {}
+    neighbours = defaultdict(dict)
+    for (place_id, related_id), count in counts.items():
+        if place_id == related_id:
+            totals[place_id] = count
+        else:
+            neighbours[place_id][related_id] = count
+
+    limit = top_k()
+    places = list(TouristPlace.objects.only('pk'))
+    for place in places:
+        place.related_place_ids = rank(place.pk, neighbours.get(place.pk, {}), totals, limit)
+
+    with transaction.atomic():
+        PlaceCooccurrence.objects.all().delete()
+        PlaceCooccurrence.objects.bulk_create(
+            (PlaceCooccurrence(place_id=i, related_id=j, count=count) for (i, j), count in counts.items()),
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        TouristPlace.objects.bulk_update(places, ['related_place_ids'], batch_size=WRITE_BATCH_SIZE)
+    return len(counts)
+
+
+def refresh_related(place_ids):
+    """إعادة ترتيب المواقع المرتبطة لمواقع معينة من جدول التزامن"""
+    place_ids = set(place_ids)
+    neighbours = defaultdict(dict)
+    rows = PlaceCooccurrence.objects.filter(place_id__in=place_ids, count__gt=0).values_list('place_id', 'related_id', 'count')
+    for place_id, related_id, count in rows:
+        if place_id != related_id:
+            neighbours[place_id][related_id] = count
+    involved = place_ids.union(*(set(n) for n in neighbours.values()))
+    totals = dict(PlaceCooccurrence.objects.filter(
+        place_id__in=involved, related_id=F('place_id')
+    ).values_list('place_id', 'count'))
+
+    limit = top_k()
+    places = [TouristPlace(pk=place_id) for place_id in place_ids]
+    for place in places:
+        place.related_place_ids = rank(place.pk, neighbours.get(place.pk, {}), totals, limit)
+    TouristPlace.objects.bulk_update(places, ['related_place_ids'], batch_size=WRITE_BATCH_SIZE)
+
+
+def record_basket(existing_ids, added_ids):
+    """
+    تحديث تدريجي عند إضافة أماكن إلى سلة (محفوظات مستخدم أو خطة رحلة)
+    existing_ids: أماكن السلة قبل الإضافة
+    الحذف لا يُطرح هنا ويُصحَّح في إعادة البناء الدورية
+    """
+    existing = set(existing_ids)
+    added = set(added_ids) - existing
+    basket = existing | added
+    if not added or len(basket) > max_basket_size():
+        return
+
+    pairs = [(i, j) for i in added for j in basket] + [(i, j) for i in existing for j in added]
+    with transaction.atomic():
+        PlaceCooccurrence.objects.bulk_create(
+            [PlaceCooccurrence(place_id=i, related_id=j, count=0) for i, j in pairs],
+            ignore_conflicts=True,
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        PlaceCooccurrence.objects.filter(
+            Q(place_id__in=added, related_id__in=basket) | Q(place_id__in=existing, related_id__in=added)
+        ).update(count=F('count') + 1)
+    refresh_related(basket)
+
+
+def record_saved_place(user_id, place_id):
+    """تحديث التزامن بعد حفظ المستخدم لمكان جديد"""
+    existing = SavedPlace.objects.filter(user_id=user_id).exclude(place_id=place_id).values_list('place_id', flat=True)
+    record_basket(existing, [place_id])
+
+
+def record_trip_entry(entry):
+    """تحديث التزامن بعد إضافة عنصر واحد إلى خطة رحلة"""
+    existing = TripPlanDay.objects.filter(trip_plan_id=entry.trip_plan_id).exclude(pk=entry.pk).values_list('place_id', flat=True)
+    record_basket(existing, [entry.place_id])
+
+
+def related_places(place, limit=None):
+    """
+    المواقع المرتبطة لموقع بالبحث بالمفتاح الأساسي: مواقع التزامن أولاً
+    ثم المواقع المشابهة في المحتوى (للمواقع الجديدة بلا محفوظات أو خطط)
+    """
+    limit = limit or related_count()
+    queryset = TouristPlace.objects.filter(is_active=True).select_related('governorate').prefetch_related('images')
+    ids = _pad(place.pk, place.related_place_ids, similar_place_ids(place), top_k())
+    if not ids:
+        # موقع لم تشمله إعادة البناء بعد
+        return list(queryset.filter(category_id=place.category_id).exclude(pk=place.pk)[:limit])
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found][:limit]
@@ -0,0 +1,46 @@
+"""
+Per-user set of saved place ids
+The set is kept in the cache so list pages can mark saved cards without a
+query per card, and is invalidated whenever the user's saved places change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import SavedPlace
+
+
+def cache_key(user_id):
+    return f'tourism:saved-places:{user_id}'
+
+
+def saved_place_ids(user):
+    """معرّفات الأماكن المحفوظة للمستخدم (مجموعة فارغة للزوار)"""
+    if not user.is_authenticated:
+        return frozenset()
+    key = cache_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(SavedPlace.objects.filter(user=user).values_list('place_id', flat=True))
+        cache.set(key, ids, getattr(settings, 'SAVED_PLACES_CACHE_TIMEOUT', 86400))
+    return ids
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def toggle_saved_place(user, place_id):
+    """
+    حفظ المكان إن لم يكن محفوظاً وإلا إلغاء حفظه
+    الحذف أولاً، ثم get_or_create حتى لا يفشل النقر المزدوج
+    إشارات الحفظ والحذف تبطل المجموعة المخزنة، وتحدّث المواقع المرتبطة عند إدراج صف جديد فقط
+    يعيد True إذا أصبح المكان محفوظاً
+    """
+    with transaction.atomic():
+        deleted, _ = SavedPlace.objects.filter(user=user, place_id=place_id).delete()
+        if deleted:
+            return False
+        SavedPlace.objects.get_or_create(user=user, place_id=place_id)
+    return True
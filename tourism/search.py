@@ -0,0 +1,336 @@
+"""
+Full-text search index for tourist places
+SQLite uses an FTS5 virtual table, PostgreSQL a tsvector table with a GIN index.
+Other database backends fall back to prefix lookups on the normalized columns.
+"""
+
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape, strip_tags
+
+INDEX_TABLE = 'tourism_place_fts'
+
+# الحقول المفهرسة بالترتيب، ووزن كل حقل في ترتيب النتائج
+INDEXED_FIELDS = ['name', 'name_en', 'city', 'city_en', 'description', 'description_en']
+FIELD_WEIGHTS = [10.0, 10.0, 4.0, 4.0, 1.0, 1.0]
+PG_FIELD_WEIGHTS = ['A', 'A', 'B', 'B', 'D', 'D']
+
+# علامات مؤقتة لتمييز الكلمات المطابقة قبل تهريب HTML
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# التشكيل والتطويل والألف الخنجرية
+_ARABIC_MARKS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """
+    توحيد النص للبحث: إزالة وسوم HTML والتشكيل، وتوحيد أشكال الألف والهمزة
+    والتاء المربوطة والألف المقصورة، وتحويل الحروف اللاتينية إلى حروف صغيرة
+    """
+    if not text:
+        return ''
+    text = html.unescape(strip_tags(text))
+    text = _ARABIC_MARKS_RE.sub('', text).translate(_ARABIC_LETTERS).casefold()
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def is_supported(conn=None):
+    """هل تدعم قاعدة البيانات الحالية الفهرس النصي؟"""
+    return (conn or connection).vendor in ('sqlite', 'postgresql')
+
+
+def place_document(place):
+    """النصوص المفهرسة لموقع سياحي (موحّدة وبدون وسوم HTML)"""
+    return [normalize_text(getattr(place, field)) for field in INDEXED_FIELDS]
+
+
+def create_index(conn=None):
+    """إنشاء جدول الفهرس إذا لم يكن موجوداً"""
+    conn = conn or connection
+    columns = ', '.join(INDEXED_FIELDS)
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5('
+                f"{columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ('
+                'place_id bigint PRIMARY KEY, document tsvector NOT NULL, '
+                'body text NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document_idx '
+                f'ON {INDEX_TABLE} USING GIN (document)'
+            )
+
+
+def drop_index(conn=None):
+    """حذف جدول الفهرس"""
+    conn = conn or connection
+    if is_supported(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+
+def _pg_document_sql():
+    parts = [
+        f"setweight(to_tsvector('simple', %s), '{weight}')"
+        for weight in PG_FIELD_WEIGHTS
+    ]
+    return ' || '.join(parts)
+
+
+def index_places(places, conn=None):
+    """إضافة أو تحديث مجموعة مواقع في الفهرس"""
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    rows = [(place.pk, place_document(place)) for place in places]
+    if not rows:
+        return
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * (len(INDEXED_FIELDS) + 1))
+            cursor.executemany(
+                f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE} (rowid, {", ".join(INDEXED_FIELDS)}) '
+                f'VALUES ({placeholders})',
+                [(pk, *document) for pk, document in rows]
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE} (place_id, document, body) '
+                f'VALUES (%s, {_pg_document_sql()}, %s) '
+                'ON CONFLICT (place_id) DO UPDATE SET '
+                'document = EXCLUDED.document, body = EXCLUDED.body',
+                [(pk, *document, ' … '.join(filter(None, document))) for pk, document in rows]
+            )
+
+
+def index_place(place, conn=None):
+    """تحديث موقع واحد في الفهرس، أو إزالته إذا كان غير نشط"""
+    if place.is_active:
+        index_places([place], conn)
+    else:
+        remove_place(place.pk, conn)
+
+
+def remove_place(place_id, conn=None):
+    """إزالة موقع من الفهرس"""
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    column = 'rowid' if conn.vendor == 'sqlite' else 'place_id'
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE {column} = %s', [place_id])
+
+
+def rebuild_index(queryset=None, conn=None, batch_size=500):
+    """إعادة بناء الفهرس بالكامل من قاعدة البيانات"""
+    conn = conn or connection
+    if not is_supported(conn):
+        return 0
+    if queryset is None:
+        from .models import TouristPlace
+        queryset = TouristPlace.objects.filter(is_active=True)
+    create_index(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+    batch = []
+    total = 0
+    for place in queryset.only('pk', 'is_active', *INDEXED_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(place)
+        if len(batch) >= batch_size:
+            index_places(batch, conn)
+            total += len(batch)
+            batch = []
+    index_places(batch, conn)
+    return total + len(batch)
+
+
+def build_query(text, conn=None):
+    """تحويل نص البحث إلى استعلام آمن (مع مطابقة بادئة آخر كلمة)"""
+    conn = conn or connection
+    tokens = _TOKEN_RE.findall(normalize_text(text))
+    if not tokens:
+        return ''
+    if conn.vendor == 'postgresql':
+        terms = [token.replace("'", '') for token in tokens]
+        terms[-1] += ':*'
+        return ' & '.join(terms)
+    terms = ['"%s"' % token.replace('"', '""') for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(raw):
+    return (
+        escape(raw)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+# عدد الكلمات في مقتطف النتيجة
+SNIPPET_WORDS = 16
+
+
+def _normalize_with_offsets(text):
+    """النص الموحّد مع موضع كل حرف منه في النص الأصلي (بدون وسوم HTML)"""
+    normalized, offsets = [], []
+    for index, char in enumerate(text):
+        if _ARABIC_MARKS_RE.match(char):
+            continue
+        if char.isspace():
+            if normalized and normalized[-1] != ' ':
+                normalized.append(' ')
+                offsets.append(index)
+            continue
+        for folded in char.translate(_ARABIC_LETTERS).casefold():
+            normalized.append(folded)
+            offsets.append(index)
+    return ''.join(normalized), offsets
+
+
+def _matches(text, tokens):
+    """مواضع الكلمات المطابقة في النص الأصلي (آخر كلمة في البحث تطابق كبادئة)"""
+    normalized, offsets = _normalize_with_offsets(text)
+    spans = []
+    for match in _TOKEN_RE.finditer(normalized):
+        word = match.group()
+        if word in tokens[:-1] or word.startswith(tokens[-1]):
+            end = offsets[match.end() - 1] + 1
+            # التشكيل بعد آخر حرف جزء من الكلمة
+            while end < len(text) and _ARABIC_MARKS_RE.match(text[end]):
+                end += 1
+            spans.append((offsets[match.start()], end))
+    return spans
+
+
+def snippet(values, text):
+    """
+    مقتطف HTML آمن من النص الأصلي للموقع مع تمييز الكلمات المطابقة
+    values: نصوص الحقول المفهرسة بترتيب INDEXED_FIELDS
+    """
+    tokens = _TOKEN_RE.findall(normalize_text(text))
+    if not tokens:
+        return ''
+    best, best_spans = '', []
+    for value in values:
+        original = html.unescape(strip_tags(value or ''))
+        spans = _matches(original, tokens)
+        if len(spans) > len(best_spans):
+            best, best_spans = original, spans
+    if not best_spans:
+        return ''
+
+    words = [match.span() for match in re.finditer(r'\S+', best)]
+    first = next(i for i, (_, end) in enumerate(words) if end > best_spans[0][0])
+    start = max(0, min(first - SNIPPET_WORDS // 4, len(words) - SNIPPET_WORDS))
+    window = words[start:start + SNIPPET_WORDS]
+    begin, end = window[0][0], window[-1][1]
+
+    parts, position = [], begin
+    for span_start, span_end in best_spans:
+        if span_start < begin or span_end > end:
+            continue
+        parts += [best[position:span_start], _MARK_START, best[span_start:span_end], _MARK_END]
+        position = span_end
+    parts.append(best[position:end])
+    raw = _SPACES_RE.sub(' ', ''.join(parts))
+    if start > 0:
+        raw = '…' + raw
+    if start + SNIPPET_WORDS < len(words):
+        raw += '…'
+    return _highlight(raw)
+
+
+def search(text, limit=None, conn=None, queryset=None):
+    """
+    البحث في الفهرس
+    يعيد قائمة من (place_id, snippet) مرتبة حسب الصلة، حيث snippet نص HTML آمن
+    من النص الأصلي (الفهرس يحتوي النص الموحّد فقط)
+    queryset (اختياري) يقصر النتائج على مواقعه قبل تطبيق الحد الأقصى
+    """
+    from .models import TouristPlace
+
+    conn = conn or connection
+    query = build_query(text, conn)
+    if not query or not is_supported(conn):
+        return []
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+    column = 'rowid' if conn.vendor == 'sqlite' else 'place_id'
+    restrict, restrict_params = '', []
+    if queryset is not None:
+        subquery, restrict_params = queryset.order_by().values('pk').query.sql_with_params()
+        restrict = f' AND {column} IN ({subquery})'
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS)
+            cursor.execute(
+                f'SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s{restrict} '
+                f'ORDER BY bm25({INDEX_TABLE}, {weights}) LIMIT %s',
+                [query, *restrict_params, limit]
+            )
+        else:
+            cursor.execute(
+                f"SELECT place_id FROM {INDEX_TABLE}, to_tsquery('simple', %s) q "
+                f'WHERE document @@ q{restrict} ORDER BY ts_rank(document, q) DESC LIMIT %s',
+                [query, *restrict_params, limit]
+            )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    originals = {
+        pk: values for pk, *values in
+        TouristPlace.objects.using(conn.alias).filter(pk__in=ids).values_list('pk', *INDEXED_FIELDS)
+    }
+    return [(place_id, snippet(originals.get(place_id, ()), text)) for place_id in ids]
+
+
+def filter_normalized(queryset, text):
+    """البحث في أعمدة النص الموحّدة (للقواعد التي لا تدعم الفهرس النصي)"""
+    normalized = normalize_text(text)
+    if not normalized:
+        return queryset
+    return queryset.filter(
+        Q(name_normalized__startswith=normalized) |
+        Q(city_normalized__startswith=normalized) |
+        Q(name_en__istartswith=normalized) |
+        Q(city_en__istartswith=normalized) |
+        Q(description_normalized__contains=normalized)
+    )
+
+
+def suggest(queryset, text, limit=10):
+    """
+    اقتراحات الأسماء (عربي وإنجليزي) التي تبدأ بالنص المكتوب
+    تُنفَّذ كنطاق على الأعمدة الموحّدة المفهرسة بدلاً من LIKE
+    بدون نص تُعاد أول المواقع حسب ترتيب الاستعلام (مثلاً بعد اختيار قسم فقط)
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return queryset[:limit]
+    upper = normalized + '\U0010ffff'
+    return queryset.filter(
+        Q(name_normalized__gte=normalized, name_normalized__lt=upper) |
+        Q(name_en_normalized__gte=normalized, name_en_normalized__lt=upper)
+    )[:limit]
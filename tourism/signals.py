@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, TouristPlace, Category, Governorate, PlaceImage, TripPlanDay, UserTripPlan, SavedPlace
+from . import images, recommendations, saved_places, search
+from .caching import bump_catalog_version
+from .trip_plans import refresh_plan_summaries, update_plan_summary
+from .travel_matrix import travel_matrix
 
 
 @receiver(post_save, sender=User)
@@ -16,3 +21,109 @@ def save_user_profile(sender, instance, **kwargs):
     """حفظ الملف التعريفي عند حفظ المستخدم"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_save, sender=TouristPlace)
+def update_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """تحديث فهرس البحث عند حفظ موقع سياحي"""
+    if raw or (update_fields and set(update_fields) <= {'view_count'}):
+        return
+    search.index_place(instance)
+
+
+@receiver(post_delete, sender=TouristPlace)
+def remove_from_search_index(sender, instance, **kwargs):
+    """إزالة الموقع من فهرس البحث عند حذفه"""
+    search.remove_place(instance.pk)
+
+
+@receiver(post_save, sender=TouristPlace)
+def update_travel_matrix(sender, instance, raw=False, update_fields=None, **kwargs):
+    """تحديث مصفوفة المسافات عند تغير إحداثيات الموقع أو حالته"""
+    if raw or (update_fields and set(update_fields) <= {'view_count'}):
+        return
+    # بعد انتهاء المعاملة حتى لا يغيّر حفظ متراجع عنه المصفوفة
+    transaction.on_commit(lambda: travel_matrix.update_place(instance))
+
+
+@receiver(post_delete, sender=TouristPlace)
+def remove_from_travel_matrix(sender, instance, **kwargs):
+    """إزالة الموقع من مصفوفة المسافات عند حذفه"""
+    place_id = instance.pk
+    transaction.on_commit(lambda: travel_matrix.remove_place(place_id))
+
+
+@receiver(post_save, sender=TouristPlace)
+@receiver(post_delete, sender=TouristPlace)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Governorate)
+@receiver(post_delete, sender=Governorate)
+@receiver(post_save, sender=PlaceImage)
+@receiver(post_delete, sender=PlaceImage)
+def invalidate_catalog_cache(sender, update_fields=None, **kwargs):
+    """إبطال بيانات الكتالوج المخزنة عند تعديل المحتوى"""
+    # تحديث عداد المشاهدات فقط لا يغير المحتوى المعروض
+    if update_fields and set(update_fields) <= {'view_count'}:
+        return
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=TripPlanDay)
+@receiver(post_delete, sender=TripPlanDay)
+def refresh_trip_plan_summary(sender, instance, raw=False, origin=None, **kwargs):
+    """تحديث ملخص الخطة عند إضافة أو تعديل أو حذف أحد أماكنها"""
+    # لا داعي للتحديث إذا كانت الخطة نفسها هي المحذوفة
+    if raw or isinstance(origin, UserTripPlan):
+        return
+    update_plan_summary(instance.trip_plan_id)
+
+
+@receiver(post_save, sender=TouristPlace)
+def refresh_place_plan_summaries(sender, instance, raw=False, update_fields=None, created=False, **kwargs):
+    """تحديث ملخصات الخطط التي تحتوي الموقع (المحافظة والمدة المقترحة جزء من الملخص)"""
+    if raw or created or not instance.summary_fields_changed():
+        return
+    transaction.on_commit(lambda: refresh_plan_summaries(TripPlanDay.objects.filter(place_id=instance.pk)))
+
+
+@receiver(post_save, sender=Governorate)
+def refresh_governorate_plan_summaries(sender, instance, raw=False, created=False, **kwargs):
+    """تحديث ملخصات الخطط عند تعديل اسم محافظة"""
+    if raw or created:
+        return
+    transaction.on_commit(lambda: refresh_plan_summaries(TripPlanDay.objects.filter(place__governorate_id=instance.pk)))
+
+
+@receiver(post_save, sender=SavedPlace)
+@receiver(post_delete, sender=SavedPlace)
+def invalidate_saved_places(sender, instance, **kwargs):
+    """إبطال مجموعة الأماكن المحفوظة للمستخدم (مثلاً عند التعديل من لوحة التحكم)"""
+    saved_places.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=SavedPlace)
+def record_saved_place_cooccurrence(sender, instance, created, raw=False, **kwargs):
+    """تحديث المواقع المرتبطة عند حفظ مكان جديد"""
+    if created and not raw:
+        recommendations.schedule(recommendations.record_saved_place, instance.user_id, instance.place_id)
+
+
+@receiver(post_save, sender=TripPlanDay)
+def record_trip_cooccurrence(sender, instance, created, raw=False, **kwargs):
+    """تحديث المواقع المرتبطة عند إضافة مكان إلى خطة رحلة"""
+    if created and not raw:
+        recommendations.schedule(recommendations.record_trip_entry, instance)
+
+
+@receiver(post_save, sender=PlaceImage)
+def generate_image_renditions(sender, instance, raw=False, **kwargs):
+    """توليد أحجام الصورة عند رفعها أو استبدالها"""
+    if not raw and instance.image and instance.renditions.get('source') != instance.image.name:
+        images.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=PlaceImage)
+def delete_image_renditions(sender, instance, **kwargs):
+    """حذف أحجام الصورة المولّدة عند حذفها"""
+    images.delete_renditions(instance.renditions, instance.image.storage)
@@ -0,0 +1,210 @@
+"""
+Content-based similarity between tourist places
+Each place is a hashed TF-IDF vector over its HTML-stripped Arabic and
+English descriptions plus category and governorate terms. Term frequencies
+are stored per place, and the top-k cosine neighbours are computed with
+numpy matrix products over blocks of rows, so the full places x features
+matrix is never held in memory. Incremental runs only re-tokenize places
+saved since their vector was built and re-rank the places whose neighbours
+they affect.
+"""
+
+import hashlib
+import math
+import zlib
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PlaceSimilarity, TouristPlace
+from .search import _TOKEN_RE, normalize_text
+
+# وزن كل حقل في متجه الموقع
+FIELD_WEIGHTS = {
+    'short_description': 2.0,
+    'short_description_en': 2.0,
+    'description': 1.0,
+    'description_en': 1.0,
+}
+CATEGORY_WEIGHT = 3.0
+GOVERNORATE_WEIGHT = 2.0
+
+# الكلمات الأقصر من هذا (حروف الجر ونحوها) لا تُحتسب
+MIN_TOKEN_LENGTH = 3
+
+# عدد الصفوف في كل ضرب مصفوفات
+CHUNK_SIZE = 256
+
+
+def dimensions():
+    return getattr(settings, 'SIMILARITY_FEATURES', 4096)
+
+
+def top_k():
+    return getattr(settings, 'SIMILARITY_TOP_K', 8)
+
+
+def min_score():
+    return getattr(settings, 'SIMILARITY_MIN_SCORE', 0.05)
+
+
+def place_terms(place):
+    """مصطلحات الموقع الموزونة: كلمات الأوصاف ومصطلحا القسم والمحافظة"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in _TOKEN_RE.findall(normalize_text(getattr(place, field))):
+            if len(token) >= MIN_TOKEN_LENGTH and not token.isdigit():
+                terms[token] += weight
+    terms[f'category:{place.category_id}'] += CATEGORY_WEIGHT
+    terms[f'governorate:{place.governorate_id}'] += GOVERNORATE_WEIGHT
+    return terms
+
+
+def place_features(place):
+    """
+    متجه تكرار المصطلحات المجزّأ (hashing) لموقع: [[الفهرس، الوزن]، ...]
+    مع بصمة للنص حتى لا يُعاد الترتيب إذا لم يتغير المحتوى
+    """
+    size = dimensions()
+    features = Counter()
+    for term, weight in place_terms(place).items():
+        features[zlib.crc32(term.encode('utf-8')) % size] += 1 + math.log(weight)
+    digest = hashlib.sha1(repr(sorted(features.items())).encode('utf-8')).hexdigest()
+    return [[index, round(weight, 4)] for index, weight in sorted(features.items())], digest
+
+
+def tfidf_vectors(feature_rows):
+    """
+    متجهات TF-IDF مطبّعة ومتفرقة من المتجهات المخزنة: [(الفهارس، الأوزان)، ...]
+    تكرار المستندات يُحسب من الفهارس المخزنة مباشرة
+    """
+    vectors = [
+        (np.array([i for i, _ in features], dtype=np.int64), np.array([w for _, w in features], dtype=np.float32))
+        for features in feature_rows
+    ]
+    document_frequency = np.bincount(
+        np.concatenate([indexes for indexes, _ in vectors] or [np.zeros(0, dtype=np.int64)]),
+        minlength=dimensions()
+    )
+    idf = np.log((1 + len(vectors)) / (1 + document_frequency)).astype(np.float32) + 1
+    result = []
+    for indexes, weights in vectors:
+        weights = weights * idf[indexes]
+        norm = np.linalg.norm(weights)
+        result.append((indexes, weights / norm if norm else weights))
+    return result
+
+
+def dense_rows(vectors):
+    """مصفوفة كثيفة لدفعة صغيرة من المتجهات فقط"""
+    matrix = np.zeros((len(vectors), dimensions()), dtype=np.float32)
+    for row, (indexes, weights) in enumerate(vectors):
+        matrix[row, indexes] = weights
+    return matrix
+
+
+def chunk_scores(vectors, rows):
+    """يولّد (الصفوف، درجات تشابهها مع كل المواقع) على دفعات من CHUNK_SIZE صفاً"""
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = np.asarray(rows[start:start + CHUNK_SIZE])
+        query = dense_rows([vectors[row] for row in chunk])
+        scores = np.empty((len(chunk), len(vectors)), dtype=np.float32)
+        for column in range(0, len(vectors), CHUNK_SIZE):
+            block = dense_rows(vectors[column:column + CHUNK_SIZE])
+            scores[:, column:column + len(block)] = query @ block.T
+        yield chunk, scores
+
+
+def nearest(vectors, ids, rows, limit):
+    """أقرب المواقع لكل صف من الصفوف المعطاة: {معرّف: [[معرّف، الدرجة]، ...]}"""
+    ids = np.asarray(ids)
+    threshold = min_score()
+    result = {}
+    for chunk, scores in chunk_scores(vectors, rows):
+        scores[np.arange(len(chunk)), chunk] = -1
+        count = min(limit, len(ids) - 1)
+        if count <= 0:
+            result.update({int(ids[row]): [] for row in chunk})
+            continue
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        for row, candidates, row_scores in zip(chunk, top, scores):
+            ranked = sorted(candidates, key=lambda c: (-row_scores[c], ids[c]))
+            result[int(ids[row])] = [
+                [int(ids[c]), round(float(row_scores[c]), 4)] for c in ranked if row_scores[c] >= threshold
+            ]
+    return result
+
+
+def update(full=False):
+    """
+    تحديث متجهات المواقع التي حُفظت بعد بناء متجهها، ثم إعادة ترتيب جيرانها
+    full=True يعيد حساب كل المتجهات وكل القوائم
+    يعيد عدد المواقع التي أعيد ترتيب جيرانها
+    """
+    now = timezone.now()
+    places = list(TouristPlace.objects.filter(is_active=True).only(
+        'pk', 'category_id', 'governorate_id', 'updated_at', *FIELD_WEIGHTS
+    ))
+    existing = {row.pk: row for row in PlaceSimilarity.objects.all()}
+    active_ids = {place.pk for place in places}
+    removed = set(existing) - active_ids
+
+    changed, stale = set(), {}
+    for place in places:
+        row = existing.get(place.pk)
+        if not full and row is not None and row.indexed_at >= place.updated_at:
+            continue
+        features, digest = place_features(place)
+        if row is None:
+            row = existing[place.pk] = PlaceSimilarity(place_id=place.pk)
+        if full or row.digest != digest:
+            changed.add(place.pk)
+        row.features, row.digest, row.indexed_at = features, digest, now
+        stale[place.pk] = row
+
+    ids = sorted(active_ids)
+    vectors = tfidf_vectors([existing[place_id].features for place_id in ids])
+    position = {place_id: i for i, place_id in enumerate(ids)}
+    limit = top_k()
+
+    if full:
+        affected = set(ids)
+    else:
+        # المواقع التي كان أحد المتغيرين من جيرانها، أو قد يدخل قائمتها الآن
+        affected = set(changed)
+        if changed or removed:
+            changed_rows = [position[place_id] for place_id in changed]
+            best = np.zeros(len(ids), dtype=np.float32)
+            for _, scores in chunk_scores(vectors, changed_rows):
+                np.maximum(best, scores.max(axis=0), out=best)
+            for place_id in ids:
+                neighbours = existing[place_id].neighbours
+                floor = neighbours[-1][1] if len(neighbours) >= limit else min_score()
+                if {n for n, _ in neighbours} & (changed | removed) or best[position[place_id]] > floor:
+                    affected.add(place_id)
+
+    ranked = nearest(vectors, ids, [position[place_id] for place_id in sorted(affected)], limit)
+    for place_id, neighbours in ranked.items():
+        existing[place_id].neighbours = neighbours
+        stale[place_id] = existing[place_id]
+
+    new_rows = [row for row in stale.values() if row._state.adding]
+    updated_rows = [row for row in stale.values() if not row._state.adding]
+    with transaction.atomic():
+        PlaceSimilarity.objects.filter(pk__in=removed).delete()
+        PlaceSimilarity.objects.bulk_create(new_rows, batch_size=500)
+        PlaceSimilarity.objects.bulk_update(
+            updated_rows, ['features', 'digest', 'neighbours', 'indexed_at'], batch_size=500
+        )
+    return len(affected)
+
+
+def similar_place_ids(place):
+    """معرّفات المواقع المشابهة المخزنة (تتطلب select_related('similarity') لتجنب استعلام إضافي)"""
+    try:
+        return [place_id for place_id, _ in place.similarity.neighbours]
+    except PlaceSimilarity.DoesNotExist:
+        return []
@@ -0,0 +1,47 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from tourism.images import DEFAULT_SIZES
+
+register = template.Library()
+
+
+@register.simple_tag
+def place_picture(image, rendition, alt='', css_class='', style='', sizes=None, lazy=True):
+    """
+    Render a place image rendition as a responsive <picture>: WebP and JPEG
+    srcset/sizes, explicit dimensions, lazy loading and a blurred placeholder
+    Usage: {% place_picture main_image 'card' alt=place.name css_class='card-img-top' %}
+           {% place_picture main_image 'hero' sizes='100vw' lazy=False %}
+    """
+    data = image.get_rendition(rendition)
+    sizes = sizes or DEFAULT_SIZES.get(rendition, '100vw')
+    if image.placeholder:
+        style = f'{style} background: url({image.placeholder}) center / cover no-repeat;'.strip()
+
+    attrs = [('src', data['url'])]
+    if data['srcset']:
+        attrs += [('srcset', data['srcset']), ('sizes', sizes)]
+    if data['width']:
+        attrs += [('width', data['width']), ('height', data['height'])]
+    attrs += [('alt', alt), ('loading', 'lazy' if lazy else 'eager'), ('decoding', 'async')]
+    if css_class:
+        attrs.append(('class', css_class))
+    if style:
+        attrs.append(('style', style))
+    img = format_html('<img {}>', format_html_join(' ', '{}="{}"', attrs))
+    if not data['webp_srcset']:
+        return img
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>',
+        data['webp_srcset'], sizes, img,
+    )
+
+
+@register.simple_tag
+def rendition_url(image, rendition):
+    """
+    URL of a place image rendition (the original until it is generated)
+    Usage: {% rendition_url image 'gallery' %}
+    """
+    return image.get_rendition(rendition)['url']
@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """
+    Build a pagination link that keeps the current filters
+    Usage: {% page_url cursor=places.next_cursor %} or {% page_url page=num %}
+    """
+    query = context['request'].GET.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    for key, value in params.items():
+        if value not in (None, ''):
+            query[key] = value
+    return f'?{query.urlencode()}'
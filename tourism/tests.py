@@ -1,6 +1,49 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Category, Governorate, TouristPlace
+from django.utils import timezone
+import datetime
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from PIL import Image
+
+from . import geo, image_import, images, jobs, planner, recommendations, search, similarity, trip_plans
+from .counters import view_counter
+from .travel_matrix import TravelMatrix, travel_matrix
+from .planner import generate_tour_program, get_tour_program
+from .views import get_governorate_groups
+from .models import Category, Governorate, TouristPlace, PlaceImage, PlannerJob, UserTripPlan, TripPlanDay, SavedPlace
+
+
+def setUpModule():
+    # لا تعدّل الاختبارات مصفوفة المسافات الحقيقية في BASE_DIR/travel_matrix
+    directory = tempfile.mkdtemp()
+    override = override_settings(TRAVEL_MATRIX_DIR=directory)
+    override.enable()
+    _module_cleanups.extend([override.disable, lambda: shutil.rmtree(directory, ignore_errors=True)])
+
+
+def tearDownModule():
+    while _module_cleanups:
+        _module_cleanups.pop()()
+
+
+_module_cleanups = []
 
 
 class CategoryModelTest(TestCase):
@@ -67,6 +110,34 @@ class TouristPlaceModelTest(TestCase):
         self.place.increment_views()
         self.assertEqual(self.place.view_count, initial_count + 1)
 
+    @override_settings(VIEW_COUNT_MODE='buffered', VIEW_COUNT_FLUSH_INTERVAL=3600)
+    def test_buffered_view_count(self):
+        """Test buffered views are written in one batch on flush"""
+        view_counter.flush()
+        for _ in range(3):
+            self.place.increment_views()
+        self.place.refresh_from_db()
+        self.assertEqual(self.place.view_count, 0)
+        self.assertEqual(view_counter.pending(self.place.pk), 3)
+
+        with self.assertNumQueries(1):
+            view_counter.flush()
+        self.place.refresh_from_db()
+        self.assertEqual(self.place.view_count, 3)
+        self.assertTrue(view_counter._flusher.is_alive())
+
+    @override_settings(VIEW_COUNT_MODE='buffered', VIEW_COUNT_FLUSH_INTERVAL=3600, VIEW_COUNT_MAX_PENDING=5)
+    def test_buffer_capped_by_total_views(self):
+        """Test the buffer is flushed once the total pending views reach the cap, even for one place"""
+        view_counter.flush()
+        for _ in range(4):
+            self.place.increment_views()
+        self.assertEqual(view_counter.pending(), 4)
+        self.place.increment_views()
+        self.assertEqual(view_counter.pending(), 0)
+        self.place.refresh_from_db()
+        self.assertEqual(self.place.view_count, 5)
+
 
 class ViewsTest(TestCase):
     """Test views"""
@@ -128,3 +199,1468 @@ class ViewsTest(TestCase):
         """Test tour planner page"""
         response = self.client.get(reverse('tourism:tour_planner'))
         self.assertEqual(response.status_code, 200)
+
+
+class ListQueryCountTest(TestCase):
+    """Test card grids render with a constant number of queries"""
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            name='السياحة الفرعونية',
+            name_en='Pharaonic',
+            slug='pharaonic',
+            description='Test'
+        )
+        self.governorate = Governorate.objects.create(
+            name='الأقصر',
+            name_en='Luxor',
+            slug='luxor'
+        )
+
+    def create_places(self, count):
+        start = TouristPlace.objects.count()
+        for i in range(start, start + count):
+            place = TouristPlace.objects.create(
+                name=f'موقع {i}',
+                name_en=f'Place {i}',
+                category=self.category,
+                governorate=self.governorate,
+                city='الأقصر',
+                short_description='Test',
+                description='<p>Test</p>',
+                is_featured=True
+            )
+            PlaceImage.objects.create(place=place, image=f'places/{i}-a.jpg', order=1)
+            PlaceImage.objects.create(place=place, image=f'places/{i}-b.jpg', is_main=True)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_views_constant_queries(self):
+        """Test query count does not grow with the number of cards"""
+        urls = [
+            reverse('tourism:home'),
+            reverse('tourism:all_places'),
+            reverse('tourism:category_detail', kwargs={'slug': 'pharaonic'}),
+            reverse('tourism:governorate_detail', kwargs={'slug': 'luxor'}),
+        ]
+        self.create_places(1)
+        baseline = {url: self.count_queries(url) for url in urls}
+        self.create_places(11)
+        for url in urls:
+            self.assertEqual(self.count_queries(url), baseline[url], url)
+
+    def test_main_image_from_prefetch(self):
+        """Test get_main_image uses prefetched images"""
+        self.create_places(1)
+        place = TouristPlace.objects.prefetch_related('images').get()
+        with self.assertNumQueries(0):
+            main_image = place.get_main_image()
+        self.assertTrue(main_image.is_main)
+
+
+class SearchIndexTest(TestCase):
+    """Test the full-text search index"""
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            name='السياحة الفرعونية',
+            name_en='Pharaonic',
+            description='Test'
+        )
+        self.governorate = Governorate.objects.create(
+            name='الأقصر',
+            name_en='Luxor'
+        )
+        self.karnak = TouristPlace.objects.create(
+            name='معبد الكرنك',
+            name_en='Karnak Temple',
+            slug='karnak',
+            category=self.category,
+            governorate=self.governorate,
+            city='الأقصر',
+            short_description='Test',
+            description='<p>أكبر مجمع <strong>معابد</strong> في العالم</p>',
+            description_en='<p>The largest temple complex, near the Nile</p>'
+        )
+        self.museum = TouristPlace.objects.create(
+            name='متحف الأقصر',
+            name_en='Luxor Museum',
+            slug='luxor-museum',
+            category=self.category,
+            governorate=self.governorate,
+            city='الأقصر',
+            short_description='Test',
+            description='<p>متحف</p>',
+            description_en='<p>A museum with finds from Karnak</p>'
+        )
+
+    def test_bilingual_ranked_results(self):
+        """Test English and Arabic queries rank name matches first"""
+        hits = search.search('karnak')
+        self.assertEqual([pk for pk, _ in hits], [self.karnak.pk, self.museum.pk])
+        self.assertEqual([pk for pk, _ in search.search('الكرنك')], [self.karnak.pk])
+        self.assertIn('<mark>', hits[0][1])
+
+    def test_snippet_strips_html(self):
+        """Test snippets contain no stored HTML"""
+        _, snippet = search.search('معابد')[0]
+        self.assertNotIn('<strong>', snippet)
+        self.assertIn('<mark>معابد</mark>', snippet)
+
+    def test_index_follows_model_changes(self):
+        """Test the index stays in sync through signals"""
+        self.karnak.name_en = 'Temple of Amun'
+        self.karnak.save()
+        self.assertEqual(search.search('amun')[0][0], self.karnak.pk)
+        self.museum.is_active = False
+        self.museum.save()
+        self.assertEqual(search.search('museum'), [])
+        self.karnak.delete()
+        self.assertEqual(search.search('amun'), [])
+
+    def test_view_count_updates_skip_index(self):
+        """Test saving only the view counter does not rewrite the index"""
+        self.karnak.view_count = 10
+        with CaptureQueriesContext(connection) as queries:
+            self.karnak.save(update_fields=['view_count'])
+        self.assertEqual(len(queries), 1)
+
+    def test_all_places_search(self):
+        """Test all_places orders search results by relevance"""
+        response = self.client.get(reverse('tourism:all_places'), {'q': 'Karn'})
+        self.assertEqual(list(response.context['places']), [self.karnak, self.museum])
+        self.assertContains(response, '<mark>')
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_filters_apply_before_result_limit(self):
+        """Test category filters are applied inside the index query, before the cap"""
+        other = Category.objects.create(name='متاحف', name_en='Museums', slug='museums', description='Test')
+        TouristPlace.objects.filter(pk=self.museum.pk).update(category=other)
+        response = self.client.get(reverse('tourism:all_places'), {'q': 'karnak', 'category': 'museums'})
+        self.assertEqual(list(response.context['places']), [self.museum])
+
+
+class ArabicNormalizationTest(TestCase):
+    """Test Arabic-aware search normalization"""
+
+    def setUp(self):
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الإسكندرية', name_en='Alexandria')
+        self.place = TouristPlace.objects.create(
+            name='مَكْتَبَة الإسكندرية',
+            name_en='Bibliotheca Alexandrina',
+            category=category,
+            governorate=governorate,
+            city='الشاطبى',
+            short_description='Test',
+            description='<p>مبنى <b>أثريّ</b></p>'
+        )
+
+    def test_normalize_text(self):
+        """Test diacritics, letter variants and HTML are normalized"""
+        self.assertEqual(search.normalize_text('<p>إِسْكَنْدَرِيَّة</p>'), 'اسكندريه')
+        self.assertEqual(search.normalize_text('آثار  مُصطفى'), 'اثار مصطفي')
+        self.assertEqual(search.normalize_text('Giza &amp; Saqqara'), 'giza & saqqara')
+
+    def test_normalized_fields_on_save(self):
+        """Test normalized columns are computed when the place is saved"""
+        self.assertEqual(self.place.name_normalized, 'مكتبه الاسكندريه')
+        self.assertEqual(self.place.city_normalized, 'الشاطبي')
+        self.assertEqual(self.place.description_normalized, 'مبني اثري')
+
+    def test_variant_queries_match(self):
+        """Test spelling variants of the query match the place"""
+        for query in ['مكتبه', 'مكتبة الأسكندرية', 'الشاطبي', 'اثري']:
+            self.assertEqual([pk for pk, _ in search.search(query)], [self.place.pk], query)
+            self.assertTrue(
+                search.filter_normalized(TouristPlace.objects.all(), query).exists(), query
+            )
+
+    def test_snippet_shows_original_text(self):
+        """Test snippets highlight the original spelling, not the normalized index text"""
+        _, snippet = search.search('اثري')[0]
+        self.assertEqual(snippet, 'مبنى <mark>أثريّ</mark>')
+        _, snippet = search.search('مكتبه الاسكندريه')[0]
+        self.assertEqual(snippet, '<mark>مَكْتَبَة</mark> <mark>الإسكندرية</mark>')
+
+
+@override_settings(PLACES_PAGINATION_MODE='cursor')
+class CursorPaginationTest(TestCase):
+    """Test keyset pagination of place listings"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', slug='pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor', slug='luxor')
+        for i in range(30):
+            TouristPlace.objects.create(
+                name=f'موقع {i:02d}',
+                name_en=f'Place {i:02d}',
+                category=category,
+                governorate=governorate,
+                city='الأقصر',
+                short_description='Test',
+                description='<p>Test</p>',
+                priority=i % 3 + 1,
+                view_count=i % 4
+            )
+
+    def walk(self, sort):
+        url = reverse('tourism:all_places')
+        pages = []
+        params = {'sort': sort}
+        while True:
+            page = self.client.get(url, params).context['places']
+            pages.append([place.pk for place in page])
+            if not page.has_next():
+                return pages, page
+            params = {'sort': sort, 'cursor': page.next_cursor}
+
+    def test_walk_all_sorts(self):
+        """Test every place appears once, in sort order, for each sort"""
+        expected = {
+            'priority': TouristPlace.objects.order_by('priority', 'id'),
+            'name': TouristPlace.objects.order_by('name', 'id'),
+            'popular': TouristPlace.objects.order_by('-view_count', 'id'),
+        }
+        for sort, queryset in expected.items():
+            pages, _ = self.walk(sort)
+            self.assertEqual([len(p) for p in pages], [12, 12, 6])
+            self.assertEqual(sum(pages, []), list(queryset.values_list('pk', flat=True)))
+
+    def test_previous_cursor(self):
+        """Test walking backwards returns the same pages"""
+        pages, last = self.walk('popular')
+        url = reverse('tourism:all_places')
+        page = self.client.get(url, {'sort': 'popular', 'cursor': last.previous_cursor}).context['places']
+        self.assertEqual([place.pk for place in page], pages[1])
+        page = self.client.get(url, {'sort': 'popular', 'cursor': page.previous_cursor}).context['places']
+        self.assertEqual([place.pk for place in page], pages[0])
+        self.assertFalse(page.has_previous())
+
+    def test_deep_page_skips_count(self):
+        """Test deep pages reuse the cached count and issue no COUNT query"""
+        url = reverse('tourism:all_places')
+        first = self.client.get(url).context['places']
+        self.assertEqual(first.paginator.count, 30)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'cursor': first.next_cursor})
+        self.assertEqual(response.context['places'].paginator.count, 30)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor falls back to the first page"""
+        response = self.client.get(reverse('tourism:all_places'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['places'].has_previous())
+
+
+class GovernorateGroupsTest(TestCase):
+    """Test the per-category summary on governorate pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.governorate = Governorate.objects.create(name='القاهرة', name_en='Cairo', slug='cairo')
+        self.islamic = Category.objects.create(name='إسلامية', name_en='Islamic', description='Test', order=2)
+        self.coptic = Category.objects.create(name='قبطية', name_en='Coptic', description='Test', order=1)
+        for i in range(6):
+            TouristPlace.objects.create(
+                name=f'مسجد {i}', name_en=f'Mosque {i}', category=self.islamic,
+                governorate=self.governorate, city='القاهرة', short_description='Test',
+                description='<p>Test</p>', priority=10 - i
+            )
+        TouristPlace.objects.create(
+            name='كنيسة', name_en='Church', category=self.coptic,
+            governorate=self.governorate, city='القاهرة', short_description='Test',
+            description='<p>Test</p>'
+        )
+
+    def test_counts_and_bounded_previews(self):
+        """Test counts cover every place while previews stay bounded"""
+        groups = get_governorate_groups(self.governorate, 'en')
+        self.assertEqual([g['name'] for g in groups], ['Coptic', 'Islamic'])
+        self.assertEqual([g['count'] for g in groups], [1, 6])
+        self.assertEqual(
+            [p['name'] for p in groups[1]['places']],
+            ['Mosque 5', 'Mosque 4', 'Mosque 3', 'Mosque 2']
+        )
+
+    def test_cached_and_invalidated(self):
+        """Test groups are cached per language and invalidated on changes"""
+        get_governorate_groups(self.governorate, 'ar')
+        with self.assertNumQueries(0):
+            groups = get_governorate_groups(self.governorate, 'ar')
+        self.assertEqual(groups[0]['name'], 'قبطية')
+        self.coptic.name = 'السياحة القبطية'
+        self.coptic.save()
+        self.assertEqual(get_governorate_groups(self.governorate, 'ar')[0]['name'], 'السياحة القبطية')
+
+
+class HomeCacheTest(TestCase):
+    """Test the home page fragment cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', slug='pharaonic', description='Test')
+        self.governorate = Governorate.objects.create(name='الجيزة', name_en='Giza', slug='giza')
+        self.place = TouristPlace.objects.create(
+            name='الأهرامات', name_en='Pyramids', category=self.category,
+            governorate=self.governorate, city='الجيزة', short_description='Test',
+            description='<p>Test</p>', is_featured=True
+        )
+
+    def test_warm_home_page_has_no_queries(self):
+        """Test a warm home page is served without database queries"""
+        self.client.get(reverse('tourism:home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('tourism:home'))
+        self.assertContains(response, 'الأهرامات')
+
+    def test_language_variants(self):
+        """Test fragments are cached per language"""
+        self.client.get(reverse('tourism:home'))
+        self.client.get(reverse('tourism:set_language', args=['en']))
+        response = self.client.get(reverse('tourism:home'))
+        self.assertContains(response, 'Pharaonic')
+
+    def test_invalidated_by_model_changes(self):
+        """Test content changes show up on the next request"""
+        self.client.get(reverse('tourism:home'))
+        self.governorate.name = 'محافظة الجيزة'
+        self.governorate.save()
+        self.assertContains(self.client.get(reverse('tourism:home')), 'محافظة الجيزة')
+        PlaceImage.objects.create(place=self.place, image='places/pyramids.jpg', is_main=True)
+        self.assertContains(self.client.get(reverse('tourism:home')), 'places/pyramids.jpg')
+
+
+class NearbyPlacesTest(TestCase):
+    """Test the spatial grid index and the nearby places API"""
+
+    def setUp(self):
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الجيزة', name_en='Giza')
+        coordinates = {
+            'pyramids': (29.9792, 31.1342),
+            'sphinx': (29.9753, 31.1376),
+            'museum': (30.0478, 31.2336),
+            'karnak': (25.7188, 32.6573),
+            'unknown': (None, None),
+        }
+        self.places = {}
+        for slug, (lat, lng) in coordinates.items():
+            self.places[slug] = TouristPlace.objects.create(
+                name=slug, name_en=slug, slug=slug, category=category,
+                governorate=governorate, city='الجيزة', short_description='Test',
+                description='<p>Test</p>', latitude=lat, longitude=lng
+            )
+
+    def test_geo_cell_on_save(self):
+        """Test the grid cell follows the coordinates"""
+        place = self.places['museum']
+        self.assertEqual(place.geo_cell, geo.cell_for(30.0478, 31.2336))
+        self.assertIsNone(self.places['unknown'].geo_cell)
+        place.latitude, place.longitude = 25.7, 32.6
+        place.save()
+        self.assertEqual(place.geo_cell, geo.cell_for(25.7, 32.6))
+
+    def test_within_radius(self):
+        """Test radius search returns places sorted by distance"""
+        results = geo.within_radius(29.9792, 31.1342, 20)
+        self.assertEqual([p.slug for p, _ in results], ['pyramids', 'sphinx', 'museum'])
+        self.assertAlmostEqual(results[1][1], 0.54, places=1)
+
+    def test_nearest(self):
+        """Test k-nearest expands the radius until k places are found"""
+        results = geo.nearest(29.9792, 31.1342, 3, exclude=self.places['pyramids'].pk)
+        self.assertEqual([p.slug for p, _ in results], ['sphinx', 'museum', 'karnak'])
+
+    def test_api(self):
+        """Test the JSON endpoint and the place_detail section"""
+        url = reverse('tourism:nearby_places_api')
+        data = self.client.get(url, {'place': 'pyramids', 'k': 2}).json()
+        self.assertEqual([r['slug'] for r in data['results']], ['sphinx', 'museum'])
+        data = self.client.get(url, {'lat': 25.72, 'lng': 32.66, 'radius': 5}).json()
+        self.assertEqual([r['slug'] for r in data['results']], ['karnak'])
+        self.assertEqual(self.client.get(url, {'lat': 'x'}).status_code, 400)
+        for params in ({'radius': 'nan'}, {'radius': 'inf'}, {'radius': '-5'}, {'radius': '0'}, {'lat': 'nan'}, {'lng': 'inf'}):
+            params = {'lat': 25.72, 'lng': 32.66, **params}
+            self.assertEqual(self.client.get(url, params).status_code, 400)
+        response = self.client.get(reverse('tourism:place_detail', args=['pyramids']))
+        self.assertEqual([p.slug for p, _ in response.context['nearby_places']], ['sphinx', 'museum'])
+
+
+class MapPlacesTest(TestCase):
+    """Test the viewport map markers endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الجيزة', name_en='Giza')
+        coordinates = [(29.9792, 31.1342), (29.9753, 31.1376), (30.0478, 31.2336), (25.7188, 32.6573)]
+        for i, (lat, lng) in enumerate(coordinates):
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=category,
+                governorate=governorate, city='الجيزة', short_description='Test',
+                description='<p>Test</p>', latitude=lat, longitude=lng
+            )
+        self.url = reverse('tourism:map_places_api')
+
+    def test_low_zoom_returns_clusters(self):
+        """Test low zoom levels return grid clusters with counts"""
+        data = self.client.get(self.url, {'bbox': '24,22,37,32', 'zoom': 3}).json()
+        self.assertTrue(data['clustered'])
+        self.assertEqual([f['properties']['count'] for f in data['features']], [4])
+        data = self.client.get(self.url, {'bbox': '24,22,37,32', 'zoom': 11}).json()
+        counts = sorted(f['properties']['count'] for f in data['features'])
+        self.assertEqual(counts, [1, 1, 2])
+
+    def test_high_zoom_returns_places_in_bbox(self):
+        """Test high zoom levels return only the places inside the viewport"""
+        data = self.client.get(self.url, {'bbox': '31.10,29.95,31.16,30.00', 'zoom': 14}).json()
+        self.assertFalse(data['clustered'])
+        self.assertEqual(sorted(f['properties']['name'] for f in data['features']), ['موقع 0', 'موقع 1'])
+        self.assertEqual(self.client.get(self.url, {'bbox': '1,2'}).status_code, 400)
+
+    def test_large_viewport_at_high_zoom(self):
+        """Test a world-sized viewport at high zoom uses a bounded cell filter"""
+        data = self.client.get(self.url, {'bbox': '-180,-90,180,90', 'zoom': 15}).json()
+        self.assertFalse(data['clustered'])
+        self.assertEqual(len(data['features']), 4)
+
+    def test_non_finite_bbox_rejected(self):
+        """Test NaN and infinite coordinates are rejected"""
+        for bbox in ('nan,29,31,30', '31,29,inf,30', '-inf,-inf,inf,inf'):
+            self.assertEqual(self.client.get(self.url, {'bbox': bbox, 'zoom': 14}).status_code, 400)
+
+    def test_cached_until_catalog_changes(self):
+        """Test repeated viewports are served from the cache"""
+        params = {'bbox': '24,22,37,32', 'zoom': 3}
+        self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, params)
+        self.assertEqual(len(queries), 0)
+        TouristPlace.objects.filter(name='موقع 3').get().delete()
+        data = self.client.get(self.url, params).json()
+        self.assertEqual([f['properties']['count'] for f in data['features']], [3])
+
+
+class PlaceSuggestionsTest(TestCase):
+    """Test the typeahead place picker"""
+
+    def setUp(self):
+        pharaonic = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        islamic = Category.objects.create(name='إسلامية', name_en='Islamic', description='Test')
+        luxor = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        cairo = Governorate.objects.create(name='القاهرة', name_en='Cairo')
+        places = [
+            ('معبد الكرنك', 'Karnak Temple', pharaonic, luxor),
+            ('معبد الأقصر', 'Luxor Temple', pharaonic, luxor),
+            ('الأهرامات', 'Pyramids', pharaonic, cairo),
+            ('مسجد ابن طولون', 'Ibn Tulun Mosque', islamic, cairo),
+        ]
+        for name, name_en, category, governorate in places:
+            TouristPlace.objects.create(
+                name=name, name_en=name_en, category=category, governorate=governorate,
+                city='Test', short_description='Test', description='<p>Test</p>'
+            )
+        self.url = reverse('tourism:place_suggestions_api')
+
+    def names(self, **params):
+        return sorted(r['name'] for r in self.client.get(self.url, params).json()['results'])
+
+    def test_bilingual_prefix_match(self):
+        """Test Arabic (normalized) and English name prefixes"""
+        self.assertEqual(self.names(q='معبد'), ['معبد الأقصر', 'معبد الكرنك'])
+        self.assertEqual(self.names(q='الاهرام'), ['الأهرامات'])
+        self.assertEqual(self.names(q='LUX'), ['معبد الأقصر'])
+
+    def test_empty_query_returns_top_places(self):
+        """Test an empty query lists the top places matching the filters"""
+        self.assertEqual(len(self.names(q='')), 4)
+        self.assertEqual(self.names(category='islamic'), ['مسجد ابن طولون'])
+        self.assertEqual(self.names(q='  ', governorate='luxor', limit=1), ['معبد الأقصر'])
+
+    def test_filters_and_limit(self):
+        """Test category/governorate filters and the result cap"""
+        self.assertEqual(self.names(q='م', category='islamic'), ['مسجد ابن طولون'])
+        self.assertEqual(self.names(q='م', governorate='luxor'), ['معبد الأقصر', 'معبد الكرنك'])
+        self.assertEqual(len(self.names(q='م', limit=1)), 1)
+
+    def test_trip_plan_page_does_not_list_catalog(self):
+        """Test the trip plan page no longer renders every place"""
+        user = User.objects.create_user(username='traveler', password='pass12345')
+        trip_plan = UserTripPlan.objects.create(user=user, title='Trip')
+        self.client.login(username='traveler', password='pass12345')
+        response = self.client.get(reverse('tourism:trip_plan_detail', args=[trip_plan.pk]))
+        self.assertNotContains(response, 'معبد الكرنك')
+        self.assertNotIn('available_places', response.context)
+
+
+class TripPlanBatchTest(TestCase):
+    """Test batch add/move operations on trip plans"""
+
+    def setUp(self):
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=category, governorate=governorate,
+                city='Test', short_description='Test', description='<p>Test</p>'
+            )
+            for i in range(5)
+        ]
+        user = User.objects.create_user(username='traveler', password='pass12345')
+        self.trip_plan = UserTripPlan.objects.create(user=user, title='Trip')
+        self.client.login(username='traveler', password='pass12345')
+        self.url = reverse('tourism:batch_update_plan', args=[self.trip_plan.pk])
+
+    def post(self, operations):
+        return self.client.post(self.url, json.dumps({'operations': operations}), content_type='application/json')
+
+    def test_bulk_add_and_move(self):
+        """Test many operations are applied in a fixed number of queries"""
+        operations = [
+            {'place_id': place.pk, 'day_number': i % 3 + 1, 'visit_time': f'{9 + i}:00'}
+            for i, place in enumerate(self.places)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            data = self.post(operations).json()
+        self.assertLess(len(queries), 15)
+        self.assertEqual(len(data['created']), 5)
+        self.assertEqual(self.trip_plan.days.count(), 5)
+
+        entry = data['created'][0]
+        data = self.post([
+            {'id': entry['id'], 'place_id': entry['place_id'], 'day_number': 4},
+            {'place_id': self.places[1].pk, 'day_number': 2, 'visit_time': '10:00'},
+        ]).json()
+        self.assertEqual(data['updated'], [{**entry, 'day_number': 4}])
+        self.assertEqual(data['unchanged'], 1)
+
+    def test_chained_moves(self):
+        """Test moving a place into a day it is being moved out of, in either order"""
+        place = self.places[0]
+        first = TripPlanDay.objects.create(trip_plan=self.trip_plan, place=place, day_number=1)
+        second = TripPlanDay.objects.create(trip_plan=self.trip_plan, place=place, day_number=2)
+        moves = [
+            {'id': second.pk, 'place_id': place.pk, 'day_number': 3},
+            {'id': first.pk, 'place_id': place.pk, 'day_number': 2},
+        ]
+        for operations in (moves, moves[::-1]):
+            TripPlanDay.objects.filter(pk=first.pk).update(day_number=1)
+            TripPlanDay.objects.filter(pk=second.pk).update(day_number=2)
+            response = self.post(operations)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                dict(self.trip_plan.days.values_list('pk', 'day_number')), {first.pk: 2, second.pk: 3}
+            )
+
+        # تبديل يومين، وتعارض في الخانة النهائية مهما كان الترتيب
+        swap = [
+            {'id': first.pk, 'place_id': place.pk, 'day_number': 3},
+            {'id': second.pk, 'place_id': place.pk, 'day_number': 2},
+        ]
+        self.assertEqual(self.post(swap).status_code, 200)
+        self.assertEqual(dict(self.trip_plan.days.values_list('pk', 'day_number')), {first.pk: 3, second.pk: 2})
+        conflict = [
+            {'id': first.pk, 'place_id': place.pk, 'day_number': 1},
+            {'place_id': place.pk, 'day_number': 1},
+        ]
+        for operations in (conflict, conflict[::-1]):
+            response = self.post(operations)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(len(response.json()['errors']), 2)
+
+    def test_undecodable_body_is_rejected(self):
+        """Test a body that is not UTF-8 returns 400"""
+        response = self.client.post(self.url, b'\xff\xfe{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_batch_is_rejected_atomically(self):
+        """Test one invalid operation rejects the whole batch"""
+        self.places[4].is_active = False
+        self.places[4].save()
+        response = self.post([
+            {'place_id': self.places[0].pk, 'day_number': 1},
+            {'place_id': self.places[4].pk, 'day_number': 1},
+            {'place_id': self.places[1].pk, 'day_number': 1, 'visit_time': '25:99'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [2])
+        response = self.post([
+            {'place_id': self.places[0].pk, 'day_number': 1},
+            {'place_id': self.places[4].pk, 'day_number': 1},
+        ])
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1])
+        self.assertFalse(self.trip_plan.days.exists())
+
+
+class TripPlanOptimizeTest(TestCase):
+    """Test the optimize my days action"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        self.governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.user = User.objects.create_user(username='traveler', password='pass12345')
+        self.trip_plan = UserTripPlan.objects.create(user=self.user, title='Trip')
+        self.client.login(username='traveler', password='pass12345')
+
+    def add(self, name, lat, lng, day_number=1, duration=2):
+        place = TouristPlace.objects.create(
+            name=name, name_en=name, category=self.category, governorate=self.governorate,
+            city='Test', short_description='Test', description='<p>Test</p>',
+            latitude=lat, longitude=lng, suggested_duration=duration
+        )
+        return TripPlanDay.objects.create(trip_plan=self.trip_plan, place=place, day_number=day_number)
+
+    def test_orders_day_and_assigns_times(self):
+        """Test places are ordered by distance with increasing visit times"""
+        self.add('a', 30.00, 31.00)
+        self.add('c', 30.20, 31.00)
+        self.add('b', 30.01, 31.00)
+        response = self.client.post(reverse('tourism:optimize_trip_plan', args=[self.trip_plan.pk]))
+        self.assertRedirects(response, reverse('tourism:trip_plan_detail', args=[self.trip_plan.pk]))
+
+        response = self.client.get(reverse('tourism:trip_plan_detail', args=[self.trip_plan.pk]))
+        entries = response.context['days_data'][1]
+        self.assertEqual([e.place.name for e in entries], ['a', 'b', 'c'])
+        self.assertEqual(str(entries[0].visit_time), '09:00:00')
+        # ساعتان للزيارة ثم دقائق قليلة للطريق (مقربة لأقرب 5 دقائق)
+        self.assertEqual(str(entries[1].visit_time), '11:05:00')
+        self.assertGreater(entries[2].visit_time, entries[1].visit_time)
+
+    def test_order_kept_when_times_reach_end_of_day(self):
+        """Test stops past the end of the day keep the optimized order"""
+        for name, lat in [('a', 30.00), ('e', 30.04), ('d', 30.03), ('b', 30.01), ('c', 30.02)]:
+            self.add(name, lat, 31.00, duration=6)
+        trip_plans.optimize_days(self.trip_plan)
+        entries = list(trip_plans.ordered_entries().filter(trip_plan=self.trip_plan))
+        self.assertEqual([e.place.name for e in entries], ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual([e.sequence for e in entries], [0, 1, 2, 3, 4])
+        self.assertEqual(entries[-1].visit_time, entries[-2].visit_time)
+
+    def test_large_plan_uses_constant_queries(self):
+        """Test a plan with 120 stops is optimized with a fixed number of queries and a single update"""
+        rng = random.Random(3)
+        for i in range(120):
+            self.add(f'p{i}', rng.uniform(24, 31), rng.uniform(29, 33), day_number=i % 10 + 1, duration=1)
+        with CaptureQueriesContext(connection) as queries:
+            changed = trip_plans.optimize_days(self.trip_plan)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(changed, 120)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len([sql for sql in updates if 'tourism_tripplanday' in sql]), 1)
+
+
+class TripPlanSummaryTest(TestCase):
+    """Test denormalized trip plan summaries"""
+
+    def setUp(self):
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        self.places = []
+        for name, name_en in [('الأقصر', 'Luxor'), ('أسوان', 'Aswan')]:
+            governorate = Governorate.objects.create(name=name, name_en=name_en)
+            for i in range(2):
+                self.places.append(TouristPlace.objects.create(
+                    name=f'{name} {i}', name_en=f'{name_en} {i}', category=category,
+                    governorate=governorate, city='Test', short_description='Test',
+                    description='<p>Test</p>', suggested_duration=3
+                ))
+        self.user = User.objects.create_user(username='traveler', password='pass12345')
+        self.trip_plan = UserTripPlan.objects.create(user=self.user, title='Trip')
+        self.client.login(username='traveler', password='pass12345')
+
+    def test_summary_follows_entries(self):
+        """Test single saves, batch operations and deletes update the summary"""
+        entry = TripPlanDay.objects.create(trip_plan=self.trip_plan, place=self.places[0], day_number=1)
+        trip_plans.apply_operations(self.trip_plan, trip_plans.parse_operations([
+            {'place_id': place.pk, 'day_number': 2} for place in self.places[1:]
+        ]))
+        self.trip_plan.refresh_from_db()
+        self.assertEqual(
+            (self.trip_plan.place_count, self.trip_plan.day_count, self.trip_plan.total_hours),
+            (4, 2, 12)
+        )
+        self.assertEqual([g['name_en'] for g in self.trip_plan.governorates_summary], ['Aswan', 'Luxor'])
+
+        entry.delete()
+        self.trip_plan.refresh_from_db()
+        self.assertEqual(self.trip_plan.place_count, 3)
+
+    def test_summary_follows_place_edits(self):
+        """Test editing a place's duration or governorate refreshes the plans containing it"""
+        other = UserTripPlan.objects.create(user=self.user, title='Other')
+        for plan in (self.trip_plan, other):
+            TripPlanDay.objects.create(trip_plan=plan, place=self.places[0], day_number=1)
+        TripPlanDay.objects.create(trip_plan=other, place=self.places[1], day_number=1)
+
+        place = self.places[0]
+        place.suggested_duration = 5
+        place.governorate = self.places[2].governorate
+        with self.captureOnCommitCallbacks(execute=True):
+            place.save()
+        self.trip_plan.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.trip_plan.total_hours, 5)
+        self.assertEqual([g['name_en'] for g in self.trip_plan.governorates_summary], ['Aswan'])
+        self.assertEqual(other.total_hours, 8)
+        self.assertEqual([g['name_en'] for g in other.governorates_summary], ['Aswan', 'Luxor'])
+
+        governorate = place.governorate
+        governorate.name_en = 'Aswan Governorate'
+        with self.captureOnCommitCallbacks(execute=True):
+            governorate.save()
+        self.trip_plan.refresh_from_db()
+        self.assertEqual([g['name_en'] for g in self.trip_plan.governorates_summary], ['Aswan Governorate'])
+
+    def test_unrelated_place_edits_skip_refresh(self):
+        """Test saving a place without changing its duration or governorate does not refresh plans"""
+        TripPlanDay.objects.create(trip_plan=self.trip_plan, place=self.places[0], day_number=1)
+        place = TouristPlace.objects.get(pk=self.places[0].pk)
+        place.short_description = 'Edited'
+        with mock.patch('tourism.signals.refresh_plan_summaries') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                place.save()
+            refresh.assert_not_called()
+
+            place.suggested_duration += 1
+            with self.captureOnCommitCallbacks(execute=True):
+                place.save()
+            refresh.assert_called_once()
+
+    def test_list_uses_one_narrow_query(self):
+        """Test the plans list does not load entries or places"""
+        for i in range(3):
+            plan = UserTripPlan.objects.create(user=self.user, title=f'Trip {i}')
+            for place in self.places:
+                TripPlanDay.objects.create(trip_plan=plan, place=place, day_number=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tourism:trip_plans_list'))
+        self.assertContains(response, 'Trip 2')
+        self.assertFalse([q for q in queries if 'tourism_tripplanday' in q['sql']])
+        self.assertEqual(len([q for q in queries if 'tourism_usertripplan' in q['sql']]), 1)
+
+
+class SavedPlacesTest(TestCase):
+    """Test saved place toggling and card marking"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=self.category, governorate=governorate,
+                city='Test', short_description='Test', description='<p>Test</p>'
+            )
+            for i in range(6)
+        ]
+        self.user = User.objects.create_user(username='traveler', password='pass12345')
+        self.client.login(username='traveler', password='pass12345')
+
+    def toggle(self, place):
+        return self.client.post(reverse('tourism:toggle_save_place', args=[place.pk])).json()['status']
+
+    def test_toggle(self):
+        """Test toggling inserts then deletes without duplicates"""
+        self.assertEqual(self.toggle(self.places[0]), 'saved')
+        self.assertEqual(SavedPlace.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.toggle(self.places[0]), 'removed')
+        self.assertFalse(SavedPlace.objects.exists())
+
+    def test_related_update_only_on_insert(self):
+        """Test the related places update is scheduled once per inserted row"""
+        with mock.patch('tourism.recommendations.schedule') as schedule:
+            self.assertEqual(self.toggle(self.places[0]), 'saved')
+            self.assertEqual(self.toggle(self.places[0]), 'removed')
+        schedule.assert_called_once()
+        self.assertEqual(schedule.call_args.args[1:], (self.user.pk, self.places[0].pk))
+
+    def test_cards_marked_without_extra_queries(self):
+        """Test listings mark saved cards from the cached id set"""
+        url = reverse('tourism:category_detail', args=[self.category.slug])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+
+        for place in self.places[:3]:
+            self.toggle(place)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(response.content.decode().count('fa-bookmark"></i></span>'), 3)
+
+        response = self.client.get(reverse('tourism:place_detail', args=[self.places[0].slug]))
+        self.assertContains(response, 'class="btn btn-danger" id="saveBtn"')
+
+
+@override_settings(RECOMMENDATIONS_UPDATE_MODE='inline')
+class RecommendationsTest(TestCase):
+    """Test item-to-item related places"""
+
+    def setUp(self):
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        pharaonic = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        islamic = Category.objects.create(name='إسلامية', name_en='Islamic', description='Test')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=pharaonic if i < 4 else islamic,
+                governorate=governorate, city='Test', short_description='Test', description='<p>Test</p>'
+            )
+            for i in range(6)
+        ]
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(3)]
+
+    def related(self, place):
+        return TouristPlace.objects.get(pk=place.pk).related_place_ids
+
+    def test_rebuild_ranks_cooccurring_places(self):
+        """Test places saved together rank first, padded from the same category"""
+        for user in self.users[:2]:
+            SavedPlace.objects.create(user=user, place=self.places[0])
+            SavedPlace.objects.create(user=user, place=self.places[5])
+        plan = UserTripPlan.objects.create(user=self.users[2], title='Trip')
+        TripPlanDay.objects.create(trip_plan=plan, place=self.places[0], day_number=1)
+        TripPlanDay.objects.create(trip_plan=plan, place=self.places[4], day_number=2)
+
+        recommendations.rebuild()
+        self.assertEqual(self.related(self.places[0]), [self.places[5].pk, self.places[4].pk])
+
+        # القائمة تكتمل بالمواقع المشابهة في المحتوى
+        similarity.update()
+        response = self.client.get(reverse('tourism:place_detail', args=[self.places[0].slug]))
+        related = response.context['related_places']
+        self.assertEqual(related[:2], [self.places[5], self.places[4]])
+        self.assertEqual(len(related), 4)
+        self.assertTrue(set(related[2:]) <= set(self.places[1:4]))
+
+    def test_incremental_updates(self):
+        """Test saves and bulk trip additions update related places without a rebuild"""
+        recommendations.rebuild()
+        self.client.login(username='user0', password='pass12345')
+        for place in (self.places[1], self.places[5]):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('tourism:toggle_save_place', args=[place.pk]))
+        self.assertEqual(self.related(self.places[5])[0], self.places[1].pk)
+
+        plan = UserTripPlan.objects.create(user=self.users[0], title='Trip')
+        with self.captureOnCommitCallbacks(execute=True):
+            trip_plans.apply_operations(plan, [
+                {'index': 0, 'id': None, 'place_id': self.places[2].pk, 'day_number': 1, 'visit_time': None},
+                {'index': 1, 'id': None, 'place_id': self.places[4].pk, 'day_number': 1, 'visit_time': None},
+            ])
+        self.assertEqual(self.related(self.places[4])[0], self.places[2].pk)
+        self.assertEqual(self.related(self.places[2])[0], self.places[4].pk)
+
+    def test_save_defers_update_until_commit(self):
+        """Test saving a place does not update co-occurrence inside the request transaction"""
+        self.client.login(username='user0', password='pass12345')
+        with mock.patch.object(recommendations, 'record_saved_place') as record:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.post(reverse('tourism:toggle_save_place', args=[self.places[1].pk]))
+            record.assert_not_called()
+            for callback in callbacks:
+                callback()
+        record.assert_called_once_with(self.users[0].pk, self.places[1].pk)
+
+
+class SimilarityTest(TestCase):
+    """Test the content-based similarity index"""
+
+    def setUp(self):
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        category = Category.objects.create(name='أثرية', name_en='Historic', description='Test')
+        texts = [
+            ('<p>معبد فرعوني قديم بأعمدة ونقوش هيروغليفية</p>', 'Ancient pharaonic temple with hieroglyphs'),
+            ('<p>معبد فرعوني كبير بنقوش هيروغليفية ملونة</p>', 'Great pharaonic temple with coloured hieroglyphs'),
+            ('<p>مسجد تاريخي بمئذنة ومحراب مزخرف</p>', 'Historic mosque with a minaret and mihrab'),
+            ('<p>مسجد مملوكي بمئذنة عالية</p>', 'Mamluk mosque with a tall minaret'),
+        ]
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=category, governorate=governorate,
+                city='Test', short_description=text, description=text, description_en=text_en
+            )
+            for i, (text, text_en) in enumerate(texts)
+        ]
+
+    def neighbours(self, place):
+        return [place_id for place_id, _ in TouristPlace.objects.get(pk=place.pk).similarity.neighbours]
+
+    def test_text_neighbours(self):
+        """Test places with similar descriptions are each other's nearest neighbours"""
+        self.assertEqual(similarity.update(), 4)
+        self.assertEqual(self.neighbours(self.places[0])[0], self.places[1].pk)
+        self.assertEqual(self.neighbours(self.places[3])[0], self.places[2].pk)
+
+    def test_blocked_scores_match_full_product(self):
+        """Test scoring in small blocks gives the same neighbours as one full product"""
+        similarity.update()
+        expected = {place.pk: self.neighbours(place) for place in self.places}
+        with mock.patch('tourism.similarity.CHUNK_SIZE', 3):
+            similarity.update(full=True)
+        self.assertEqual({place.pk: self.neighbours(place) for place in self.places}, expected)
+
+    def test_incremental_update(self):
+        """Test only places saved after indexing are re-tokenized and re-ranked"""
+        similarity.update()
+        self.assertEqual(similarity.update(), 0)
+
+        # حفظ بدون تغيير النص لا يعيد الترتيب
+        self.places[1].save()
+        self.assertEqual(similarity.update(), 0)
+
+        self.places[1].short_description = self.places[1].description = '<p>مسجد أثري بمئذنة ومحراب</p>'
+        self.places[1].description_en = 'Old mosque with a minaret and mihrab'
+        self.places[1].save()
+        before = dict(TouristPlace.objects.get(pk=self.places[0].pk).similarity.neighbours)
+        self.assertGreater(similarity.update(), 1)
+        after = dict(TouristPlace.objects.get(pk=self.places[0].pk).similarity.neighbours)
+        self.assertLess(after[self.places[1].pk], before[self.places[1].pk])
+        self.assertIn(self.neighbours(self.places[1])[0], {self.places[2].pk, self.places[3].pk})
+
+
+class ImageRenditionsTest(TestCase):
+    """Test place image renditions"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_RENDITION_MODE='inline')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.place = TouristPlace.objects.create(
+            name='الكرنك', name_en='Karnak', category=category, governorate=governorate,
+            city='Test', short_description='Test', description='<p>Test</p>'
+        )
+
+    def upload(self, size=(3000, 2000)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 150, 90)).save(buffer, 'JPEG')
+        return PlaceImage.objects.create(
+            place=self.place, is_main=True,
+            image=SimpleUploadedFile('karnak.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        )
+
+    def test_renditions_generated(self):
+        """Test every rendition is saved in both formats with its dimensions"""
+        image = self.upload()
+        image.refresh_from_db()
+        sizes = {name: (image.renditions[name]['width'], image.renditions[name]['height']) for name in images.RENDITIONS}
+        self.assertEqual(sizes, {'hero': (1350, 900), 'gallery': (1200, 800), 'card': (480, 300), 'thumb': (120, 120)})
+        with default_storage.open(image.renditions['card']['webp']) as file:
+            self.assertEqual(Image.open(file).format, 'WEBP')
+
+        self.assertEqual((image.width, image.height), (3000, 2000))
+        self.assertTrue(image.placeholder.startswith('data:image/jpeg;base64,'))
+
+        response = self.client.get(reverse('tourism:all_places'))
+        card = image.get_rendition('card')
+        self.assertContains(response, card['webp_url'])
+        self.assertIn('320w', card['webp_srcset'])
+        self.assertIn('720w', card['srcset'])
+        self.assertContains(response, 'width="480" height="300" alt="الكرنك" loading="lazy"')
+        self.assertContains(response, image.placeholder)
+        self.assertNotContains(response, image.image.url + '"')
+
+    def test_command_fills_missing_checksums(self):
+        """Test images uploaded before checksums existed get one from the renditions command"""
+        image = self.upload((400, 300))
+        image.refresh_from_db()
+        expected = image.checksum
+        PlaceImage.objects.filter(pk=image.pk).update(checksum='')
+        with mock.patch('tourism.images.generate') as generate:
+            call_command('generate_image_renditions', workers=1, stdout=io.StringIO())
+        generate.assert_called_once_with(image.pk)
+        images.generate(image.pk)
+        image.refresh_from_db()
+        self.assertEqual(image.checksum, expected)
+        with image.image.open('rb') as file:
+            self.assertEqual(expected, images.checksum(file.read()))
+
+        response = self.client.get(reverse('tourism:place_detail', args=[self.place.slug]))
+        self.assertContains(response, 'loading="eager"')
+
+        paths = images.rendition_files(image.renditions)
+        image.delete()
+        self.assertFalse(any(default_storage.exists(path) for path in paths))
+
+    def test_small_images_not_upscaled(self):
+        """Test renditions never enlarge a small original"""
+        image = self.upload((200, 100))
+        image.refresh_from_db()
+        self.assertEqual((image.renditions['card']['width'], image.renditions['card']['height']), (200, 100))
+        self.assertEqual((image.renditions['thumb']['width'], image.renditions['thumb']['height']), (120, 100))
+
+
+class ImageImportTest(TestCase):
+    """Test the bulk image import command"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.source = Path(tempfile.mkdtemp())
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=category, governorate=governorate,
+                city='Test', short_description='Test', description='<p>Test</p>'
+            )
+            for i in range(2)
+        ]
+
+    def write_image(self, path, color):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (800, 600), color).save(path, 'JPEG')
+
+    def test_directory_import_skips_duplicates(self):
+        """Test a directory import creates renditions and skips files already imported"""
+        for i, place in enumerate(self.places):
+            self.write_image(self.source / place.slug / 'a.jpg', (i * 100, 50, 50))
+            self.write_image(self.source / place.slug / 'b.jpg', (i * 100, 150, 50))
+        self.write_image(self.source / 'unknown-place' / 'a.jpg', (0, 0, 0))
+        # نسخة مطابقة لصورة أخرى
+        shutil.copy(self.source / self.places[0].slug / 'a.jpg', self.source / self.places[1].slug / 'c.jpg')
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_place_images', str(self.source), workers=3, stdout=out, stderr=err)
+        self.assertEqual(PlaceImage.objects.count(), 4)
+        self.assertIn('unknown-place', err.getvalue())
+        image = PlaceImage.objects.filter(place=self.places[0]).order_by('order').first()
+        self.assertEqual(image.renditions['card']['width'], 480)
+        self.assertEqual((image.width, image.height), (800, 600))
+        self.assertTrue(default_storage.exists(image.image.name))
+
+        call_command('import_place_images', str(self.source), stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(PlaceImage.objects.count(), 4)
+
+    def test_manifest_import(self):
+        """Test a CSV manifest sets captions and a single main image"""
+        self.write_image(self.source / 'one.jpg', (10, 20, 30))
+        self.write_image(self.source / 'two.jpg', (30, 20, 10))
+        existing_main = PlaceImage.objects.create(place=self.places[0], image='places/old.jpg', is_main=True)
+        (self.source / 'manifest.csv').write_text(
+            'file,place,caption,is_main\n'
+            f'one.jpg,{self.places[0].slug},المدخل,no\n'
+            f'two.jpg,{self.places[0].slug},البهو,yes\n',
+            encoding='utf-8',
+        )
+        call_command('import_place_images', str(self.source / 'manifest.csv'), stdout=io.StringIO())
+        main = self.places[0].get_main_image()
+        self.assertEqual(main.caption, 'البهو')
+        existing_main.refresh_from_db()
+        self.assertFalse(existing_main.is_main)
+
+    def test_broken_file_is_reported(self):
+        """Test a PNG with a bad checksum is reported without aborting the rest of the import"""
+        slug = self.places[0].slug
+        self.write_image(self.source / slug / 'a.jpg', (10, 20, 30))
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 0, 0)).save(buffer, 'PNG')
+        data = bytearray(buffer.getvalue())
+        data[data.index(b'IDAT') + 6] ^= 0xff
+        (self.source / slug / 'b.png').write_bytes(data)
+        summary = image_import.import_images(image_import.load_entries(self.source), workers=2)
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(len(summary['errors']), 1)
+        self.assertIn('b.png', summary['errors'][0])
+
+    def test_stored_files_removed_when_insert_fails(self):
+        """Test saved originals and renditions are deleted if the rows cannot be inserted"""
+        self.write_image(self.source / self.places[0].slug / 'a.jpg', (10, 20, 30))
+        entries = image_import.load_entries(self.source)
+        with mock.patch.object(PlaceImage.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                image_import.import_images(entries, workers=1)
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
+
+
+class TrendingTest(TestCase):
+    """Test the time-decayed trending score"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=self.category, governorate=governorate,
+                city='Test', short_description='Test', description='<p>Test</p>', view_count=1000 * i
+            )
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='traveler', password='pass12345')
+
+    def scores(self):
+        return dict(TouristPlace.objects.values_list('name', 'trending_score'))
+
+    def test_incremental_refresh_and_decay(self):
+        """Test new activity raises scores and old activity decays"""
+        from . import trending
+        now = timezone.now()
+        trending.refresh(now)
+        # المشاهدات التراكمية القديمة لا تُحتسب كرواج
+        self.assertEqual(set(self.scores().values()), {0})
+
+        SavedPlace.objects.create(user=self.user, place=self.places[0])
+        TouristPlace.objects.filter(pk=self.places[1].pk).update(view_count=F('view_count') + 3)
+        trending.refresh(now + datetime.timedelta(minutes=10))
+        scores = self.scores()
+        self.assertGreater(scores['موقع 0'], scores['موقع 1'])
+        self.assertGreater(scores['موقع 1'], 0)
+        self.assertEqual(scores['موقع 2'], 0)
+
+        # بعد عمر نصف واحد تنخفض الدرجة للنصف تقريباً
+        trending.refresh(now + datetime.timedelta(minutes=10, hours=72))
+        self.assertAlmostEqual(self.scores()['موقع 0'], scores['موقع 0'] / 2, places=3)
+
+    def test_trending_sort(self):
+        """Test listings can sort by trending score"""
+        TouristPlace.objects.filter(pk=self.places[0].pk).update(trending_score=5)
+        response = self.client.get(reverse('tourism:category_detail', args=[self.category.slug]), {'sort': 'trending'})
+        self.assertEqual(response.context['places'][0], self.places[0])
+
+        response = self.client.get(reverse('tourism:all_places'), {'sort': 'trending'})
+        self.assertEqual(response.context['places'][0], self.places[0])
+        self.assertContains(response, '<option value="trending" selected>')
+
+
+class TripPlanExportTest(TestCase):
+    """Test calendar and printable exports"""
+
+    def setUp(self):
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        user = User.objects.create_user(username='traveler', password='pass12345')
+        self.trip_plan = UserTripPlan.objects.create(
+            user=user, title='رحلة الأقصر', start_date=datetime.date(2026, 11, 1)
+        )
+        for i in range(3):
+            place = TouristPlace.objects.create(
+                name=f'معبد رقم {i} ' * 5, name_en=f'Temple {i}', category=category,
+                governorate=governorate, city='Test', short_description='Test',
+                description='<p>Test</p>', suggested_duration=2
+            )
+            TripPlanDay.objects.create(
+                trip_plan=self.trip_plan, place=place, day_number=i + 1,
+                visit_time=datetime.time(9) if i else None
+            )
+        self.client.login(username='traveler', password='pass12345')
+        self.url = reverse('tourism:export_trip_plan', args=[self.trip_plan.pk, 'ics'])
+
+    def test_ics_export(self):
+        """Test the calendar export streams one event per place"""
+        response = self.client.get(self.url)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.count('BEGIN:VEVENT'), 3)
+        self.assertIn('DTSTART;VALUE=DATE:20261101', content)
+        # 09:00 بتوقيت القاهرة (UTC+2 في نوفمبر)
+        self.assertIn('DTSTART:20261102T070000Z', content)
+        self.assertIn('DTEND:20261102T090000Z', content)
+        self.assertNotIn('TZID', content)
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in content.split('\r\n')))
+
+    def test_conditional_requests(self):
+        """Test unchanged plans return 304 and changes produce a new ETag"""
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.trip_plan.days.first().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_print_export(self):
+        """Test the printable export lists each day"""
+        response = self.client.get(reverse('tourism:export_trip_plan', args=[self.trip_plan.pk, 'print']))
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(content.count('<h2>'), 3)
+        self.assertIn('2026/11/03', content)
+        self.assertEqual(self.client.get(
+            reverse('tourism:export_trip_plan', args=[self.trip_plan.pk, 'pdf'])
+        ).status_code, 404)
+
+
+class TourPlannerEngineTest(TestCase):
+    """Test the geography-aware itinerary engine"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        cities = {
+            'Cairo': (30.04, 31.23),
+            'Luxor': (25.70, 32.64),
+            'Aswan': (24.09, 32.90),
+        }
+        for city, (lat, lng) in cities.items():
+            governorate = Governorate.objects.create(name=city, name_en=city)
+            for i in range(3):
+                TouristPlace.objects.create(
+                    name=f'{city} {i}', name_en=f'{city} {i}', category=self.category,
+                    governorate=governorate, city=city, short_description='Test',
+                    description='<p>Test</p>', latitude=lat + i * 0.01,
+                    longitude=lng + i * 0.01, suggested_duration=2, priority=i + 1
+                )
+
+    def test_days_stay_in_one_region(self):
+        """Test each day is built from nearby places"""
+        program = generate_tour_program(3, Category.objects.all())
+        self.assertEqual(len(program['schedule']), 3)
+        for day in program['schedule']:
+            self.assertEqual(len({p.governorate_id for p in day['places']}), 1)
+            self.assertLessEqual(day['total_duration'], 8)
+        self.assertEqual(program['unscheduled_count'], 0)
+
+    def test_budget_reports_unscheduled(self):
+        """Test places beyond the hour budget are reported, not silently dropped"""
+        program = generate_tour_program(1, Category.objects.all())
+        scheduled = sum(len(day['places']) for day in program['schedule'])
+        self.assertEqual(scheduled, 4)
+        self.assertEqual(program['unscheduled_count'], 5)
+
+    def test_route_is_not_longer_than_nearest_neighbour(self):
+        """Test 2-opt never lengthens the nearest-neighbour route"""
+        rng = random.Random(7)
+        points = [
+            SimpleNamespace(latitude=rng.uniform(24, 31), longitude=rng.uniform(29, 33))
+            for _ in range(40)
+        ]
+        route = planner.nearest_neighbour_route(points, planner.haversine_distance)
+        improved = planner.two_opt(route, planner.haversine_distance)
+        self.assertEqual(improved[0], route[0])
+        self.assertLessEqual(
+            planner.route_length(improved, planner.haversine_distance),
+            planner.route_length(route, planner.haversine_distance)
+        )
+
+    def test_hundreds_of_places_scale_linearly(self):
+        """Test scheduling 500 candidates never compares all candidate pairs"""
+        rng = random.Random(1)
+        places = [
+            SimpleNamespace(
+                latitude=rng.uniform(22, 31.5), longitude=rng.uniform(25, 35),
+                suggested_duration=rng.choice([1, 2, 3, 4])
+            )
+            for _ in range(500)
+        ]
+        calls = []
+
+        def distance(a, b):
+            calls.append(1)
+            return planner.haversine_distance(a, b)
+        days, unscheduled = planner.build_schedule(places, 14, distance=distance)
+        # التجميع يعمل على الإحداثيات، والمسافات تُحسب داخل أيام المواقع المختارة فقط
+        self.assertLess(len(calls), len(places))
+        self.assertEqual(len(days), 14)
+        self.assertEqual(sum(map(len, days)) + len(unscheduled), 500)
+
+    def test_program_cache(self):
+        """Test cached programs are rehydrated in one query and reset on catalog changes"""
+        cache.clear()
+        other = Category.objects.create(name='إسلامية', name_en='Islamic', description='Test')
+        first = get_tour_program(3, [self.category, other])
+        with CaptureQueriesContext(connection) as queries:
+            second = get_tour_program(3, [other, self.category])
+        # استعلام المواقع + الصور المجمعة
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [[p.pk for p in day['places']] for day in first['schedule']],
+            [[p.pk for p in day['places']] for day in second['schedule']]
+        )
+
+        place = first['schedule'][0]['places'][0]
+        place.is_active = False
+        place.save()
+        third = get_tour_program(3, [self.category, other])
+        self.assertNotIn(place.pk, [p.pk for day in third['schedule'] for p in day['places']])
+
+
+@override_settings(PLANNER_JOB_MODE='inline', PLANNER_JOB_MIN_DAYS=2)
+class PlannerJobTest(TestCase):
+    """Test background planner jobs"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الأقصر', name_en='Luxor')
+        for i in range(4):
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=self.category,
+                governorate=governorate, city='الأقصر', short_description='Test',
+                description='<p>Test</p>', latitude=25.7 + i * 0.01, longitude=32.6
+            )
+
+    def test_job_lifecycle(self):
+        """Test submit, poll, reopen and save as a trip plan"""
+        response = self.client.post(reverse('tourism:tour_planner'), {
+            'days': 3, 'categories': [self.category.pk]
+        })
+        job = PlannerJob.objects.get()
+        self.assertRedirects(response, reverse('tourism:planner_job', args=[job.pk]))
+        self.assertEqual(job.status, 'done')
+
+        status = self.client.get(reverse('tourism:planner_job_status', args=[job.pk])).json()
+        self.assertTrue(status['finished'])
+        response = self.client.get(status['url'])
+        scheduled = sum(len(day['places']) for day in response.context['generated_program']['schedule'])
+        self.assertEqual(scheduled, 4)
+
+        User.objects.create_user(username='traveler', password='pass12345')
+        self.client.login(username='traveler', password='pass12345')
+        response = self.client.post(reverse('tourism:save_planner_job', args=[job.pk]))
+        trip_plan = UserTripPlan.objects.get()
+        self.assertRedirects(response, reverse('tourism:trip_plan_detail', args=[trip_plan.pk]))
+        self.assertEqual(trip_plan.days.count(), 4)
+
+        # حفظ متكرر يعيد نفس الخطة، ومستخدم آخر لا يستطيع حفظ الطلب
+        response = self.client.post(reverse('tourism:save_planner_job', args=[job.pk]))
+        self.assertRedirects(response, reverse('tourism:trip_plan_detail', args=[trip_plan.pk]))
+        User.objects.create_user(username='other', password='pass12345')
+        self.client.login(username='other', password='pass12345')
+        response = self.client.post(reverse('tourism:save_planner_job', args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(UserTripPlan.objects.count(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.trip_plan, trip_plan)
+
+    def test_expired_job_is_not_overwritten(self):
+        """Test a job that timed out while running stays failed when the thread finishes late"""
+        job = PlannerJob.objects.create(days=3, category_ids=[self.category.pk])
+
+        def late_program(*args):
+            PlannerJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - datetime.timedelta(hours=1))
+            jobs.expire_stale(PlannerJob.objects.get(pk=job.pk))
+            return {'unscheduled_count': 0, 'schedule': []}
+        with mock.patch('tourism.planner.get_tour_program', side_effect=late_program):
+            jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'timeout'))
+
+    def test_short_trips_stay_synchronous(self):
+        """Test trips below the threshold are planned inside the request"""
+        response = self.client.post(reverse('tourism:tour_planner'), {
+            'days': 1, 'categories': [self.category.pk]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context['generated_program'])
+        self.assertFalse(PlannerJob.objects.exists())
+
+
+class TravelMatrixTest(TestCase):
+    """Test the precomputed travel matrix"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(TRAVEL_MATRIX_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        category = Category.objects.create(name='فرعونية', name_en='Pharaonic', description='Test')
+        governorate = Governorate.objects.create(name='الجيزة', name_en='Giza')
+        self.places = [
+            TouristPlace.objects.create(
+                name=f'موقع {i}', name_en=f'Place {i}', category=category,
+                governorate=governorate, city='الجيزة', short_description='Test',
+                description='<p>Test</p>', latitude=lat, longitude=lng
+            )
+            for i, (lat, lng) in enumerate([(29.9792, 31.1342), (30.0478, 31.2336), (25.7188, 32.6573)])
+        ]
+        self.assertFalse(travel_matrix.exists())
+        self.assertEqual(travel_matrix.build(), 3)
+
+    def distance(self, a, b):
+        return geo.haversine_km(float(a.latitude), float(a.longitude), float(b.latitude), float(b.longitude))
+
+    def test_matrix_matches_haversine(self):
+        """Test stored distances match the great-circle distance"""
+        matrix = travel_matrix.submatrix(self.places)
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertAlmostEqual(float(matrix[0, 2]), self.distance(self.places[0], self.places[2]), delta=0.01)
+        self.assertEqual(float(matrix[1, 1]), 0)
+
+    def test_incremental_updates(self):
+        """Test coordinate, insert and deactivate changes update the matrix"""
+        moved = self.places[1]
+        moved.latitude, moved.longitude = 24.0889, 32.8998
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+        self.assertAlmostEqual(
+            float(travel_matrix.submatrix(self.places)[0, 1]),
+            self.distance(self.places[0], moved), delta=0.01
+        )
+
+        added = self.add_place(24.0, 32.9)
+        matrix = travel_matrix.submatrix(self.places + [added])
+        self.assertAlmostEqual(float(matrix[3, 2]), self.distance(added, self.places[2]), delta=0.01)
+
+        added.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            added.save()
+        self.assertIsNone(travel_matrix.submatrix([added]))
+
+    def test_update_waits_for_commit(self):
+        """Test the matrix is only updated once the saving transaction commits"""
+        moved = self.places[1]
+        before = float(travel_matrix.submatrix(self.places)[0, 1])
+        moved.latitude, moved.longitude = 24.0889, 32.8998
+        with self.captureOnCommitCallbacks() as callbacks:
+            moved.save()
+        self.assertEqual(float(travel_matrix.submatrix(self.places)[0, 1]), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(float(travel_matrix.submatrix(self.places)[0, 1]), before)
+        self.assertTrue((Path(self.directory) / '.lock').exists())
+
+    def test_planner_reads_matrix(self):
+        """Test the planner uses the matrix when it covers all places"""
+        distance = travel_matrix.distance_function(self.places)
+        self.assertIsNotNone(distance)
+        self.assertAlmostEqual(
+            distance(self.places[0], self.places[1]),
+            self.distance(self.places[0], self.places[1]), delta=0.01
+        )
+        program = generate_tour_program(2, Category.objects.all())
+        self.assertGreater(sum(day['travel_km'] for day in program['schedule']), 0)
+
+    def test_new_places_use_spare_capacity(self):
+        """Test inserts are written in place until the spare rows run out"""
+        distances_file = Path(self.directory) / 'distances.npy'
+        built = distances_file.stat().st_ino
+        self.add_place(24.0, 32.9)
+        self.assertEqual(distances_file.stat().st_ino, built)
+
+        with mock.patch('tourism.travel_matrix.capacity', lambda size: size):
+            matrix = TravelMatrix(self.directory)
+            matrix.build()
+            self.assertEqual(matrix.load() and matrix.distances.shape, (4, 4))
+            added = self.add_place(24.1, 32.8)
+            matrix.update_place(added)
+            matrix.load()
+            self.assertEqual(matrix.distances.shape, (5, 5))
+            self.assertAlmostEqual(
+                float(matrix.submatrix([self.places[0], added])[0, 1]),
+                self.distance(self.places[0], added), delta=0.01
+            )
+
+    def add_place(self, lat, lng):
+        place = self.places[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            return TouristPlace.objects.create(
+                name=f'جديد {lat}', name_en=f'New {lat}', category=place.category, governorate=place.governorate,
+                city='أسوان', short_description='Test', description='<p>Test</p>', latitude=lat, longitude=lng
+            )
@@ -0,0 +1,259 @@
+"""
+Precomputed travel matrix for active tourist places
+Pairwise great-circle distances are stored as float32 .npy files under
+TRAVEL_MATRIX_DIR and memory-mapped by every worker. Coordinate or status
+changes update one row and column instead of rebuilding the whole matrix;
+the distances file keeps spare rows so new places are written in place and
+the matrix is only copied when that capacity runs out. Writers hold an
+exclusive lock on a file in TRAVEL_MATRIX_DIR, so workers of different
+processes never modify the files at the same time.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: قفل داخل العملية فقط
+    fcntl = None
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_KM
+
+IDS_FILE = 'ids.npy'
+COORDS_FILE = 'coords.npy'
+DISTANCES_FILE = 'distances.npy'
+LOCK_FILE = '.lock'
+
+# معرّف الصفوف المحذوفة (تُزال عند إعادة البناء الكاملة)
+TOMBSTONE = -1
+
+# صفوف وأعمدة احتياطية في ملف المسافات حتى لا تُنسخ المصفوفة كلها عند إضافة كل موقع
+MIN_SPARE_ROWS = 16
+
+
+def capacity(size):
+    """سعة ملف المسافات لعدد مواقع معين (ربع العدد احتياطياً)"""
+    return size + max(MIN_SPARE_ROWS, size // 4)
+
+
+def haversine_row(lat, lng, coords):
+    """المسافات (كم) من نقطة إلى مصفوفة نقاط Nx2 دفعة واحدة"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def haversine_matrix(coords):
+    """مصفوفة المسافات الكاملة NxN"""
+    lat = np.radians(coords[:, 0])[:, None]
+    lng = np.radians(coords[:, 1])[:, None]
+    a = (
+        np.sin((lat.T - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lat.T) * np.sin((lng.T - lng) / 2) ** 2
+    )
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))).astype(np.float32)
+
+
+def travel_hours(distances):
+    """تقدير زمن السفر بالساعات من المسافة المباشرة"""
+    road_factor = getattr(settings, 'TRAVEL_ROAD_FACTOR', 1.3)
+    speed = getattr(settings, 'TRAVEL_AVERAGE_SPEED_KMH', 60)
+    return distances * (road_factor / speed)
+
+
+def _place_coords(place):
+    if not place.is_active or place.latitude is None or place.longitude is None:
+        return None
+    return float(place.latitude), float(place.longitude)
+
+
+class TravelMatrix:
+    """مصفوفة المسافات المخزنة على القرص"""
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
+        self.ids = self.coords = self.distances = None
+        self._index = {}
+
+    @property
+    def directory(self):
+        if self._directory:
+            return Path(self._directory)
+        return Path(getattr(settings, 'TRAVEL_MATRIX_DIR', Path(settings.BASE_DIR) / 'travel_matrix'))
+
+    def _path(self, name):
+        return self.directory / name
+
+    def exists(self):
+        return self._path(IDS_FILE).exists()
+
+    def _mtime(self):
+        try:
+            return os.stat(self._path(IDS_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """تحميل المصفوفة (memory-map) وإعادة التحميل إذا تغيرت على القرص"""
+        mtime = self._mtime()
+        if mtime is None:
+            self.ids = None
+            self._index = {}
+            return False
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                self.ids = np.load(self._path(IDS_FILE))
+                self.coords = np.load(self._path(COORDS_FILE))
+                self.distances = np.load(self._path(DISTANCES_FILE), mmap_mode='r')
+                self._index = {
+                    int(place_id): i for i, place_id in enumerate(self.ids) if place_id != TOMBSTONE
+                }
+                self._loaded_mtime = mtime
+        return True
+
+    @contextmanager
+    def _exclusive(self):
+        """قفل الكتابة بين الخيوط والعمليات (كل عمّال الخادم)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self._path(LOCK_FILE), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, ids, coords=None, distances=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # الكتابة في ملفات مؤقتة ثم الاستبدال حتى لا يقرأ عامل آخر ملفاً ناقصاً
+        # ملف المعرّفات يُكتب أخيراً لأن تاريخ تعديله هو إشارة إعادة التحميل
+        for name, array in ((DISTANCES_FILE, distances), (COORDS_FILE, coords), (IDS_FILE, ids)):
+            if array is None:
+                continue
+            tmp = self._path(f'{name}.tmp')
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, self._path(name))
+        self._loaded_mtime = None
+
+    def build(self, queryset=None):
+        """بناء المصفوفة بالكامل لكل المواقع النشطة ذات الإحداثيات"""
+        if queryset is None:
+            from .models import TouristPlace
+            queryset = TouristPlace.objects.filter(
+                is_active=True, latitude__isnull=False, longitude__isnull=False
+            )
+        rows = list(queryset.order_by('pk').values_list('pk', 'latitude', 'longitude'))
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        coords = np.array([(float(lat), float(lng)) for _, lat, lng in rows], dtype=np.float64).reshape(-1, 2)
+        size = len(ids)
+        distances = np.zeros((capacity(size), capacity(size)), dtype=np.float32)
+        distances[:size, :size] = haversine_matrix(coords)
+        with self._exclusive():
+            self._save(ids, coords, distances)
+        return size
+
+    def update_place(self, place):
+        """
+        تحديث صف وعمود موقع واحد عند تغير إحداثياته أو حالته
+        القراءة والتعديل والكتابة تحت القفل حتى لا يأخذ موقعان جديدان نفس الصف
+        """
+        if not self.exists():
+            return
+        with self._exclusive():
+            if not self.load():
+                return
+            coords = _place_coords(place)
+            index = self._index.get(place.pk)
+            if coords is None:
+                if index is not None:
+                    self._remove_index(index)
+                return
+            if index is not None and tuple(self.coords[index]) == coords:
+                return
+
+            ids = np.array(self.ids)
+            all_coords = np.array(self.coords)
+            if index is None:
+                index = len(ids)
+                ids = np.append(ids, place.pk)
+                all_coords = np.vstack([all_coords, coords])
+            else:
+                all_coords[index] = coords
+            size = len(ids)
+            row = self._row(coords, ids, all_coords)
+
+            if size > self.distances.shape[0]:
+                # السعة الاحتياطية نفدت: نسخ المصفوفة إلى ملف أكبر (بدون إعادة الحساب)
+                distances = np.zeros((capacity(size), capacity(size)), dtype=np.float32)
+                distances[:size - 1, :size - 1] = self.distances[:size - 1, :size - 1]
+                distances[index, :size] = distances[:size, index] = row
+                self._save(ids, all_coords, distances)
+                return
+            # تعديل صف وعمود الموقع مباشرة في الملف؛ الصف الجديد لا يُقرأ قبل حفظ ملف المعرّفات
+            distances = np.load(self._path(DISTANCES_FILE), mmap_mode='r+')
+            distances[index, :size] = row
+            distances[:size, index] = row
+            distances.flush()
+            del distances
+            self._save(ids, all_coords)
+
+    @staticmethod
+    def _row(coords, ids, all_coords):
+        row = haversine_row(coords[0], coords[1], all_coords).astype(np.float32)
+        row[ids == TOMBSTONE] = 0
+        return row
+
+    def remove_place(self, place_id):
+        """إزالة موقع من المصفوفة"""
+        if not self.exists():
+            return
+        with self._exclusive():
+            if self.load() and place_id in self._index:
+                self._remove_index(self._index[place_id])
+
+    def _remove_index(self, index):
+        """(يُستدعى تحت القفل)"""
+        ids = np.array(self.ids)
+        ids[index] = TOMBSTONE
+        self._save(ids)
+
+    def submatrix(self, places):
+        """
+        مصفوفة المسافات للمواقع المعطاة فقط (بنفس ترتيبها)
+        يعيد None إذا لم تكن المصفوفة مبنية أو ينقصها أحد المواقع
+        """
+        if not self.load():
+            return None
+        try:
+            indexes = [self._index[place.pk] for place in places]
+        except KeyError:
+            return None
+        return np.asarray(self.distances[np.ix_(indexes, indexes)])
+
+    def distance_function(self, places):
+        """
+        دالة مسافة للمخطط تقرأ من المصفوفة بدلاً من حساب المسافات
+        يعيد None إذا لم تكن المصفوفة متاحة لكل المواقع
+        """
+        located = [p for p in places if p.latitude is not None and p.longitude is not None]
+        matrix = self.submatrix(located)
+        if matrix is None:
+            return None
+        position = {id(place): i for i, place in enumerate(located)}
+
+        def distance(a, b):
+            return float(matrix[position[id(a)], position[id(b)]])
+        return distance
+
+
+travel_matrix = TravelMatrix()
@@ -0,0 +1,106 @@
+"""
+Time-decayed trending score for tourist places
+Each refresh decays every score by exp(-λ·Δt) and adds the views, saves and
+trip-plan additions recorded since the previous refresh, so the work per run
+is proportional to recent activity rather than to the whole history.
+"""
+
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import SavedPlace, TouristPlace, TrendingRefresh, TripPlanDay
+
+# الدرجات الأصغر من هذا تُصفَّر حتى لا تبقى كل المواقع في تحديث التلاشي
+MIN_SCORE = 1e-3
+
+# عدد المواقع في كل جملة UPDATE
+BATCH_SIZE = 300
+
+
+def half_life_hours():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72)
+
+
+def weights():
+    return {'view': 1.0, 'save': 5.0, 'trip': 8.0, **getattr(settings, 'TRENDING_WEIGHTS', {})}
+
+
+def decay_factor(seconds):
+    """نسبة ما يبقى من الدرجة بعد مدة معينة"""
+    return math.exp(-math.log(2) * seconds / (half_life_hours() * 3600))
+
+
+def _timed_events(queryset, since, now, weight):
+    """أحداث بتاريخ (حفظ/إضافة لخطة) مجمعة حسب المكان وموزونة بعمرها"""
+    scores = defaultdict(float)
+    rows = queryset.filter(created_at__gt=since, created_at__lte=now).values_list('place_id', 'created_at')
+    for place_id, created_at in rows.iterator(chunk_size=2000):
+        scores[place_id] += weight * decay_factor((now - created_at).total_seconds())
+    return scores
+
+
+def refresh(now=None):
+    """
+    تحديث مؤشر الرواج تدريجياً منذ آخر تحديث
+    في أول تشغيل تُحتسب الإضافات خلال TRENDING_INITIAL_DAYS فقط،
+    وتُعتبر المشاهدات السابقة (التراكمية) نقطة البداية
+    يعيد عدد المواقع التي أُضيفت لها أحداث جديدة
+    """
+    now = now or timezone.now()
+    last = TrendingRefresh.objects.first()
+    if last is None:
+        since = now - datetime.timedelta(days=getattr(settings, 'TRENDING_INITIAL_DAYS', 14))
+        TouristPlace.objects.update(trending_score=0, trending_views_seen=F('view_count'))
+    else:
+        since = last.refreshed_at
+    elapsed = max(0.0, (now - since).total_seconds())
+    w = weights()
+
+    # المشاهدات الجديدة منذ آخر تحديث (نفترض أنها في منتصف الفترة)
+    views = list(TouristPlace.objects.filter(
+        view_count__gt=F('trending_views_seen')
+    ).values_list('pk', 'view_count', 'trending_views_seen'))
+    increments = defaultdict(float)
+    seen = {}
+    view_weight = w['view'] * decay_factor(elapsed / 2)
+    for place_id, view_count, views_seen in views:
+        increments[place_id] += (view_count - views_seen) * view_weight
+        seen[place_id] = view_count
+
+    for source, kind in ((SavedPlace.objects.all(), 'save'), (TripPlanDay.objects.all(), 'trip')):
+        for place_id, score in _timed_events(source, since, now, w[kind]).items():
+            increments[place_id] += score
+
+    decay = decay_factor(elapsed)
+    with transaction.atomic():
+        if last is not None and decay < MIN_SCORE:
+            TouristPlace.objects.filter(trending_score__gt=0).update(trending_score=0)
+        elif last is not None:
+            TouristPlace.objects.filter(trending_score__gt=0).update(trending_score=Case(
+                When(trending_score__lt=MIN_SCORE / decay, then=Value(0.0)),
+                default=F('trending_score') * decay,
+                output_field=FloatField(),
+            ))
+        place_ids = list(increments)
+        for start in range(0, len(place_ids), BATCH_SIZE):
+            batch = place_ids[start:start + BATCH_SIZE]
+            TouristPlace.objects.filter(pk__in=batch).update(
+                trending_score=F('trending_score') + Case(
+                    *[When(pk=pk, then=Value(increments[pk])) for pk in batch],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+                trending_views_seen=Case(
+                    *[When(pk=pk, then=Value(seen[pk])) for pk in batch if pk in seen],
+                    default=F('trending_views_seen'),
+                    output_field=IntegerField(),
+                ),
+            )
+        TrendingRefresh.objects.create(refreshed_at=now, places_updated=len(increments))
+    return len(increments)
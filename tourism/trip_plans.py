@@ -0,0 +1,319 @@
+"""
+Batch operations on user trip plans
+A list of (place_id, day_number, visit_time) operations is validated as a
+whole and applied with bulk_create/bulk_update in one transaction.
+"""
+
+import datetime
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from . import planner, recommendations
+from .models import TouristPlace, TripPlanDay, UserTripPlan
+from .travel_matrix import travel_hours, travel_matrix
+
+
+class OperationsError(ValueError):
+    """عمليات غير صالحة: errors قائمة من {index, message}"""
+
+    def __init__(self, errors):
+        super().__init__('invalid operations')
+        self.errors = errors
+
+
+def max_operations():
+    return getattr(settings, 'TRIP_PLAN_BATCH_MAX_OPERATIONS', 200)
+
+
+def max_day_number():
+    return getattr(settings, 'TRIP_PLAN_MAX_DAYS', 30)
+
+
+def day_start_minutes():
+    return getattr(settings, 'PLANNER_DAY_START_HOUR', 9) * 60
+
+
+def ordered_entries():
+    """عناصر خطط الرحلات مرتبة حسب اليوم ثم وقت الزيارة ثم ترتيب التحسين"""
+    return TripPlanDay.objects.select_related('place__governorate').order_by(
+        'day_number', F('visit_time').asc(nulls_last=True), F('sequence').asc(nulls_last=True), 'id'
+    )
+
+
+def plan_summary(plan_id):
+    """حساب ملخص الخطة: عدد الأماكن والأيام والساعات والمحافظات"""
+    entries = TripPlanDay.objects.filter(trip_plan_id=plan_id)
+    summary = entries.aggregate(
+        place_count=Count('id'),
+        day_count=Count('day_number', distinct=True),
+        total_hours=Sum('place__suggested_duration'),
+    )
+    summary['total_hours'] = summary['total_hours'] or 0
+    summary['governorates_summary'] = [
+        {'name': name, 'name_en': name_en}
+        for name, name_en in entries.values_list(
+            'place__governorate__name', 'place__governorate__name_en'
+        ).distinct().order_by('place__governorate__name')
+    ]
+    return summary
+
+
+def update_plan_summary(plan_id):
+    """
+    تحديث ملخص الخطة وتاريخ تعديلها عند تغير عناصرها
+    (تعتمد عليه القوائم والتصديرات المخزنة)
+    """
+    UserTripPlan.objects.filter(pk=plan_id).update(updated_at=timezone.now(), **plan_summary(plan_id))
+
+
+SUMMARY_BATCH_SIZE = 500
+
+
+def refresh_plan_summaries(entries):
+    """
+    إعادة حساب ملخصات كل الخطط التي تحتوي على عناصر معينة (بعد تعديل موقع أو محافظة)
+    دون تغيير تاريخ تعديل الخطة؛ يعيد عدد الخطط المحدّثة
+    """
+    plan_ids = sorted(set(entries.values_list('trip_plan_id', flat=True)))
+    for start in range(0, len(plan_ids), SUMMARY_BATCH_SIZE):
+        batch = plan_ids[start:start + SUMMARY_BATCH_SIZE]
+        plan_entries = TripPlanDay.objects.filter(trip_plan_id__in=batch)
+        plans = {
+            row['trip_plan_id']: UserTripPlan(
+                pk=row['trip_plan_id'],
+                place_count=row['place_count'],
+                day_count=row['day_count'],
+                total_hours=row['total_hours'] or 0,
+                governorates_summary=[],
+            )
+            for row in plan_entries.values('trip_plan_id').annotate(
+                place_count=Count('id'),
+                day_count=Count('day_number', distinct=True),
+                total_hours=Sum('place__suggested_duration'),
+            ).order_by()
+        }
+        for plan_id, name, name_en in plan_entries.values_list(
+            'trip_plan_id', 'place__governorate__name', 'place__governorate__name_en'
+        ).distinct().order_by('trip_plan_id', 'place__governorate__name'):
+            plans[plan_id].governorates_summary.append({'name': name, 'name_en': name_en})
+        UserTripPlan.objects.bulk_update(
+            list(plans.values()), ['place_count', 'day_count', 'total_hours', 'governorates_summary']
+        )
+    return len(plan_ids)
+
+
+def parse_operations(data):
+    """
+    التحقق من شكل العمليات وتحويلها:
+    [{'id': int|None, 'place_id': int, 'day_number': int, 'visit_time': time|None}]
+    """
+    if not isinstance(data, list) or not data:
+        raise OperationsError([{'index': None, 'message': 'قائمة العمليات فارغة أو غير صالحة'}])
+    if len(data) > max_operations():
+        raise OperationsError([{'index': None, 'message': f'الحد الأقصى {max_operations()} عملية'}])
+
+    operations, errors = [], []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'message': 'عملية غير صالحة'})
+            continue
+        try:
+            entry_id = int(item['id']) if item.get('id') is not None else None
+            place_id = int(item['place_id'])
+            day_number = int(item['day_number'])
+        except (KeyError, TypeError, ValueError):
+            errors.append({'index': index, 'message': 'place_id و day_number مطلوبان كأرقام'})
+            continue
+        if not 1 <= day_number <= max_day_number():
+            errors.append({'index': index, 'message': 'رقم اليوم خارج النطاق'})
+            continue
+        visit_time = None
+        if item.get('visit_time'):
+            try:
+                visit_time = parse_time(str(item['visit_time']))
+            except ValueError:
+                visit_time = None
+            if visit_time is None:
+                errors.append({'index': index, 'message': 'وقت الزيارة غير صالح'})
+                continue
+        operations.append({
+            'index': index,
+            'id': entry_id,
+            'place_id': place_id,
+            'day_number': day_number,
+            'visit_time': visit_time,
+        })
+    if errors:
+        raise OperationsError(errors)
+    return operations
+
+
+def serialize_entry(entry):
+    return {
+        'id': entry.pk,
+        'place_id': entry.place_id,
+        'day_number': entry.day_number,
+        'visit_time': entry.visit_time.strftime('%H:%M') if entry.visit_time else None,
+    }
+
+
+def apply_operations(trip_plan, operations):
+    """
+    تطبيق العمليات على الخطة دفعة واحدة
+    عملية بمعرّف (id) تنقل عنصراً موجوداً، وبدونه تضيف المكان لليوم
+    (أو تحدّث وقت الزيارة إن كان موجوداً بالفعل في نفس اليوم)
+    يعيد {'created': [...], 'updated': [...], 'unchanged': n}
+    """
+    place_ids = {op['place_id'] for op in operations}
+    active_ids = set(TouristPlace.objects.filter(
+        pk__in=place_ids, is_active=True
+    ).values_list('pk', flat=True))
+
+    with transaction.atomic():
+        entries = {entry.pk: entry for entry in TripPlanDay.objects.select_for_update().filter(trip_plan=trip_plan)}
+        by_slot = {(entry.place_id, entry.day_number): entry for entry in entries.values()}
+
+        # المرور الأول: تحديد العنصر الذي تخصه كل عملية (حسب حالة الخطة قبل الدفعة)
+        errors = []
+        moves, creates = {}, {}
+        for op in operations:
+            if op['place_id'] not in active_ids:
+                errors.append({'index': op['index'], 'message': 'المكان غير موجود'})
+                continue
+            slot = (op['place_id'], op['day_number'])
+
+            if op['id'] is not None:
+                entry = entries.get(op['id'])
+                if entry is None or entry.place_id != op['place_id']:
+                    errors.append({'index': op['index'], 'message': 'العنصر غير موجود في الخطة'})
+                    continue
+            else:
+                entry = by_slot.get(slot)
+
+            if entry is None:
+                if slot in creates:
+                    errors.append({'index': op['index'], 'message': 'عملية مكررة'})
+                    continue
+                creates[slot] = op
+            elif entry.pk in moves:
+                errors.append({'index': op['index'], 'message': 'عملية مكررة'})
+            else:
+                moves[entry.pk] = op
+
+        # المرور الثاني: التعارض يُفحص على الخانات النهائية للدفعة كلها، فلا يعتمد على ترتيب العمليات
+        # (نقل عنصر إلى يوم يُخليه عنصر آخر في نفس الدفعة مسموح)
+        final_slots = {}
+        for entry in entries.values():
+            op = moves.get(entry.pk)
+            day_number = op['day_number'] if op else entry.day_number
+            final_slots.setdefault((entry.place_id, day_number), []).append(op)
+        for slot, op in creates.items():
+            final_slots.setdefault(slot, []).append(op)
+        for occupants in final_slots.values():
+            if len(occupants) > 1:
+                errors.extend(
+                    {'index': op['index'], 'message': 'المكان موجود بالفعل في هذا اليوم'}
+                    for op in occupants if op is not None
+                )
+
+        if errors:
+            raise OperationsError(sorted(errors, key=lambda error: error['index']))
+
+        to_create = {
+            slot: TripPlanDay(
+                trip_plan=trip_plan,
+                place_id=op['place_id'],
+                day_number=op['day_number'],
+                visit_time=op['visit_time'],
+            )
+            for slot, op in creates.items()
+        }
+        to_update = {}
+        unchanged = 0
+        for entry_id, op in moves.items():
+            entry = entries[entry_id]
+            if entry.day_number == op['day_number'] and (op['visit_time'] is None or entry.visit_time == op['visit_time']):
+                unchanged += 1
+                continue
+            entry.day_number = op['day_number']
+            if op['visit_time'] is not None:
+                entry.visit_time = op['visit_time']
+            to_update[entry.pk] = entry
+
+        # النقل أولاً حتى تتحرر الأماكن التي تشغلها الإضافات الجديدة
+        if len(to_update) > 1:
+            # النقلات المتسلسلة (يوم 1 ← 2 و 2 ← 3) على مرحلتين: خانة مؤقتة فريدة (-id) ثم اليوم المطلوب
+            TripPlanDay.objects.filter(pk__in=to_update).update(day_number=-F('id'))
+        if to_update:
+            TripPlanDay.objects.bulk_update(list(to_update.values()), ['day_number', 'visit_time'])
+        created = TripPlanDay.objects.bulk_create(list(to_create.values()))
+        if created or to_update:
+            update_plan_summary(trip_plan.pk)
+        if created:
+            # بعد انتهاء المعاملة حتى لا تطول مدة قفل عناصر الخطة
+            existing = {entry.place_id for entry in entries.values()}
+            added = [entry.place_id for entry in created]
+            recommendations.schedule(recommendations.record_basket, existing, added)
+
+    return {
+        'created': [serialize_entry(entry) for entry in created],
+        'updated': [serialize_entry(entry) for entry in to_update.values()],
+        'unchanged': unchanged,
+    }
+
+
+def _to_time(minutes):
+    """دقائق من بداية اليوم إلى وقت، مقرّبة لأقرب 5 دقائق وبحد أقصى 23:55"""
+    minutes = min(int(math.ceil(minutes / 5) * 5), 23 * 60 + 55)
+    return datetime.time(minutes // 60, minutes % 60)
+
+
+def optimize_days(trip_plan):
+    """
+    إعادة ترتيب أماكن كل يوم حسب مسافة التنقل واقتراح أوقات الزيارة
+    من المدة المقترحة لكل مكان وزمن الطريق، ثم الحفظ بتحديث مجمع واحد
+    يعيد عدد العناصر المحدّثة
+    """
+    entries = list(ordered_entries().filter(trip_plan=trip_plan))
+    places = [entry.place for entry in entries]
+    distance = travel_matrix.distance_function(places) or planner.haversine_distance
+
+    days = {}
+    for entry in entries:
+        days.setdefault(entry.day_number, []).append(entry)
+
+    def entry_distance(a, b):
+        return distance(a.place, b.place)
+
+    changed = []
+    previous = None
+    for day_number in sorted(days):
+        located = [e for e in days[day_number] if planner.has_coordinates(e.place)]
+        unlocated = [e for e in days[day_number] if not planner.has_coordinates(e.place)]
+
+        # يبدأ اليوم من أقرب مكان لنهاية اليوم السابق
+        route = []
+        if located:
+            start = min(located, key=lambda e: entry_distance(previous, e)) if previous else located[0]
+            route = planner.two_opt(planner.nearest_neighbour_route(located, entry_distance, start), entry_distance)
+            previous = route[-1]
+
+        minutes = day_start_minutes()
+        for i, entry in enumerate(route + unlocated):
+            if 0 < i < len(route):
+                minutes += float(travel_hours(entry_distance(route[i - 1], entry))) * 60
+            visit_time = _to_time(minutes)
+            if (entry.visit_time, entry.sequence) != (visit_time, i):
+                entry.visit_time, entry.sequence = visit_time, i
+                changed.append(entry)
+            minutes = visit_time.hour * 60 + visit_time.minute + entry.place.suggested_duration * 60
+
+    if changed:
+        TripPlanDay.objects.bulk_update(changed, ['visit_time', 'sequence'], batch_size=500)
+        update_plan_summary(trip_plan.pk)
+    return len(changed)
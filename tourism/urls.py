@@ -16,6 +16,9 @@ urlpatterns = [
     # المواقع السياحية
     path('places/', views.all_places, name='all_places'),
     path('place/<slug:slug>/', views.place_detail, name='place_detail'),
+    path('api/places/nearby/', views.nearby_places_api, name='nearby_places_api'),
+    path('api/places/map/', views.map_places_api, name='map_places_api'),
+    path('api/places/suggest/', views.place_suggestions_api, name='place_suggestions_api'),
     
     # المحافظات
     path('governorates/', views.governorates_list, name='governorates_list'),
@@ -23,6 +26,9 @@ urlpatterns = [
     
     # مخطط الرحلة
     path('tour-planner/', views.tour_planner, name='tour_planner'),
+    path('tour-planner/jobs/<uuid:job_id>/', views.planner_job, name='planner_job'),
+    path('tour-planner/jobs/<uuid:job_id>/status/', views.planner_job_status, name='planner_job_status'),
+    path('tour-planner/jobs/<uuid:job_id>/save/', views.save_planner_job, name='save_planner_job'),
     
     # صفحات عامة
     path('about/', views.about, name='about'),
@@ -43,6 +49,9 @@ urlpatterns = [
     path('trip-plans/create/', views.create_trip_plan, name='create_trip_plan'),
     path('trip-plans/<int:plan_id>/', views.trip_plan_detail, name='trip_plan_detail'),
     path('trip-plans/<int:plan_id>/add-place/', views.add_place_to_plan, name='add_place_to_plan'),
+    path('trip-plans/<int:plan_id>/batch/', views.batch_update_plan, name='batch_update_plan'),
+    path('trip-plans/<int:plan_id>/optimize/', views.optimize_trip_plan, name='optimize_trip_plan'),
+    path('trip-plans/<int:plan_id>/export/<str:fmt>/', views.export_trip_plan, name='export_trip_plan'),
     path('trip-plans/<int:plan_id>/remove-place/<int:day_id>/', views.remove_place_from_plan, name='remove_place_from_plan'),
     path('trip-plans/<int:plan_id>/delete/', views.delete_trip_plan, name='delete_trip_plan'),
 ]
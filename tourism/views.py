@@ -1,15 +1,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Case, When, Value, IntegerField, F, Window, Prefetch
+from django.db.models.functions import RowNumber
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from .models import (Category, TouristPlace, Governorate, ContactMessage,
-                     UserProfile, SavedPlace, UserTripPlan, TripPlanDay)
+                     UserProfile, SavedPlace, UserTripPlan, TripPlanDay, PlannerJob)
 from .forms import (ContactForm, TourPlannerForm, UserRegistrationForm,
                    UserLoginForm, UserProfileForm, TripPlanForm)
+from . import exports, geo, jobs, planner, recommendations, search, trip_plans
+from .pagination import paginate
+from .saved_places import toggle_saved_place
+from .caching import catalog_key, catalog_version
+import json
+import math
 import random
 
 
@@ -22,23 +34,28 @@ def set_language(request, lang_code):
 
 def home(request):
     """الصفحة الرئيسية"""
-    categories = Category.objects.filter(is_active=True)
+    # الاستعلامات كلها كسولة: لا تُنفَّذ إلا إذا لم تكن أجزاء القالب مخزنة
+    categories = Category.objects.filter(is_active=True).annotate(
+        places_count=Count('places', filter=Q(places__is_active=True))
+    )
     featured_places = TouristPlace.objects.filter(
         is_active=True,
         is_featured=True
-    ).select_related('category', 'governorate')[:6]
+    ).select_related('category', 'governorate').prefetch_related('images')[:6]
     
-    # إحصائيات
+    # إحصائيات (دوال يستدعيها القالب عند الحاجة فقط)
     stats = {
-        'total_places': TouristPlace.objects.filter(is_active=True).count(),
-        'total_governorates': Governorate.objects.filter(is_active=True).count(),
-        'total_categories': Category.objects.filter(is_active=True).count(),
+        'total_places': TouristPlace.objects.filter(is_active=True).count,
+        'total_governorates': Governorate.objects.filter(is_active=True).count,
+        'total_categories': Category.objects.filter(is_active=True).count,
     }
     
     context = {
         'categories': categories,
         'featured_places': featured_places,
         'stats': stats,
+        'catalog_version': catalog_version(),
+        'catalog_cache_timeout': getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600),
     }
     return render(request, 'tourism/home.html', context)
 
@@ -53,21 +70,21 @@ def category_detail(request, slug):
         is_active=True
     ).select_related('governorate').prefetch_related('images')
     
-    # الترتيب
+    # الترتيب (مع id لضمان ترتيب ثابت في تقسيم الصفحات)
     sort_by = request.GET.get('sort', 'priority')
     if sort_by == 'name':
-        places_list = places_list.order_by('name')
+        ordering = ['name', 'id']
     elif sort_by == 'governorate':
-        places_list = places_list.order_by('governorate__name')
+        ordering = ['governorate__name', 'id']
     elif sort_by == 'popular':
-        places_list = places_list.order_by('-view_count')
+        ordering = ['-view_count', 'id']
+    elif sort_by == 'trending':
+        ordering = ['-trending_score', 'id']
     else:
-        places_list = places_list.order_by('priority')
+        ordering = ['priority', 'id']
     
     # Pagination
-    paginator = Paginator(places_list, 12)
-    page_number = request.GET.get('page')
-    places = paginator.get_page(page_number)
+    places = paginate(request, places_list, ordering)
     
     # المحافظات المتاحة في هذا القسم
     governorates = Governorate.objects.filter(
@@ -88,7 +105,7 @@ def category_detail(request, slug):
 def place_detail(request, slug):
     """صفحة موقع سياحي معين"""
     place = get_object_or_404(
-        TouristPlace.objects.select_related('category', 'governorate')
+        TouristPlace.objects.select_related('category', 'governorate', 'similarity')
                            .prefetch_related('images'),
         slug=slug,
         is_active=True
@@ -97,11 +114,18 @@ def place_detail(request, slug):
     # زيادة عدد المشاهدات
     place.increment_views()
     
-    # مواقع مشابهة
-    related_places = TouristPlace.objects.filter(
-        category=place.category,
-        is_active=True
-    ).exclude(id=place.id).select_related('governorate')[:4]
+    # مواقع مرتبطة (محسوبة مسبقاً من المحفوظات وخطط الرحلات)
+    related_places = recommendations.related_places(place)
+    
+    # مواقع قريبة
+    nearby_places = []
+    if place.latitude is not None and place.longitude is not None:
+        nearby_places = geo.nearest(
+            place.latitude, place.longitude, 4,
+            queryset=TouristPlace.objects.filter(is_active=True).select_related('governorate'),
+            exclude=place.pk,
+            max_radius_km=getattr(settings, 'NEARBY_MAX_RADIUS_KM', 100)
+        )
     
     # نموذج التواصل
     if request.method == 'POST':
@@ -118,6 +142,7 @@ def place_detail(request, slug):
     context = {
         'place': place,
         'related_places': related_places,
+        'nearby_places': nearby_places,
         'form': form,
     }
     return render(request, 'tourism/place_detail.html', context)
@@ -140,26 +165,41 @@ def all_places(request):
     if governorate_slug:
         places_list = places_list.filter(governorate__slug=governorate_slug)
     
+    # البحث عبر الفهرس النصي مع ترتيب النتائج حسب الصلة
+    search_snippets = {}
+    ranked_ids = []
     if search_query:
-        places_list = places_list.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(city__icontains=search_query)
-        )
+        if search.is_supported():
+            # الفلاتر تُطبَّق داخل استعلام الفهرس حتى لا يستبعدها الحد الأقصى للنتائج
+            hits = search.search(search_query, queryset=places_list)
+            search_snippets = dict(hits)
+            ranked_ids = [place_id for place_id, _ in hits]
+            places_list = places_list.filter(pk__in=ranked_ids)
+        else:
+            places_list = search.filter_normalized(places_list, search_query)
     
-    # الترتيب
-    sort_by = request.GET.get('sort', 'priority')
+    # الترتيب (مع id لضمان ترتيب ثابت في تقسيم الصفحات)
+    sort_by = request.GET.get('sort', 'relevance' if ranked_ids else 'priority')
     if sort_by == 'name':
-        places_list = places_list.order_by('name')
+        ordering = ['name', 'id']
     elif sort_by == 'popular':
-        places_list = places_list.order_by('-view_count')
+        ordering = ['-view_count', 'id']
+    elif sort_by == 'trending':
+        ordering = ['-trending_score', 'id']
+    elif sort_by == 'relevance' and ranked_ids:
+        # نتائج البحث محدودة بـ SEARCH_MAX_RESULTS لذلك يكفي التقسيم العادي
+        ordering = None
+        places_list = places_list.order_by(Case(
+            *[When(pk=place_id, then=Value(rank)) for rank, place_id in enumerate(ranked_ids)],
+            output_field=IntegerField()
+        ))
     else:
-        places_list = places_list.order_by('priority')
+        ordering = ['priority', 'id']
     
     # Pagination
-    paginator = Paginator(places_list, 12)
-    page_number = request.GET.get('page')
-    places = paginator.get_page(page_number)
+    places = paginate(request, places_list, ordering)
+    for place in places:
+        place.search_snippet = search_snippets.get(place.pk)
     
     # للفلاتر
     categories = Category.objects.filter(is_active=True)
@@ -177,6 +217,168 @@ def all_places(request):
     return render(request, 'tourism/all_places.html', context)
 
 
+def nearby_places_api(request):
+    """
+    API للمواقع القريبة (JSON)
+    ?place=<slug> أو ?lat=&lng=، مع radius (كم) أو k (أقرب k مواقع)
+    """
+    lang = request.session.get('language', 'ar')
+    exclude = None
+    try:
+        if request.GET.get('place'):
+            origin = get_object_or_404(TouristPlace, slug=request.GET['place'], is_active=True)
+            if origin.latitude is None or origin.longitude is None:
+                return JsonResponse({'status': 'error', 'message': 'الموقع بدون إحداثيات'}, status=400)
+            lat, lng, exclude = float(origin.latitude), float(origin.longitude), origin.pk
+        else:
+            lat, lng = float(request.GET['lat']), float(request.GET['lng'])
+        radius = float(request.GET['radius']) if request.GET.get('radius') else None
+        k = int(request.GET.get('k', 10))
+    except (KeyError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    
+    # المقارنة مع NaN خاطئة دائماً فلا تكفي فحوص النطاق
+    if not all(map(math.isfinite, (lat, lng, radius if radius is not None else 0))):
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (radius is not None and radius <= 0):
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    max_radius = getattr(settings, 'NEARBY_MAX_RADIUS_KM', 100)
+    k = max(1, min(k, getattr(settings, 'NEARBY_MAX_RESULTS', 50)))
+    queryset = TouristPlace.objects.filter(is_active=True).select_related('governorate')
+    
+    if radius is not None:
+        results = geo.within_radius(lat, lng, min(radius, max_radius), queryset, exclude)[:k]
+    else:
+        results = geo.nearest(lat, lng, k, queryset, exclude, max_radius_km=max_radius)
+    
+    return JsonResponse({
+        'status': 'success',
+        'results': [
+            {
+                'id': place.pk,
+                'name': place.get_name(lang),
+                'slug': place.slug,
+                'url': reverse('tourism:place_detail', args=[place.slug]),
+                'governorate': place.governorate.get_name(lang),
+                'lat': float(place.latitude),
+                'lng': float(place.longitude),
+                'distance_km': round(distance, 2),
+            }
+            for place, distance in results
+        ],
+    })
+
+
+def place_suggestions_api(request):
+    """
+    API اقتراحات المواقع أثناء الكتابة (JSON)
+    ?q=<بداية الاسم بالعربية أو الإنجليزية>[&category=<slug>][&governorate=<slug>][&limit=<n>]
+    بدون q تُعاد أهم المواقع المطابقة للفلاتر حسب الأولوية
+    """
+    lang = request.session.get('language', 'ar')
+    max_results = getattr(settings, 'PLACE_SUGGESTIONS_MAX_RESULTS', 20)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), max_results))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    
+    queryset = TouristPlace.objects.filter(is_active=True)
+    if request.GET.get('category'):
+        queryset = queryset.filter(category__slug=request.GET['category'])
+    if request.GET.get('governorate'):
+        queryset = queryset.filter(governorate__slug=request.GET['governorate'])
+    queryset = queryset.select_related('governorate').only(
+        'id', 'name', 'name_en', 'slug', 'governorate__name', 'governorate__name_en'
+    ).order_by('priority', 'name', 'id')
+    
+    return JsonResponse({
+        'status': 'success',
+        'results': [
+            {
+                'id': place.pk,
+                'name': place.get_name(lang),
+                'slug': place.slug,
+                'governorate': place.governorate.get_name(lang),
+            }
+            for place in search.suggest(queryset, request.GET.get('q', ''), limit)
+        ],
+    })
+
+
+def map_places_api(request):
+    """
+    API لعلامات الخريطة (GeoJSON) داخل مستطيل العرض
+    ?bbox=min_lng,min_lat,max_lng,max_lat&zoom=<n>[&category=<slug>]
+    عند التكبير المنخفض تُعاد مجموعات الشبكة مع عدد المواقع بدلاً من المواقع نفسها
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = map(float, request.GET['bbox'].split(','))
+        zoom = int(request.GET.get('zoom', 6))
+    except (KeyError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    if not all(map(math.isfinite, (min_lng, min_lat, max_lng, max_lat))):
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    if min_lat > max_lat or min_lng > max_lng or not 0 <= zoom <= 22:
+        return JsonResponse({'status': 'error', 'message': 'معاملات غير صالحة'}, status=400)
+    
+    lang = request.session.get('language', 'ar')
+    category = request.GET.get('category', '')
+    clustered = zoom <= getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 11)
+    factor = geo.cluster_factor(zoom) if clustered else 1
+    bbox = geo.snap_bbox(
+        max(-90.0, min_lat), max(-180.0, min_lng), min(90.0, max_lat), min(180.0, max_lng), factor
+    )
+    
+    key = catalog_key('map', lang, category, int(clustered), factor, *(round(v, 1) for v in bbox))
+    data = cache.get(key)
+    if data is None:
+        queryset = TouristPlace.objects.filter(is_active=True)
+        if category:
+            queryset = queryset.filter(category__slug=category)
+        
+        places = []
+        if not clustered:
+            limit = getattr(settings, 'MAP_MAX_MARKERS', 500)
+            places = list(geo.filter_bbox(queryset, *bbox).only(
+                'id', 'name', 'name_en', 'slug', 'latitude', 'longitude'
+            ).order_by('priority', 'id')[:limit + 1])
+            # عدد كبير جداً من المواقع: نعود إلى التجميع على مستوى الخلية
+            clustered = len(places) > limit
+        
+        if clustered:
+            counts = cache.get_or_set(
+                catalog_key('map-cells', category),
+                lambda: geo.cell_counts(queryset),
+                getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+            )
+            features = [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [round(lng, 5), round(lat, 5)]},
+                    'properties': {'cluster': True, 'count': count},
+                }
+                for count, lat, lng in geo.clusters(counts, *bbox, factor)
+            ]
+        else:
+            features = [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [float(place.longitude), float(place.latitude)]},
+                    'properties': {
+                        'cluster': False,
+                        'id': place.pk,
+                        'name': place.get_name(lang),
+                        'url': reverse('tourism:place_detail', args=[place.slug]),
+                    },
+                }
+                for place in places
+            ]
+        data = {'type': 'FeatureCollection', 'clustered': clustered, 'features': features}
+        cache.set(key, data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    
+    return JsonResponse(data)
+
+
 def tour_planner(request):
     """مخطط البرنامج السياحي"""
     generated_program = None
@@ -186,9 +388,23 @@ def tour_planner(request):
         if form.is_valid():
             days = form.cleaned_data['days']
             categories = form.cleaned_data['categories']
+            lang = request.session.get('language', 'ar')
             
-            # توليد برنامج سياحي
-            generated_program = generate_tour_program(days, categories)
+            # البرامج الطويلة غير المخزنة تُولَّد في الخلفية
+            generated_program = planner.cached_tour_program(days, categories, lang)
+            if generated_program is None and days >= getattr(settings, 'PLANNER_JOB_MIN_DAYS', 7):
+                job = PlannerJob.objects.create(
+                    user=request.user if request.user.is_authenticated else None,
+                    days=days,
+                    category_ids=sorted(category.pk for category in categories),
+                    language=lang,
+                )
+                jobs.submit(job)
+                return redirect('tourism:planner_job', job_id=job.pk)
+            
+            # توليد برنامج سياحي (أو قراءته من الذاكرة المؤقتة)
+            if generated_program is None:
+                generated_program = planner.get_tour_program(days, categories, lang)
             
     else:
         form = TourPlannerForm()
@@ -200,42 +416,73 @@ def tour_planner(request):
     return render(request, 'tourism/tour_planner.html', context)
 
 
-def generate_tour_program(days, categories):
-    """توليد برنامج سياحي تلقائي"""
-    program = {
-        'days': days,
-        'categories': categories,
-        'schedule': []
-    }
-    
-    # الحصول على المواقع حسب الأقسام المختارة
-    places = TouristPlace.objects.filter(
-        category__in=categories,
-        is_active=True
-    ).select_related('category', 'governorate').order_by('priority')
-    
-    # تحويل إلى قائمة وخلطها قليلاً لتنويع
-    places_list = list(places)
+def planner_job(request, job_id):
+    """صفحة طلب برنامج سياحي: تعرض النتيجة أو حالة التنفيذ"""
+    job = jobs.expire_stale(get_object_or_404(PlannerJob, pk=job_id))
     
-    # توزيع المواقع على الأيام
-    places_per_day = max(2, len(places_list) // days)
+    generated_program = None
+    if job.status == 'done':
+        categories = Category.objects.filter(pk__in=job.category_ids)
+        generated_program = planner.load_program(job.days, categories, job.result)
     
-    for day_num in range(1, days + 1):
-        start_idx = (day_num - 1) * places_per_day
-        end_idx = start_idx + places_per_day
-        
-        day_places = places_list[start_idx:end_idx]
+    context = {
+        'form': TourPlannerForm(initial={'days': job.days, 'categories': job.category_ids}),
+        'generated_program': generated_program,
+        'job': job,
+    }
+    return render(request, 'tourism/tour_planner.html', context)
+
+
+def planner_job_status(request, job_id):
+    """حالة طلب البرنامج السياحي (JSON)"""
+    job = jobs.expire_stale(get_object_or_404(PlannerJob, pk=job_id))
+    return JsonResponse({
+        'id': str(job.pk),
+        'status': job.status,
+        'finished': job.is_finished,
+        'url': reverse('tourism:planner_job', args=[job.pk]),
+    })
+
+
+@login_required
+@require_POST
+def save_planner_job(request, job_id):
+    """
+    حفظ نتيجة طلب البرنامج السياحي كخطة رحلة لصاحب الطلب
+    (طلبات الزوار بدون حساب تُنسب لأول مستخدم يحفظها)
+    """
+    with transaction.atomic():
+        # قفل الطلب حتى لا ينشئ النقر المزدوج خطتين
+        job = get_object_or_404(PlannerJob.objects.select_for_update(), pk=job_id, status='done')
+        if job.user_id is not None and job.user_id != request.user.id:
+            raise Http404
+        if job.trip_plan_id:
+            return redirect('tourism:trip_plan_detail', plan_id=job.trip_plan_id)
         
-        if day_places:
-            day_data = {
-                'day_number': day_num,
-                'title': f'اليوم {day_num}',
-                'places': day_places,
-                'total_duration': sum(p.suggested_duration for p in day_places),
-            }
-            program['schedule'].append(day_data)
-    
-    return program
+        active_ids = set(TouristPlace.objects.filter(
+            pk__in=[place_id for day in job.result['schedule'] for place_id in day['places']],
+            is_active=True
+        ).values_list('pk', flat=True))
+        trip_plan = UserTripPlan.objects.create(
+            user=request.user,
+            title=f'برنامج {job.days} أيام',
+            status='planned',
+        )
+        entries = TripPlanDay.objects.bulk_create([
+            TripPlanDay(trip_plan=trip_plan, place_id=place_id, day_number=day['day_number'])
+            for day in job.result['schedule']
+            for place_id in day['places']
+            if place_id in active_ids
+        ])
+        trip_plans.update_plan_summary(trip_plan.pk)
+        added = [entry.place_id for entry in entries]
+        recommendations.schedule(recommendations.record_basket, [], added)
+        job.user = request.user
+        job.trip_plan = trip_plan
+        job.save(update_fields=['user', 'trip_plan'])
+    
+    messages.success(request, 'تم حفظ البرنامج في خطط رحلاتك')
+    return redirect('tourism:trip_plan_detail', plan_id=trip_plan.id)
 
 
 def governorates_list(request):
@@ -262,16 +509,11 @@ def governorate_detail(request, slug):
     ).select_related('category').prefetch_related('images')
     
     # Pagination
-    paginator = Paginator(places_list, 12)
-    page_number = request.GET.get('page')
-    places = paginator.get_page(page_number)
+    places = paginate(request, places_list, ['priority', '-is_featured', 'name', 'id'])
     
     # تجميع حسب القسم
-    categories_with_places = {}
-    for place in places_list:
-        if place.category not in categories_with_places:
-            categories_with_places[place.category] = []
-        categories_with_places[place.category].append(place)
+    lang = request.session.get('language', 'ar')
+    categories_with_places = get_governorate_groups(governorate, lang)
     
     context = {
         'governorate': governorate,
@@ -281,6 +523,59 @@ def governorate_detail(request, slug):
     return render(request, 'tourism/governorate_detail.html', context)
 
 
+def get_governorate_groups(governorate, lang='ar'):
+    """
+    ملخص المواقع حسب القسم في المحافظة: العدد وعدد محدود من المواقع للمعاينة
+    يُحسب باستعلام تجميعي ويُخزَّن لكل محافظة ولغة
+    """
+    key = catalog_key('governorate-groups', governorate.pk, lang)
+    groups = cache.get(key)
+    if groups is not None:
+        return groups
+    
+    preview_count = getattr(settings, 'GOVERNORATE_PREVIEW_PLACES', 4)
+    categories = Category.objects.filter(
+        places__governorate=governorate,
+        places__is_active=True
+    ).annotate(place_count=Count('places')).order_by('order', 'name')
+    
+    # أول N مواقع في كل قسم فقط، بدون حقول الوصف الطويلة
+    previews = TouristPlace.objects.filter(
+        governorate=governorate,
+        is_active=True
+    ).annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F('category'),
+            order_by=[F('priority').asc(), F('id').asc()]
+        )
+    ).filter(row_number__lte=preview_count).only(
+        'id', 'name', 'name_en', 'slug', 'category_id'
+    ).prefetch_related('images')
+    
+    previews_by_category = {}
+    for place in previews:
+        main_image = place.get_main_image()
+        previews_by_category.setdefault(place.category_id, []).append({
+            'name': place.get_name(lang),
+            'slug': place.slug,
+            'image_url': main_image.image.url if main_image and main_image.image else '',
+        })
+    
+    groups = [
+        {
+            'name': category.get_name(lang),
+            'slug': category.slug,
+            'icon': category.icon,
+            'count': category.place_count,
+            'places': previews_by_category.get(category.pk, []),
+        }
+        for category in categories
+    ]
+    cache.set(key, groups, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    return groups
+
+
 def about(request):
     """صفحة عن الموقع"""
     return render(request, 'tourism/about.html')
@@ -384,10 +679,12 @@ def profile(request):
         form = UserProfileForm(instance=profile, initial=initial_data)
     
     # الأماكن المحفوظة
-    saved_places = SavedPlace.objects.filter(user=request.user).select_related('place')[:6]
+    saved_places = SavedPlace.objects.filter(
+        user=request.user
+    ).select_related('place', 'place__governorate').prefetch_related('place__images')[:6]
     
     # خطط الرحلات
-    trip_plans = UserTripPlan.objects.filter(user=request.user)[:5]
+    trip_plans = UserTripPlan.objects.filter(user=request.user).only(*TRIP_PLAN_CARD_FIELDS)[:5]
     
     context = {
         'form': form,
@@ -404,14 +701,9 @@ def profile(request):
 @require_POST
 def toggle_save_place(request, place_id):
     """حفظ أو إلغاء حفظ مكان"""
-    place = get_object_or_404(TouristPlace, id=place_id, is_active=True)
-    saved_place, created = SavedPlace.objects.get_or_create(
-        user=request.user,
-        place=place
-    )
+    place = get_object_or_404(TouristPlace.objects.only('id'), id=place_id, is_active=True)
     
-    if not created:
-        saved_place.delete()
+    if not toggle_saved_place(request.user, place.pk):
         return JsonResponse({
             'status': 'removed',
             'message': 'تم إزالة المكان من المحفوظات'
@@ -428,7 +720,7 @@ def saved_places_list(request):
     """قائمة الأماكن المحفوظة"""
     saved_places = SavedPlace.objects.filter(
         user=request.user
-    ).select_related('place', 'place__governorate', 'place__category')
+    ).select_related('place', 'place__governorate', 'place__category').prefetch_related('place__images')
     
     return render(request, 'tourism/saved_places.html', {
         'saved_places': saved_places
@@ -437,10 +729,17 @@ def saved_places_list(request):
 
 # ======= Trip Planning Views =======
 
+TRIP_PLAN_CARD_FIELDS = [
+    'id', 'title', 'description', 'status', 'start_date', 'end_date', 'budget',
+    'place_count', 'day_count', 'total_hours', 'governorates_summary', 'created_at',
+]
+
+
 @login_required
 def trip_plans_list(request):
     """قائمة خطط الرحلات"""
-    trip_plans = UserTripPlan.objects.filter(user=request.user).prefetch_related('days__place')
+    # الملخص مخزَّن في الخطة نفسها، فلا حاجة لتحميل الأيام والأماكن
+    trip_plans = UserTripPlan.objects.filter(user=request.user).only(*TRIP_PLAN_CARD_FIELDS)
     
     return render(request, 'tourism/trip_plans_list.html', {
         'trip_plans': trip_plans
@@ -468,7 +767,7 @@ def create_trip_plan(request):
 def trip_plan_detail(request, plan_id):
     """تفاصيل خطة رحلة"""
     trip_plan = get_object_or_404(
-        UserTripPlan.objects.prefetch_related('days__place'),
+        UserTripPlan.objects.prefetch_related(Prefetch('days', queryset=trip_plans.ordered_entries())),
         id=plan_id,
         user=request.user
     )
@@ -480,13 +779,12 @@ def trip_plan_detail(request, plan_id):
             days_data[day.day_number] = []
         days_data[day.day_number].append(day)
     
-    # جميع الأماكن المتاحة للإضافة
-    available_places = TouristPlace.objects.filter(is_active=True).select_related('governorate', 'category')
-    
+    # الأماكن تُختار عبر API الاقتراحات بدلاً من تحميل الكتالوج كاملاً
     context = {
         'trip_plan': trip_plan,
         'days_data': dict(sorted(days_data.items())),
-        'available_places': available_places,
+        'categories': Category.objects.filter(is_active=True),
+        'governorates': Governorate.objects.filter(is_active=True),
     }
     return render(request, 'tourism/trip_plan_detail.html', context)
 
@@ -496,33 +794,95 @@ def trip_plan_detail(request, plan_id):
 def add_place_to_plan(request, plan_id):
     """إضافة مكان إلى خطة الرحلة"""
     trip_plan = get_object_or_404(UserTripPlan, id=plan_id, user=request.user)
-    place_id = request.POST.get('place_id')
-    day_number = request.POST.get('day_number', 1)
-    
-    place = get_object_or_404(TouristPlace, id=place_id, is_active=True)
-    
     try:
-        trip_day, created = TripPlanDay.objects.get_or_create(
-            trip_plan=trip_plan,
-            place=place,
-            day_number=int(day_number)
-        )
-        
-        if created:
-            return JsonResponse({
-                'status': 'success',
-                'message': f'تم إضافة {place.name} إلى اليوم {day_number}'
-            })
-        else:
-            return JsonResponse({
-                'status': 'exists',
-                'message': 'هذا المكان موجود بالفعل في خطة الرحلة'
-            })
-    except Exception as e:
+        place_id = int(request.POST.get('place_id'))
+        day_number = int(request.POST.get('day_number', 1))
+    except (TypeError, ValueError):
         return JsonResponse({
             'status': 'error',
-            'message': str(e)
+            'message': 'بيانات غير صالحة'
         }, status=400)
+    
+    place = get_object_or_404(TouristPlace, id=place_id, is_active=True)
+    trip_day, created = TripPlanDay.objects.get_or_create(
+        trip_plan=trip_plan,
+        place=place,
+        day_number=day_number
+    )
+    
+    if created:
+        return JsonResponse({
+            'status': 'success',
+            'message': f'تم إضافة {place.name} إلى اليوم {day_number}'
+        })
+    return JsonResponse({
+        'status': 'exists',
+        'message': 'هذا المكان موجود بالفعل في خطة الرحلة'
+    })
+
+
+@login_required
+@require_POST
+def batch_update_plan(request, plan_id):
+    """
+    إضافة ونقل أماكن في خطة الرحلة دفعة واحدة (JSON)
+    {"operations": [{"place_id": 1, "day_number": 2, "visit_time": "09:30", "id": <اختياري للنقل>}]}
+    """
+    trip_plan = get_object_or_404(UserTripPlan, id=plan_id, user=request.user)
+    try:
+        data = json.loads(request.body)
+        operations = trip_plans.parse_operations(data.get('operations') if isinstance(data, dict) else None)
+        diff = trip_plans.apply_operations(trip_plan, operations)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'status': 'error', 'message': 'JSON غير صالح'}, status=400)
+    except trip_plans.OperationsError as e:
+        return JsonResponse({'status': 'error', 'errors': e.errors}, status=400)
+    except IntegrityError:
+        # تعديل متزامن للخطة أضاف نفس المكان لنفس اليوم
+        return JsonResponse({'status': 'error', 'message': 'تعارض مع تعديل آخر للخطة، أعد المحاولة'}, status=400)
+    
+    return JsonResponse({'status': 'success', **diff})
+
+
+@login_required
+@require_POST
+def optimize_trip_plan(request, plan_id):
+    """ترتيب أماكن كل يوم حسب المسافة واقتراح أوقات الزيارة"""
+    trip_plan = get_object_or_404(UserTripPlan, id=plan_id, user=request.user)
+    trip_plans.optimize_days(trip_plan)
+    messages.success(request, 'تم ترتيب أيام الرحلة حسب المسافة')
+    return redirect('tourism:trip_plan_detail', plan_id=trip_plan.id)
+
+
+EXPORT_FORMATS = {
+    'ics': ('text/calendar; charset=utf-8', exports.ics_stream),
+    'print': ('text/html; charset=utf-8', exports.html_stream),
+}
+
+
+@login_required
+def export_trip_plan(request, plan_id, fmt):
+    """
+    تصدير خطة الرحلة كملف تقويم (ics) أو صفحة للطباعة (print)
+    يُرسل المحتوى تدريجياً، ويُعاد 304 إذا لم تتغير الخطة منذ آخر تنزيل
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise Http404
+    trip_plan = get_object_or_404(UserTripPlan, id=plan_id, user=request.user)
+    lang = request.session.get('language', 'ar')
+    
+    etag = quote_etag(f'{trip_plan.pk}-{fmt}-{lang}-{trip_plan.updated_at.timestamp()}-{catalog_version()}')
+    last_modified = int(trip_plan.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type, stream = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(stream(trip_plan, lang), content_type=content_type)
+        if fmt == 'ics':
+            response['Content-Disposition'] = f'attachment; filename="trip-plan-{trip_plan.pk}.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required